@@ -1,13 +1,46 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Request
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import secrets
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 from starlette.datastructures import URL as StarletteURL
 
-from app.schemas.schemas import URLBase, URLCustom, URLInfo
-from app.application import UrlService
-from app.infrastructure.repositories.sqlalchemy_url_repository import SqlAlchemyUrlRepository
+from app.schemas.schemas import (
+    ClickBucket,
+    URLBulk,
+    URLClickStats,
+    URLCreate,
+    URLCustom,
+    URLInfo,
+    URLPage,
+    URLSummary,
+)
+from app.application import BulkCreateResult, UrlService
 from app.core.config import get_settings
-from app.dependencies.database import get_db
+from app.core.metrics import RESPONSE_BUILD
+from app.dependencies.container import get_container
+from app.dependencies.services import get_url_service
+from app.utils.urls import encode_location
+from .redirects import get_redirect_responder
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+PROTECTED_VALUE = "***PROTECTED***"
+ADMIN_PAGE_MAX_LIMIT = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": NDJSON_MEDIA_TYPE, "csv": "text/csv"}
+EXPORT_FIELDS = ("key", "target_url", "is_active", "clicks", "url", "expires_at")
+DEFAULT_STATS_RANGES = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+BulkItem = Tuple[Optional[str], Optional[str]]
 
 
 router = APIRouter(
@@ -16,11 +49,6 @@ router = APIRouter(
 )
 
 
-def get_url_service(db: Session = Depends(get_db)) -> UrlService:
-    repository = SqlAlchemyUrlRepository(db_session=db)
-    return UrlService(url_repository=repository)
-
-
 def raise_bad_request(message: str) -> None:
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -36,23 +64,142 @@ def raise_not_found(request: Request) -> None:
     )
 
 
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    admin_token = get_settings().admin_token
+    if not admin_token or not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="A valid X-Admin-Token header is required"
+        )
+
+
+@lru_cache()
+def get_base_url() -> StarletteURL:
+    return StarletteURL(get_settings().base_url)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=timezone.utc) if value else None
+
+
 def get_admin_info(url_entity) -> URLInfo:
-    base_url = StarletteURL(get_settings().base_url)
-    url = str(base_url.replace(path=f"/{url_entity.key}"))
-    admin_path = f"/admin/{url_entity.secret_key}"
-    admin_url = str(base_url.replace(path=admin_path))
+    with RESPONSE_BUILD.time():
+        base_url = get_base_url()
+        url = str(base_url.replace(path=f"/{url_entity.key}"))
+        admin_path = f"/admin/{url_entity.secret_key}"
+        admin_url = str(base_url.replace(path=admin_path))
+
+        return URLInfo(
+            target_url=url_entity.target_url,
+            is_active=url_entity.is_active,
+            clicks=url_entity.clicks,
+            key=url_entity.key,
+            secret_key=url_entity.secret_key,
+            url=url,
+            admin_url=admin_url,
+            expires_at=as_utc(url_entity.expires_at)
+        )
+
+
+def get_shared_url_info(url_entity) -> URLInfo:
+    """Admin info for a short URL that someone else created, without its admin credentials."""
+    admin_info = get_admin_info(replace(url_entity, secret_key=PROTECTED_VALUE))
+    return admin_info.model_copy(update={"admin_url": PROTECTED_VALUE})
 
-    return URLInfo(
+
+def get_url_summary(url_entity, base_url: StarletteURL) -> URLSummary:
+    return URLSummary(
         target_url=url_entity.target_url,
         is_active=url_entity.is_active,
         clicks=url_entity.clicks,
         key=url_entity.key,
-        secret_key=url_entity.secret_key,
-        url=url,
-        admin_url=admin_url
+        url=str(base_url.replace(path=f"/{url_entity.key}")),
+        expires_at=as_utc(url_entity.expires_at)
     )
 
 
+def render_export_chunk(summaries: List[URLSummary], export_format: str) -> str:
+    if export_format == "ndjson":
+        return "".join(summary.model_dump_json() + "\n" for summary in summaries)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([getattr(summary, field) for field in EXPORT_FIELDS] for summary in summaries)
+    return buffer.getvalue()
+
+
+async def stream_export(export_format: str, chunk_size: int) -> AsyncIterator[str]:
+    base_url = get_base_url()
+    if export_format == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+    async with get_container().session() as db:
+        url_service = get_container().url_service_for(db)
+        async for url_entities in url_service.stream_urls(chunk_size):
+            summaries = [get_url_summary(url_entity, base_url) for url_entity in url_entities]
+            yield render_export_chunk(summaries, export_format)
+
+
+def to_timestamp(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def from_timestamp(value: int) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def bulk_result_line(index: int, result: BulkCreateResult) -> dict:
+    if result.error:
+        return {"index": index, "target_url": result.target_url, "error": result.error}
+    if result.duplicate:
+        return {"index": index, "duplicate": True, **get_shared_url_info(result.url_entity).model_dump()}
+    return {"index": index, **get_admin_info(result.url_entity).model_dump()}
+
+
+def parse_bulk_line(line: bytes) -> BulkItem:
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None, "Line is not valid JSON"
+    if isinstance(item, dict):
+        item = item.get("target_url")
+    if not isinstance(item, str):
+        return None, "Expected a URL string or an object with 'target_url'"
+    return item, None
+
+
+def parse_bulk_body(request_body: bytes, content_type: str) -> List[BulkItem]:
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        return [parse_bulk_line(line) for line in request_body.splitlines() if line.strip()]
+
+    try:
+        bulk = URLBulk.model_validate_json(request_body)
+    except ValidationError as error:
+        raise_bad_request(message=str(error))
+    return [(target_url, None) for target_url in bulk.target_urls]
+
+
+async def stream_bulk_results(items: List[BulkItem], chunk_size: int) -> AsyncIterator[str]:
+    # The request-scoped session may already be closed while the response streams,
+    # so the generator owns its own session for the whole response.
+    async with get_container().session() as db:
+        url_service = get_container().url_service_for(db)
+        for offset in range(0, len(items), chunk_size):
+            async for line in create_bulk_chunk(url_service, items[offset:offset + chunk_size], offset):
+                yield line
+
+
+async def create_bulk_chunk(url_service: UrlService, chunk: List[BulkItem], offset: int) -> AsyncIterator[str]:
+    target_urls = [target_url for target_url, error in chunk if error is None]
+    results = iter(await url_service.create_short_urls(target_urls) if target_urls else [])
+    for position, (target_url, error) in enumerate(chunk):
+        if error is None:
+            line = bulk_result_line(offset + position, next(results))
+        else:
+            line = {"index": offset + position, "error": error}
+        yield json.dumps(line) + "\n"
+
+
 @router.get("/",
             summary="Get API Information",
             description="Returns basic information about the URL shortener API.")
@@ -68,9 +215,13 @@ async def read_root() -> dict:
              summary="Create Shortened URL",
              description="Creates a new shortened URL from a target URL.",
              response_description="Created shortened URL with admin access info")
-def create_url(url: URLBase, url_service: UrlService = Depends(get_url_service)) -> URLInfo:
+async def create_url(url: URLCreate, url_service: UrlService = Depends(get_url_service)) -> URLInfo:
     target_url_str = str(url.target_url)
-    url_entity = url_service.create_short_url(target_url=target_url_str)
+    if url.expires_at is None:
+        existing = await url_service.find_existing_urls([target_url_str])
+        if existing:
+            return get_shared_url_info(existing[target_url_str])
+    url_entity = await url_service.create_short_url(target_url=target_url_str, expires_at=url.expires_at)
     return get_admin_info(url_entity)
 
 
@@ -78,65 +229,178 @@ def create_url(url: URLBase, url_service: UrlService = Depends(get_url_service))
              summary="Create Custom Shortened URL",
              description="Creates a new shortened URL with a user-defined custom key.",
              response_description="Created custom shortened URL with admin access info")
-def create_custom_url(
+async def create_custom_url(
         custom_url: URLCustom,
         url_service: UrlService = Depends(get_url_service)
 ) -> URLInfo:
     try:
         target_url_str = str(custom_url.target_url)
-        url_entity = url_service.create_custom_short_url(
+        url_entity = await url_service.create_custom_short_url(
             target_url=target_url_str,
-            custom_key=custom_url.custom_key
+            custom_key=custom_url.custom_key,
+            expires_at=custom_url.expires_at
         )
         return get_admin_info(url_entity)
     except Exception as error:
         raise_bad_request(message=str(error))
 
 
+@router.post("/urls/bulk",
+             summary="Create Shortened URLs in Bulk",
+             description=(
+                 "Creates shortened URLs for a JSON list of target URLs or an NDJSON body "
+                 f"({NDJSON_MEDIA_TYPE}) with one URL or {{\"target_url\": ...}} object per line. "
+                 "Results are streamed back as NDJSON, one line per input item, in input order."
+             ),
+             response_description="NDJSON stream of created URLs or per-item errors",
+             openapi_extra={
+                 "requestBody": {
+                     "required": True,
+                     "content": {
+                         "application/json": {"schema": URLBulk.model_json_schema()},
+                         NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}},
+                     },
+                 }
+             })
+async def create_urls_bulk(request: Request) -> StreamingResponse:
+    settings = get_settings()
+    items = parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > settings.bulk_max_items:
+        raise_bad_request(message=f"Bulk request exceeds the limit of {settings.bulk_max_items} items")
+
+    return StreamingResponse(
+        stream_bulk_results(items, settings.bulk_chunk_size),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
 @router.get("/{url_key}",
             summary="Redirect Shortened URL",
             description="Redirects a short URL key to its original target URL and increments click count.")
-def forward_to_target_url(
+async def forward_to_target_url(
         url_key: str,
         request: Request,
         url_service: UrlService = Depends(get_url_service)
-) -> RedirectResponse:
-    url_entity = url_service.get_url_by_key(url_key)
+) -> Response:
+    url_entity = await url_service.get_url_by_key(url_key)
     if url_entity:
-        url_service.increment_click_count(url_entity)
-        return RedirectResponse(url_entity.target_url)
+        await url_service.increment_click_count(
+            url_entity,
+            referrer=request.headers.get("referer"),
+            user_agent=request.headers.get("user-agent")
+        )
+        with RESPONSE_BUILD.time():
+            responder = get_redirect_responder()
+            headers = {"location": encode_location(url_entity.target_url).decode("latin-1")}
+            if responder.cache_control:
+                headers["cache-control"] = responder.cache_control
+            return Response(status_code=responder.status_code, headers=headers)
     else:
         raise_not_found(request)
 
 
+@router.get("/admin/urls",
+            summary="List URLs",
+            description=(
+                "Lists short URLs ordered by key, without their secret keys. Pass the returned "
+                "next_after as 'after' to fetch the next page. Requires the X-Admin-Token header."
+            ),
+            dependencies=[Depends(require_admin_token)])
+async def list_urls(
+        after: Optional[str] = Query(default=None, description="Return URLs whose key sorts after this one"),
+        limit: int = Query(default=100, ge=1, le=ADMIN_PAGE_MAX_LIMIT),
+        url_service: UrlService = Depends(get_url_service)
+) -> URLPage:
+    url_entities, next_after = await url_service.list_urls(after, limit)
+    base_url = get_base_url()
+    return URLPage(items=[get_url_summary(url_entity, base_url) for url_entity in url_entities], next_after=next_after)
+
+
+@router.get("/admin/urls/export",
+            summary="Export URLs",
+            description=(
+                "Streams every short URL as NDJSON or CSV, without secret keys, reading the table "
+                "in chunks through a server-side cursor. Requires the X-Admin-Token header."
+            ),
+            response_description="NDJSON or CSV stream of URLs",
+            dependencies=[Depends(require_admin_token)])
+async def export_urls(
+        export_format: str = Query(default="ndjson", alias="format", pattern="^(ndjson|csv)$")
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_export(export_format, get_settings().export_chunk_size),
+        media_type=EXPORT_MEDIA_TYPES[export_format]
+    )
+
+
 @router.get("/admin/{secret_key}",
          name="administration info",
          summary="Get URL Admin Info",
          description="Retrieves administrative information about a shortened URL.",
          response_description="Complete URL information with admin access details")
-def get_url_info(
+async def get_url_info(
         secret_key: str,
         request: Request,
         url_service: UrlService = Depends(get_url_service)
 ) -> URLInfo:
-    url_entity = url_service.get_url_by_secret_key(secret_key)
+    url_entity = await url_service.get_url_by_secret_key(secret_key)
     if not url_entity:
         raise_not_found(request)
     admin_info = get_admin_info(url_entity)
     admin_info_dict = admin_info.model_dump()
-    admin_info_dict['secret_key'] = "***PROTECTED***"
+    admin_info_dict['secret_key'] = PROTECTED_VALUE
     return URLInfo(**admin_info_dict)
 
 
+@router.get("/admin/{secret_key}/stats",
+            summary="Get URL Click Stats",
+            description=(
+                "Returns clicks per minute, hour or day for a shortened URL, with referrer host and "
+                "user agent breakdowns, read from the rollup tables. Recent clicks appear once the "
+                "click buffer has been flushed and rolled up, usually within a few seconds."
+            ))
+async def get_url_stats(
+        secret_key: str,
+        request: Request,
+        granularity: str = Query(default="hour", pattern="^(minute|hour|day)$"),
+        start: Optional[datetime] = Query(default=None, description="Range start, defaults relative to end"),
+        end: Optional[datetime] = Query(default=None, description="Range end (exclusive), defaults to now"),
+        url_service: UrlService = Depends(get_url_service)
+) -> URLClickStats:
+    url_entity = await url_service.get_url_by_secret_key(secret_key)
+    if not url_entity:
+        raise_not_found(request)
+    end = end or datetime.now(timezone.utc)
+    start = start or end - DEFAULT_STATS_RANGES[granularity]
+    try:
+        stats = await url_service.get_click_stats(url_entity, granularity, to_timestamp(start), to_timestamp(end))
+    except ValueError as error:
+        raise_bad_request(message=str(error))
+
+    return URLClickStats(
+        key=url_entity.key,
+        granularity=stats.granularity,
+        start=from_timestamp(stats.start),
+        end=from_timestamp(stats.end),
+        total_clicks=stats.total_clicks,
+        buckets=[
+            ClickBucket(bucket_start=from_timestamp(bucket_start), clicks=clicks)
+            for bucket_start, clicks in sorted(stats.buckets.items())
+        ],
+        referrers=stats.referrers,
+        user_agents=stats.user_agents
+    )
+
+
 @router.delete("/admin/{secret_key}",
                summary="Delete URL",
                description="Deactivates a shortened URL.")
-def delete_url(
+async def delete_url(
         secret_key: str,
         request: Request,
         url_service: UrlService = Depends(get_url_service)
 ) -> dict:
-    url_entity = url_service.delete_url_by_secret_key(secret_key)
+    url_entity = await url_service.delete_url_by_secret_key(secret_key)
     if url_entity:
         message = f"Successfully deactivated short URL for '{url_entity.target_url}'"
         return {"detail": message}
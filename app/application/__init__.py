@@ -1,3 +1,5 @@
-from .url_service import UrlService
+from .url_service import BulkCreateResult, ClickStats, UrlService
+from .click_buffer import ClickBuffer, ClickFlusher
+from .batch_worker import BatchWorker
 
-__all__ = ["UrlService"]
\ No newline at end of file
+__all__ = ["UrlService", "BulkCreateResult", "ClickStats", "ClickBuffer", "ClickFlusher", "BatchWorker"]
\ No newline at end of file
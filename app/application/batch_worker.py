@@ -0,0 +1,54 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from app.utils.logging import get_logger
+
+logger = get_logger()
+
+BatchRunner = Callable[[int], Awaitable[int]]
+
+
+class BatchWorker:
+    """Periodically runs a batch job until it catches up, then sleeps.
+
+    The job receives the batch size and returns how many items it handled;
+    a short batch means there is nothing left for this pass.
+    """
+
+    def __init__(self, name: str, run_batch: BatchRunner, interval_seconds: float, batch_size: int):
+        self.name = name
+        self.run_batch = run_batch
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> int:
+        total = 0
+        while True:
+            try:
+                processed = await self.run_batch(self.batch_size)
+            except Exception as error:
+                logger.error("Batch job failed", job=self.name, error=str(error))
+                return total
+            total += processed
+            if processed < self.batch_size:
+                break
+        if total:
+            logger.debug("Batch job finished", job=self.name, items=total)
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.run_once()
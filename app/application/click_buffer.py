@@ -0,0 +1,124 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+from app.core.config import get_settings
+from app.core.metrics import CLICK_FLUSH
+from app.utils.logging import get_logger
+
+logger = get_logger()
+
+ClickWriter = Callable[[Dict[Hashable, int]], Awaitable[None]]
+
+
+class ClickBuffer:
+    """In-memory accumulator of click increments.
+
+    Keys are short URL keys for click totals, or ClickEventKey tuples for the
+    analytics event stream. Counts are drained and written in bulk. A failed write puts the counts
+    back, so every click is persisted at least once.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._counts: Dict[Hashable, int] = {}
+        self._oldest_pending: Optional[float] = None
+
+    def add(self, key: Hashable, count: int = 1) -> bool:
+        """Record clicks for a key and return True once the buffer is full."""
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+        self._counts[key] = self._counts.get(key, 0) + count
+        return len(self._counts) >= self.max_keys
+
+    def has_room(self) -> bool:
+        """Whether one more add is sure not to fill the buffer."""
+        return len(self._counts) < self.max_keys - 1
+
+    def drain(self) -> Dict[Hashable, int]:
+        counts, self._counts = self._counts, {}
+        self._oldest_pending = None
+        return counts
+
+    def restore(self, counts: Dict[Hashable, int], pending_since: Optional[float] = None) -> None:
+        if pending_since is not None and (self._oldest_pending is None or pending_since < self._oldest_pending):
+            self._oldest_pending = pending_since
+        for key, count in counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    async def flush(self, write_counts: ClickWriter) -> int:
+        pending_since = self._oldest_pending
+        counts = self.drain()
+        if not counts:
+            return 0
+        try:
+            with CLICK_FLUSH.time():
+                await write_counts(counts)
+        except BaseException:
+            self.restore(counts, pending_since)
+            raise
+        return sum(counts.values())
+
+    def lag_seconds(self) -> float:
+        """How long the oldest unwritten click has been waiting."""
+        if self._oldest_pending is None:
+            return 0.0
+        return time.monotonic() - self._oldest_pending
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class ClickFlusher:
+    """Periodically writes buffered clicks until stopped, then flushes once more."""
+
+    def __init__(
+            self,
+            click_buffer: ClickBuffer,
+            write_counts: ClickWriter,
+            interval_seconds: float,
+            name: str = "click counts"
+    ):
+        self.name = name
+        self.click_buffer = click_buffer
+        self.write_counts = write_counts
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        try:
+            flushed = await self.click_buffer.flush(self.write_counts)
+        except Exception as error:
+            logger.error("Failed to flush clicks", buffer=self.name, pending_keys=len(self.click_buffer),
+                         error=str(error))
+            return
+        if flushed:
+            logger.debug("Flushed clicks", buffer=self.name, clicks=flushed)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.flush()
+
+
+@lru_cache()
+def get_click_buffer() -> ClickBuffer:
+    return ClickBuffer(max_keys=get_settings().click_buffer_max_keys)
+
+
+@lru_cache()
+def get_click_event_buffer() -> ClickBuffer:
+    return ClickBuffer(max_keys=get_settings().click_events_max_keys)
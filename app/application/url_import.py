@@ -0,0 +1,178 @@
+import csv
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.domain.entities.url import MAX_KEY_LENGTH, utcnow
+from app.domain.url_validator import validate_url
+from app.utils.keygen import create_secret_key, hash_secret_key, key_from_secret_key
+from app.utils.urls import hash_url, normalize_url
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_COLUMNS = (
+    "key",
+    "secret_key_hash",
+    "target_url",
+    "target_url_hash",
+    "is_active",
+    "clicks",
+    "created_at",
+    "expires_at",
+)
+KEY_INDEX = IMPORT_COLUMNS.index("key")
+KEY_PATTERN = re.compile(rf"^[A-Za-z0-9_-]{{1,{MAX_KEY_LENGTH}}}$")
+TRUE_VALUES = frozenset({"true", "t", "yes", "1"})
+FALSE_VALUES = frozenset({"false", "f", "no", "0"})
+
+
+@dataclass
+class PreparedBatch:
+    """Rows ready for UrlBulkLoader, in IMPORT_COLUMNS order, plus what didn't make it.
+
+    row_lines holds the input line number of each row, and secret_keys the
+    (key, secret key) pairs generated for rows that arrived without one.
+    """
+    rows: List[tuple] = field(default_factory=list)
+    row_lines: List[int] = field(default_factory=list)
+    secret_keys: Dict[str, str] = field(default_factory=dict)
+    rejects: List[Tuple[int, str]] = field(default_factory=list)
+
+
+def prepare_batch(
+        lines: List[bytes],
+        first_line: int,
+        input_format: str,
+        header: Optional[List[str]] = None
+) -> PreparedBatch:
+    """Parse and validate raw input lines into rows.
+
+    Runs in the import's worker processes, so it takes and returns plain
+    picklable values. A key repeated within the batch keeps its first row.
+    """
+    batch = PreparedBatch()
+    seen = set()
+    now = utcnow()
+    for line_number, line in enumerate(lines, start=first_line):
+        if not line.strip():
+            continue
+        try:
+            record = parse_record(line, input_format, header)
+            row, secret_key = to_row(record, now)
+        except (ValueError, TypeError) as error:
+            batch.rejects.append((line_number, str(error)))
+            continue
+        key = row[KEY_INDEX]
+        if key in seen:
+            batch.rejects.append((line_number, f"Duplicate key '{key}' in input"))
+            continue
+        seen.add(key)
+        batch.rows.append(row)
+        batch.row_lines.append(line_number)
+        if secret_key is not None:
+            batch.secret_keys[key] = secret_key
+    return batch
+
+
+def parse_record(line: bytes, input_format: str, header: Optional[List[str]]) -> Dict[str, Any]:
+    if input_format == "ndjson":
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+        return record
+    values = next(csv.reader([line.decode("utf-8")]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} fields, found {len(values)}")
+    return {name: value for name, value in zip(header, values) if value != ""}
+
+
+def to_row(record: Dict[str, Any], now: datetime) -> Tuple[tuple, Optional[str]]:
+    """Return the row for a record and the secret key generated for it, if any."""
+    key = record.get("key")
+    if not isinstance(key, str) or not KEY_PATTERN.match(key):
+        raise ValueError(f"Key must be 1-{MAX_KEY_LENGTH} letters, digits, hyphens or underscores")
+    target_url = record.get("target_url")
+    if not isinstance(target_url, str) or not validate_url(target_url):
+        raise ValueError(f"Invalid URL format: {target_url}")
+
+    secret_key = record.get("secret_key")
+    generated = None
+    if secret_key is None:
+        secret_key = generated = create_secret_key(key)
+    elif not isinstance(secret_key, str) or key_from_secret_key(secret_key) != key:
+        raise ValueError("secret_key must have the form '<key>_<random>'")
+
+    clicks = int(record.get("clicks", 0))
+    if clicks < 0:
+        raise ValueError("clicks must not be negative")
+    row = (
+        key,
+        hash_secret_key(secret_key),
+        target_url,
+        hash_url(normalize_url(target_url)),
+        parse_bool(record.get("is_active", True)),
+        clicks,
+        parse_datetime(record.get("created_at")) or now,
+        parse_datetime(record.get("expires_at")),
+    )
+    return row, generated
+
+
+def parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp into the naive UTC form timestamps are stored in."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid timestamp: {value}")
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@dataclass
+class ImportCheckpoint:
+    """How far an import got, saved after every committed batch so it can resume.
+
+    offset is the byte offset of the first line not yet committed, and line
+    its line number.
+    """
+    source: str
+    source_size: int
+    offset: int = 0
+    line: int = 1
+    imported: int = 0
+    skipped: int = 0
+    rejected: int = 0
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ImportCheckpoint"]:
+        try:
+            with open(path) as handle:
+                return cls(**json.load(handle))
+        except FileNotFoundError:
+            return None
+
+    def save(self, path: str) -> None:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as handle:
+            json.dump(asdict(self), handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary_path, path)
+
+    def snapshot(self) -> dict:
+        return {"line": self.line, "imported": self.imported, "skipped": self.skipped, "rejected": self.rejected}
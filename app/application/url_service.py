@@ -1,58 +1,225 @@
-from typing import Optional
-from app.domain.entities.url import UrlEntity
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.domain.entities.click import (
+    DIRECT_REFERRER,
+    GRANULARITY_SECONDS,
+    OTHER_REFERRER,
+    UNKNOWN_USER_AGENT,
+    ClickEventKey,
+)
+from app.domain.entities.url import UrlEntity, utcnow
+from app.domain.exceptions import DuplicateKeyError
+from app.domain.repositories.click_stats_repository import ClickStatsRepository
 from app.domain.repositories.url_repository import UrlRepository
-from app.utils.keygen import create_random_key
+from app.domain.url_validator import validate_url, validate_urls
+from app.core.key_filter import KeyFilter
+from app.core.local_cache import LocalUrlCache
+from app.application.click_buffer import ClickBuffer
+from app.utils.keygen import create_random_key, create_secret_key
 from app.utils.logging import get_logger
+from app.utils.urls import is_plain_host, normalize_url, referrer_host
+from app.utils.user_agents import user_agent_family
 
 logger = get_logger()
 
 
+def build_click_event(key: str, referrer: Optional[str], user_agent: Optional[str]) -> ClickEventKey:
+    host = referrer_host(referrer)
+    if host is None:
+        host = DIRECT_REFERRER
+    elif not is_plain_host(host):
+        host = OTHER_REFERRER
+    return ClickEventKey(
+        key=key,
+        minute_start=int(time.time()) // 60 * 60,
+        referrer_host=host,
+        user_agent_family=user_agent_family(user_agent) or UNKNOWN_USER_AGENT
+    )
+
+
+@dataclass
+class BulkCreateResult:
+    """Outcome of one item in a bulk create: either the stored entity or an error."""
+    index: int
+    target_url: str
+    url_entity: Optional[UrlEntity] = None
+    error: Optional[str] = None
+    duplicate: bool = False
+
+
+@dataclass
+class ClickStats:
+    """Clicks for one short URL over a time range, per bucket and per dimension value."""
+    granularity: str
+    start: int
+    end: int
+    total_clicks: int = 0
+    buckets: Dict[int, int] = field(default_factory=dict)
+    referrers: Dict[str, int] = field(default_factory=dict)
+    user_agents: Dict[str, int] = field(default_factory=dict)
+
+
 class UrlService:
     """Application service for URL operations."""
 
-    def __init__(self, url_repository: UrlRepository):
+    key_length = 8
+    extended_key_length = 12
+    max_key_attempts = 10
+
+    def __init__(
+            self,
+            url_repository: UrlRepository,
+            url_cache: Optional[LocalUrlCache] = None,
+            click_buffer: Optional[ClickBuffer] = None,
+            deduplicate: bool = False,
+            click_events: Optional[ClickBuffer] = None,
+            click_stats_repository: Optional[ClickStatsRepository] = None,
+            max_stats_buckets: int = 1500,
+            key_filter: Optional[KeyFilter] = None
+    ):
         self.url_repository = url_repository
+        self.url_cache = url_cache
+        self.click_buffer = click_buffer
+        self.deduplicate = deduplicate
+        self.click_events = click_events
+        self.click_stats_repository = click_stats_repository
+        self.max_stats_buckets = max_stats_buckets
+        self.key_filter = key_filter
+
+    async def find_existing_urls(self, target_urls: List[str]) -> Dict[str, UrlEntity]:
+        """Map target URLs to active short URLs that already point at them when dedup is enabled."""
+        if not self.deduplicate or not target_urls:
+            return {}
+        matches = await self.url_repository.get_by_target_urls(target_urls)
+        existing = {}
+        for target_url in target_urls:
+            url_entity = matches.get(normalize_url(target_url))
+            if url_entity and url_entity.expires_at is None:
+                existing[target_url] = url_entity
+        if existing:
+            logger.info("Reusing existing short URLs for repeated targets", count=len(existing))
+        return existing
 
-    def create_short_url(self, target_url: str) -> UrlEntity:
+    async def create_short_url(self, target_url: str, expires_at: Optional[datetime] = None) -> UrlEntity:
         logger.info("Creating short URL", target_url=target_url)
-        key = self._generate_unique_key()
-        secret_key = f"{key}_{create_random_key(length=8)}"
+        self._validate_url(target_url)
+        for attempt in range(self.max_key_attempts * 2):
+            length = self.key_length if attempt < self.max_key_attempts else self.extended_key_length
+            key = self._new_key(length)
+            url_entity = self._create_url_entity(target_url, key, self._create_secret_key(key), expires_at)
+            try:
+                result = await self.url_repository.create(url_entity)
+            except DuplicateKeyError:
+                logger.warning("Generated key collided, retrying", key=key, attempt=attempt)
+                continue
+            await self._remember_key(key)
+            logger.info("Successfully created short URL", key=key, target_url=target_url)
+            return result
 
-        url_entity = self._create_url_entity(target_url, key, secret_key)
-        self._validate_url(url_entity, target_url)
+        raise Exception("Unable to generate unique key after multiple attempts. Namespace may be exhausted.")
 
-        result = self.url_repository.create(url_entity)
-        logger.info("Successfully created short URL", key=key, target_url=target_url)
-        return result
+    async def create_short_urls(self, target_urls: List[str]) -> List[BulkCreateResult]:
+        logger.info("Creating short URLs in bulk", count=len(target_urls))
+        results = [BulkCreateResult(index=index, target_url=target_url) for index, target_url in enumerate(target_urls)]
 
-    def create_custom_short_url(self, target_url: str, custom_key: str) -> UrlEntity:
-        logger.info("Creating custom short URL", target_url=target_url, custom_key=custom_key)
-        existing_url = self.url_repository.get_by_key(custom_key)
-        if existing_url:
-            logger.warning("Attempt to create duplicate custom key", custom_key=custom_key)
-            raise ValueError(f"Key '{custom_key}' already exists")
+        pending: List[BulkCreateResult] = []
+        for result, is_valid in zip(results, validate_urls(target_urls)):
+            if is_valid:
+                pending.append(result)
+            else:
+                result.error = f"Invalid URL format: {result.target_url}"
+
+        repeats = []
+        if self.deduplicate and pending:
+            existing = await self.find_existing_urls([result.target_url for result in pending])
+            first_by_url: Dict[str, BulkCreateResult] = {}
+            unique = []
+            for result in pending:
+                normalized = normalize_url(result.target_url)
+                if result.target_url in existing:
+                    result.url_entity = existing[result.target_url]
+                    result.duplicate = True
+                elif normalized in first_by_url:
+                    repeats.append((result, first_by_url[normalized]))
+                else:
+                    first_by_url[normalized] = result
+                    unique.append(result)
+            pending = unique
+
+        for attempt in range(self.max_key_attempts * 2):
+            if not pending:
+                break
+            length = self.key_length if attempt < self.max_key_attempts else self.extended_key_length
+            by_key: Dict[str, BulkCreateResult] = {}
+            for result in pending:
+                key = self._new_key(length)
+                while key in by_key:
+                    key = self._new_key(length)
+                by_key[key] = result
+
+            url_entities = [
+                self._create_url_entity(result.target_url, key, self._create_secret_key(key))
+                for key, result in by_key.items()
+            ]
+            for url_entity in await self.url_repository.create_many(url_entities):
+                by_key.pop(url_entity.key).url_entity = url_entity
+                await self._remember_key(url_entity.key)
+
+            pending = list(by_key.values())
+            if pending:
+                logger.warning("Generated keys collided in bulk create, retrying", collisions=len(pending), attempt=attempt)
 
-        secret_key = f"{custom_key}_{create_random_key(length=8)}"
-        url_entity = self._create_url_entity(target_url, custom_key, secret_key)
-        self._validate_url(url_entity, target_url)
+        for result in pending:
+            result.error = "Unable to generate unique key after multiple attempts. Namespace may be exhausted."
+        for result, first in repeats:
+            result.url_entity = first.url_entity
+            result.error = first.error
+            result.duplicate = True
 
-        result = self.url_repository.create(url_entity)
+        logger.info("Finished bulk create", count=len(results), failed=sum(1 for result in results if result.error))
+        return results
+
+    async def create_custom_short_url(
+            self,
+            target_url: str,
+            custom_key: str,
+            expires_at: Optional[datetime] = None
+    ) -> UrlEntity:
+        logger.info("Creating custom short URL", target_url=target_url, custom_key=custom_key)
+        self._validate_url(target_url)
+        url_entity = self._create_url_entity(
+            target_url, custom_key, self._create_secret_key(custom_key), expires_at
+        )
+
+        result = await self.url_repository.create_if_absent(url_entity)
+        if result is None:
+            logger.warning("Attempt to create duplicate custom key", custom_key=custom_key)
+            raise DuplicateKeyError(custom_key)
+        await self._remember_key(custom_key)
         logger.info("Successfully created custom short URL", custom_key=custom_key, target_url=target_url)
         return result
 
-    def get_url_by_key(self, key: str) -> Optional[UrlEntity]:
-        logger.info("Retrieving URL by key", key=key)
-        url_entity = self.url_repository.get_by_key(key)
-        if url_entity and url_entity.is_active:
-            logger.info("Found active URL for key", key=key)
+    async def get_url_by_key(self, key: str) -> Optional[UrlEntity]:
+        cached = self.url_cache is not None and key in self.url_cache
+        if self.key_filter and not cached and await self.key_filter.definitely_absent(key):
+            logger.info("Key rejected by key filter", key=key, sample=True)
+            return None
+        if self.url_cache:
+            url_entity = await self.url_cache.get_or_load(key, self.url_repository.get_by_key)
+        else:
+            url_entity = await self.url_repository.get_by_key(key)
+        if url_entity and url_entity.is_active and not url_entity.is_expired():
+            logger.debug("Found active URL for key", key=key, sample=True)
             return url_entity
         else:
-            logger.info("No active URL found for key", key=key)
+            logger.info("No active URL found for key", key=key, sample=True)
             return None
 
-    def get_url_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+    async def get_url_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
         logger.info("Retrieving URL by secret key", secret_key_preview=secret_key[:8])
-        url_entity = self.url_repository.get_by_secret_key(secret_key)
+        url_entity = await self.url_repository.get_by_secret_key(secret_key)
         if url_entity and url_entity.is_active:
             logger.info("Found active URL for secret key", secret_key_preview=secret_key[:8])
             return url_entity
@@ -60,48 +227,138 @@ class UrlService:
             logger.info("No active URL found for secret key", secret_key_preview=secret_key[:8])
             return None
 
-    def increment_click_count(self, url_entity: UrlEntity) -> UrlEntity:
-        logger.info("Incrementing click count", url_key=url_entity.key)
+    async def list_urls(self, after: Optional[str], limit: int) -> Tuple[List[UrlEntity], Optional[str]]:
+        """Return one page of URLs ordered by key and the key to continue after, if any."""
+        url_entities = await self.url_repository.list_page(after, limit + 1)
+        next_after = url_entities[limit - 1].key if len(url_entities) > limit else None
+        return url_entities[:limit], next_after
+
+    def stream_urls(self, chunk_size: int) -> AsyncIterator[List[UrlEntity]]:
+        return self.url_repository.stream_all(chunk_size)
+
+    async def increment_click_count(
+            self,
+            url_entity: UrlEntity,
+            referrer: Optional[str] = None,
+            user_agent: Optional[str] = None
+    ) -> UrlEntity:
         url_entity.increment_clicks()
-        result = self.url_repository.update(url_entity)
-        logger.info("Updated click count", url_key=url_entity.key, new_clicks=result.clicks)
-        return result
+        if self.click_events is not None and self.click_stats_repository is not None:
+            event = build_click_event(url_entity.key, referrer, user_agent)
+            if self.click_events.add(event):
+                logger.info("Click event buffer full, flushing inline", pending_keys=len(self.click_events))
+                await self.click_events.flush(self.click_stats_repository.add_events)
+        if self.click_buffer is None:
+            await self.url_repository.increment_clicks({url_entity.key: 1})
+        elif self.click_buffer.add(url_entity.key):
+            logger.info("Click buffer full, flushing inline", pending_keys=len(self.click_buffer))
+            await self.click_buffer.flush(self.url_repository.increment_clicks)
+        logger.debug("Updated click count", url_key=url_entity.key, new_clicks=url_entity.clicks, sample=True)
+        return url_entity
+
+    async def get_click_stats(
+            self,
+            url_entity: UrlEntity,
+            granularity: str,
+            start: int,
+            end: int
+    ) -> ClickStats:
+        """Sum the rolled-up clicks for a URL whose buckets start in [start, end)."""
+        if self.click_stats_repository is None:
+            raise ValueError("Click analytics are disabled")
+        seconds = GRANULARITY_SECONDS.get(granularity)
+        if seconds is None:
+            raise ValueError(f"Unknown granularity '{granularity}'")
+        start -= start % seconds
+        if end <= start:
+            raise ValueError("The range end must be after its start")
+        if (end - start) / seconds > self.max_stats_buckets:
+            raise ValueError(f"The range spans more than {self.max_stats_buckets} {granularity} buckets")
 
-    def delete_url_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        stats = ClickStats(granularity=granularity, start=start, end=end)
+        for rollup in await self.click_stats_repository.get_rollups(url_entity.key, granularity, start, end):
+            if rollup.dimension == "total":
+                stats.buckets[rollup.bucket_start] = rollup.clicks
+                stats.total_clicks += rollup.clicks
+            elif rollup.dimension == "referrer":
+                stats.referrers[rollup.value] = stats.referrers.get(rollup.value, 0) + rollup.clicks
+            elif rollup.dimension == "user_agent":
+                stats.user_agents[rollup.value] = stats.user_agents.get(rollup.value, 0) + rollup.clicks
+        return stats
+
+    async def delete_url_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
         logger.info("Deactivating URL by secret key", secret_key_preview=secret_key[:8])
-        url_entity = self.url_repository.get_by_secret_key(secret_key)
-        if url_entity:
-            url_entity.deactivate()
-            result = self.url_repository.update(url_entity)
+        result = await self.url_repository.deactivate_by_secret_key(secret_key)
+        if result:
+            if self.url_cache:
+                await self.url_cache.invalidate(result.key)
             logger.info("Successfully deactivated URL", secret_key_preview=secret_key[:8])
             return result
         logger.warning("Attempt to deactivate non-existent URL", secret_key_preview=secret_key[:8])
         return None
 
-    def _generate_unique_key(self, max_attempts: int = 10) -> str:
-        for _ in range(max_attempts):
-            key = create_random_key()
-            if not self.url_repository.get_by_key(key):
-                return key
+    async def reap_expired_urls(self, batch_size: int) -> int:
+        """Deactivate one batch of expired URLs and evict them from every cache."""
+        keys = await self.url_repository.deactivate_expired(utcnow(), batch_size)
+        if self.url_cache:
+            for key in keys:
+                await self.url_cache.invalidate(key)
+        if keys:
+            logger.info("Deactivated expired URLs", count=len(keys))
+        return len(keys)
+
+    async def warm_caches(
+            self,
+            limit: int,
+            chunk_size: int,
+            clicks_since: Optional[int] = None
+    ) -> AsyncIterator[int]:
+        """Load the `limit` hottest URLs into the caches, yielding the size of each chunk read.
+
+        A cached repository stores every chunk in Redis as it streams past; the
+        in-process cache is filled here. A chunk that was read while some URL
+        got invalidated is kept out of the in-process cache, as it may hold the
+        old entity.
+        """
+        generation = self.url_cache.generation if self.url_cache else 0
+        async for url_entities in self.url_repository.stream_hottest(limit, chunk_size, clicks_since):
+            if self.url_cache:
+                self.url_cache.preload(url_entities, generation)
+                generation = self.url_cache.generation
+            yield len(url_entities)
 
-        extended_key = create_random_key(length=12)
-        attempts = 0
-        while self.url_repository.get_by_key(extended_key) and attempts < max_attempts:
-            extended_key = create_random_key(length=12)
-            attempts += 1
+    def _create_secret_key(self, key: str) -> str:
+        return create_secret_key(key)
 
-        if self.url_repository.get_by_key(extended_key):
-            raise Exception("Unable to generate unique key after multiple attempts. Namespace may be exhausted.")
+    def _new_key(self, length: int) -> str:
+        """Generate a key, skipping candidates the key filter says may already be taken."""
+        key = create_random_key(length=length)
+        if self.key_filter and self.key_filter.ready:
+            for _ in range(self.max_key_attempts):
+                if not self.key_filter.might_contain(key):
+                    break
+                key = create_random_key(length=length)
+        return key
 
-        return extended_key
+    async def _remember_key(self, key: str) -> None:
+        if self.key_filter:
+            await self.key_filter.add(key)
 
-    def _create_url_entity(self, target_url: str, key: str, secret_key: str) -> UrlEntity:
+    def _create_url_entity(
+            self,
+            target_url: str,
+            key: str,
+            secret_key: str,
+            expires_at: Optional[datetime] = None
+    ) -> UrlEntity:
         return UrlEntity(
-            target_url=target_url,
+            target_url=normalize_url(target_url) if self.deduplicate else target_url,
             key=key,
-            secret_key=secret_key
+            secret_key=secret_key,
+            created_at=utcnow(),
+            expires_at=expires_at
         )
 
-    def _validate_url(self, url_entity: UrlEntity, target_url: str) -> None:
-        if not url_entity.validate_url():
+    def _validate_url(self, target_url: str) -> None:
+        if not validate_url(target_url):
             raise ValueError(f"Invalid URL format: {target_url}")
\ No newline at end of file
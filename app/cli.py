@@ -0,0 +1,293 @@
+"""Bulk import and export of short URLs, for migrations and backups.
+
+    python -m app.cli import links.csv --workers 8
+    python -m app.cli import links.ndjson --format ndjson --batch-size 50000
+    python -m app.cli export urls.csv --format csv
+    python -m app.cli rebalance
+
+import reads CSV with a header row, or NDJSON, one record per line. Records
+need key and target_url and may carry secret_key, is_active, clicks,
+created_at and expires_at; other fields such as the url column of an export
+are ignored. Records are parsed and validated by a pool of worker processes,
+then loaded with COPY on Postgres or multi-row INSERTs elsewhere. Keys that
+already exist are skipped.
+
+Only hashes of secret keys are stored, so the secret keys generated for
+records without one are appended to --secrets-out (created with mode 0600)
+before each batch commits. Rejected and skipped lines go to --rejects-out. A
+checkpoint is saved after every batch; running the same command again
+resumes after the last committed batch, and --restart starts over.
+
+export streams the urls table in chunks to a file, or stdout for "-".
+
+rebalance moves URLs to the shards that own them after shards were appended
+to DB_SHARD_URLS, with DB_SHARD_PREVIOUS_COUNT set to the shard count before.
+The service keeps serving meanwhile. Logs go to stderr.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from collections import deque
+from contextlib import AsyncExitStack
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Tuple, Union
+
+from app.application.url_import import (
+    IMPORT_COLUMNS,
+    IMPORT_FORMATS,
+    KEY_INDEX,
+    ImportCheckpoint,
+    PreparedBatch,
+    prepare_batch,
+)
+from app.core.cache import get_redis
+from app.core.config import get_settings
+from app.core.key_filter import KeyFilterBus, RecentKeys, get_key_filter, recent_keys_for
+from app.database import dispose_engine, get_shard_pool, init_engine
+from app.dependencies.container import get_container
+from app.infrastructure.repositories import (
+    CachedUrlRepository,
+    ShardRebalancer,
+    ShardedUrlBulkLoader,
+    UrlBulkLoader,
+)
+from app.utils.logging import configure_logging, get_logger, shutdown_logging
+
+logger = get_logger()
+
+REQUIRED_FIELDS = ("key", "target_url")
+
+# (first line number, raw lines, byte offset just past the last line)
+RawBatch = Tuple[int, List[bytes], int]
+BulkLoader = Union[UrlBulkLoader, ShardedUrlBulkLoader]
+
+
+def read_batches(handle: BinaryIO, batch_size: int, first_line: int) -> Iterator[RawBatch]:
+    lines: List[bytes] = []
+    for line in handle:
+        lines.append(line)
+        if len(lines) == batch_size:
+            yield first_line, lines, handle.tell()
+            first_line += len(lines)
+            lines = []
+    if lines:
+        yield first_line, lines, handle.tell()
+
+
+def read_header(handle: BinaryIO) -> List[str]:
+    header = next(csv.reader([handle.readline().decode("utf-8-sig")]), [])
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise SystemExit(f"CSV header is missing {', '.join(missing)}")
+    return header
+
+
+async def open_loader(stack: AsyncExitStack) -> BulkLoader:
+    shards = get_shard_pool()
+    if shards is None:
+        return UrlBulkLoader(await stack.enter_async_context(get_container().session()))
+    if shards.rebalancing:
+        raise SystemExit("Finish the shard rebalance and unset DB_SHARD_PREVIOUS_COUNT before importing")
+    return ShardedUrlBulkLoader(shards, [
+        UrlBulkLoader(await stack.enter_async_context(shards.session(index))) for index in range(len(shards))
+    ])
+
+
+async def open_url_cache(stack: AsyncExitStack) -> Optional[CachedUrlRepository]:
+    if not get_settings().cache_enabled:
+        return None
+    # The session is only needed to build the repository; invalidating never touches it.
+    return get_container().url_repository(await stack.enter_async_context(get_container().session()))
+
+
+def open_append(path: str, mode: int = 0o644) -> TextIO:
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, mode), "a", newline="")
+
+
+class UrlImport:
+    """One run of the import command; see the module docstring."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.source = os.path.abspath(args.input)
+        self.checkpoint_path = args.checkpoint or f"{self.source}.checkpoint"
+        self.checkpoint = self._load_checkpoint()
+        self.announcer: Optional[KeyFilterBus] = None
+        self.recent_keys: Optional[RecentKeys] = None
+        settings = get_settings()
+        if settings.key_filter_active:
+            # Running workers would otherwise answer 404 for imported keys until their next filter rebuild.
+            self.recent_keys = recent_keys_for(get_redis())
+            self.announcer = KeyFilterBus(get_redis(), settings.key_filter_channel, get_key_filter(), self.recent_keys)
+
+    async def run(self) -> ImportCheckpoint:
+        args = self.args
+        loop = asyncio.get_running_loop()
+        with open(self.source, "rb") as handle, \
+                open_append(args.secrets_out or f"{self.source}.secrets.csv", 0o600) as secrets_out, \
+                open_append(args.rejects_out or f"{self.source}.rejects.ndjson") as rejects_out, \
+                ProcessPoolExecutor(max_workers=args.workers) as pool:
+            header = read_header(handle) if args.format == "csv" else None
+            if self.checkpoint.offset == 0:
+                self.checkpoint.offset = handle.tell()
+                self.checkpoint.line = 2 if header else 1
+            handle.seek(self.checkpoint.offset)
+            if secrets_out.tell() == 0:
+                secrets_out.write("key,secret_key\r\n")
+
+            async with AsyncExitStack() as stack:
+                loader = await open_loader(stack)
+                url_cache = await open_url_cache(stack)
+                # Up to two batches per worker are validated ahead of the one being loaded.
+                pending = deque()
+                for first_line, lines, end_offset in read_batches(handle, args.batch_size, self.checkpoint.line):
+                    prepared = loop.run_in_executor(pool, prepare_batch, lines, first_line, args.format, header)
+                    pending.append((prepared, first_line + len(lines), end_offset))
+                    if len(pending) >= args.workers * 2:
+                        await self._load(loader, url_cache, secrets_out, rejects_out, *pending.popleft())
+                while pending:
+                    await self._load(loader, url_cache, secrets_out, rejects_out, *pending.popleft())
+        logger.info("Import finished", source=self.source, **self.checkpoint.snapshot())
+        return self.checkpoint
+
+    async def _load(
+            self,
+            loader: BulkLoader,
+            url_cache: Optional[CachedUrlRepository],
+            secrets_out: TextIO,
+            rejects_out: TextIO,
+            prepared: "asyncio.Future[PreparedBatch]",
+            next_line: int,
+            end_offset: int
+    ) -> None:
+        batch = await prepared
+        try:
+            inserted = set(await loader.insert(IMPORT_COLUMNS, batch.rows))
+            # The secret keys must be on disk before the rows commit: only their hashes are stored.
+            writer = csv.writer(secrets_out)
+            writer.writerows((key, batch.secret_keys[key]) for key in inserted if key in batch.secret_keys)
+            secrets_out.flush()
+            os.fsync(secrets_out.fileno())
+            await loader.commit()
+        except BaseException:
+            await loader.rollback()
+            raise
+
+        skipped = [line for line, row in zip(batch.row_lines, batch.rows) if row[KEY_INDEX] not in inserted]
+        rejects = batch.rejects + [(line, "Key already exists") for line in skipped]
+        rejects_out.writelines(json.dumps({"line": line, "error": error}) + "\n" for line, error in sorted(rejects))
+        rejects_out.flush()
+
+        checkpoint = self.checkpoint
+        checkpoint.offset = end_offset
+        checkpoint.line = next_line
+        checkpoint.imported += len(inserted)
+        checkpoint.skipped += len(skipped)
+        checkpoint.rejected += len(batch.rejects)
+        checkpoint.save(self.checkpoint_path)
+        if url_cache is not None and inserted:
+            # Like the create paths, so a key that 404'd shortly before isn't served from its negative entry.
+            await url_cache.invalidate_many(list(inserted))
+        if self.announcer is not None and inserted:
+            await self.recent_keys.add_many(inserted)
+            await self.announcer.publish_many(list(inserted))
+        logger.info("Imported batch", **checkpoint.snapshot())
+
+    def _load_checkpoint(self) -> ImportCheckpoint:
+        source_size = os.path.getsize(self.source)
+        checkpoint = None if self.args.restart else ImportCheckpoint.load(self.checkpoint_path)
+        if checkpoint is None:
+            return ImportCheckpoint(source=self.source, source_size=source_size)
+        if checkpoint.source != self.source or checkpoint.source_size != source_size:
+            raise SystemExit(
+                f"{self.checkpoint_path} was written for a different input; pass --restart to start over"
+            )
+        logger.info("Resuming import", source=self.source, **checkpoint.snapshot())
+        return checkpoint
+
+
+async def import_urls(args: argparse.Namespace) -> None:
+    init_engine()
+    try:
+        await UrlImport(args).run()
+    finally:
+        await dispose_engine()
+        if get_settings().cache_enabled:
+            await get_redis().aclose()
+
+
+async def export_urls(args: argparse.Namespace) -> None:
+    # Imported here: the export renderer lives with the API and pulls in FastAPI.
+    from app.api.v1.urls import stream_export
+
+    init_engine()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        async for chunk in stream_export(args.format, args.chunk_size):
+            output.write(chunk)
+    finally:
+        output.flush()
+        if output is not sys.stdout:
+            output.close()
+        await dispose_engine()
+
+
+async def rebalance_shards(args: argparse.Namespace) -> None:
+    init_engine()
+    try:
+        shards = get_shard_pool()
+        if shards is None:
+            raise SystemExit("DB_SHARD_URLS is not set")
+        rebalancer = ShardRebalancer(shards)
+        moved = 0
+        while not rebalancer.done:
+            moved += await rebalancer.run_batch(args.batch_size)
+            logger.info("Rebalancing shards", moved=moved)
+        logger.info("Rebalance finished; unset DB_SHARD_PREVIOUS_COUNT and restart the workers", moved=moved)
+    finally:
+        await dispose_engine()
+
+
+COMMANDS = {"import": import_urls, "export": export_urls, "rebalance": rebalance_shards}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Load short URLs from CSV or NDJSON")
+    import_parser.add_argument("input", help="CSV or NDJSON file")
+    import_parser.add_argument("--format", choices=IMPORT_FORMATS, default="csv")
+    import_parser.add_argument("--batch-size", type=int, default=10000, help="Lines per worker task and commit")
+    import_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Validation processes")
+    import_parser.add_argument("--checkpoint", help="Checkpoint file; defaults to <input>.checkpoint")
+    import_parser.add_argument("--secrets-out", help="Generated secret keys; defaults to <input>.secrets.csv")
+    import_parser.add_argument("--rejects-out", help="Rejected lines; defaults to <input>.rejects.ndjson")
+    import_parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+
+    export_parser = commands.add_parser("export", help="Stream the urls table as CSV or NDJSON")
+    export_parser.add_argument("output", help='Output file, or "-" for stdout')
+    export_parser.add_argument("--format", choices=IMPORT_FORMATS, default="ndjson")
+    export_parser.add_argument("--chunk-size", type=int, default=get_settings().export_chunk_size)
+
+    rebalance_parser = commands.add_parser("rebalance", help="Move URLs onto shards added to DB_SHARD_URLS")
+    rebalance_parser.add_argument("--batch-size", type=int, default=1000, help="Keys scanned per batch")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    configure_logging(sys.stderr)
+    try:
+        asyncio.run(COMMANDS[args.command](args))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
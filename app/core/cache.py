@@ -3,11 +3,41 @@ import redis.asyncio as redis
 from .config import get_settings
 
 
+class CacheStats:
+    """Process-wide hit/miss counters for the Redis URL cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def incr(self, name: str) -> None:
+        setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+cache_stats = CacheStats()
+
+
 @lru_cache()
-def get_redis():
+def get_redis() -> redis.Redis:
     settings = get_settings()
-    return redis.from_url(settings.redis_url)
+    return redis.from_url(
+        settings.redis_url,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
 
 
 async def get_cache():
-    return get_redis()
\ No newline at end of file
+    return get_redis()
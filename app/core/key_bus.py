@@ -0,0 +1,78 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import redis.asyncio as redis
+from app.utils.logging import get_logger
+
+logger = get_logger()
+
+
+class RedisKeyBus(ABC):
+    """Broadcasts short URL keys to every worker over a Redis pub/sub channel.
+
+    Subclasses decide what a received key means by implementing on_key, and
+    can hook attach/detach to wire publish into the structure they keep in sync.
+    """
+
+    def __init__(self, redis_client: redis.Redis, channel: str):
+        self.redis = redis_client
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+        self.attach()
+
+    async def stop(self) -> None:
+        self.detach()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def attach(self) -> None:
+        pass
+
+    def detach(self) -> None:
+        pass
+
+    @abstractmethod
+    async def on_key(self, key: str) -> None:
+        pass
+
+    async def publish(self, key: str) -> None:
+        try:
+            await self.redis.publish(self.channel, key)
+        except redis.RedisError as error:
+            logger.warning("Failed to publish key", channel=self.channel, key=key, error=str(error))
+
+    async def publish_many(self, keys: List[str]) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.publish(self.channel, key)
+                await pipeline.execute()
+        except redis.RedisError as error:
+            logger.warning("Failed to publish keys", channel=self.channel, count=len(keys), error=str(error))
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    while True:
+                        message = await pubsub.get_message(timeout=1.0)
+                        if message is not None:
+                            await self._on_message(message)
+            except redis.RedisError as error:
+                logger.warning("Key bus listener error", channel=self.channel, error=str(error))
+                await asyncio.sleep(1.0)
+
+    async def _on_message(self, message: dict) -> None:
+        key = message["data"]
+        if isinstance(key, bytes):
+            key = key.decode()
+        await self.on_key(key)
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import math
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional
+import redis.asyncio as redis
+from app.utils.logging import get_logger
+from .config import get_settings
+from .key_bus import RedisKeyBus
+
+logger = get_logger()
+
+GROWTH_HEADROOM = 1.5
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of one BLAKE2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return ((first + index * second) % size for index in range(self.hash_count))
+
+
+class RecentKeys:
+    """Redis sorted set of the keys created in the last retention_seconds, scored by creation time.
+
+    Pub/sub announcements can be lost, so a key filter checks here before it
+    calls a key missing. Any key created since the filter's scan started is
+    found, as long as the filter is younger than the retention.
+    """
+
+    def __init__(self, redis_client: redis.Redis, name: str, retention_seconds: float):
+        self.redis = redis_client
+        self.name = name
+        self.retention_seconds = retention_seconds
+
+    async def add_many(self, keys: Iterable[str]) -> None:
+        now = time.time()
+        mapping = {key: now for key in keys}
+        if not mapping:
+            return
+        try:
+            await self.redis.zadd(self.name, mapping)
+        except redis.RedisError as error:
+            logger.warning("Failed to record new keys", count=len(mapping), error=str(error))
+
+    async def contains(self, key: str) -> bool:
+        """Whether the key was created recently. Redis errors count as yes, so lookups fall through."""
+        try:
+            return await self.redis.zscore(self.name, key) is not None
+        except redis.RedisError as error:
+            logger.warning("Failed to check recent keys", key=key, error=str(error), sample=True)
+            return True
+
+    async def trim(self) -> None:
+        try:
+            await self.redis.zremrangebyscore(self.name, "-inf", time.time() - self.retention_seconds)
+        except redis.RedisError as error:
+            logger.warning("Failed to trim recent keys", error=str(error))
+
+
+class KeyFilter:
+    """Answers "this key was never created" without touching the cache or database.
+
+    Until the first build finishes every key may exist, so callers fall back to
+    the normal lookup. A key the filter hasn't seen is only reported missing
+    once RecentKeys confirms it wasn't created since the last scan began, since
+    announcements from other workers are best effort. A filter older than the
+    recent-key retention, after failed rebuilds, isn't trusted at all.
+    Deactivated keys stay in the filter until the next rebuild, which only
+    costs a lookup, never a wrong 404.
+    """
+
+    def __init__(self, error_rate: float, min_capacity: int):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.publisher: Optional[Callable[[str], Awaitable[None]]] = None
+        self.recent_keys: Optional[RecentKeys] = None
+        self.rejections = 0
+        self._filter: Optional[BloomFilter] = None
+        self._scan_started = 0.0
+        self._added_during_build: Optional[List[str]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def might_contain(self, key: str) -> bool:
+        bloom = self._filter
+        return bloom is None or self._stale() or key in bloom
+
+    async def definitely_absent(self, key: str) -> bool:
+        if self.might_contain(key):
+            return False
+        if self.recent_keys is not None and await self.recent_keys.contains(key):
+            return False
+        self.rejections += 1
+        return True
+
+    async def add(self, key: str, propagate: bool = True) -> None:
+        if self._filter is not None:
+            self._filter.add(key)
+        if self._added_during_build is not None:
+            self._added_during_build.append(key)
+        if propagate:
+            if self.recent_keys is not None:
+                await self.recent_keys.add_many([key])
+            if self.publisher:
+                await self.publisher(key)
+
+    async def rebuild(self, expected_keys: int, key_chunks: AsyncIterator[List[str]]) -> None:
+        """Build a new filter from a full scan and swap it in.
+
+        Keys added while the scan runs are replayed into the new filter so a
+        create racing the rebuild is never lost.
+        """
+        scan_started = time.time()
+        self._added_during_build = []
+        try:
+            bloom = BloomFilter(max(self.min_capacity, int(expected_keys * GROWTH_HEADROOM)), self.error_rate)
+            async for keys in key_chunks:
+                for key in keys:
+                    bloom.add(key)
+            for key in self._added_during_build:
+                bloom.add(key)
+        finally:
+            self._added_during_build = None
+        self._filter = bloom
+        self._scan_started = scan_started
+        logger.info("Rebuilt key filter", keys=bloom.count, capacity=bloom.capacity, size_bytes=len(bloom.bits))
+        if self.recent_keys is not None:
+            await self.recent_keys.trim()
+
+    def _stale(self) -> bool:
+        recent_keys = self.recent_keys
+        return recent_keys is not None and time.time() - self._scan_started > recent_keys.retention_seconds
+
+    def snapshot(self) -> dict:
+        bloom = self._filter
+        return {
+            "ready": bloom is not None,
+            "stale": bloom is not None and self._stale(),
+            "keys": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "rejections": self.rejections,
+        }
+
+
+class KeyFilterBus(RedisKeyBus):
+    """Shares newly created keys with the key filters of every worker."""
+
+    def __init__(self, redis_client: redis.Redis, channel: str, key_filter: KeyFilter, recent_keys: RecentKeys):
+        super().__init__(redis_client, channel)
+        self.key_filter = key_filter
+        self.recent_keys = recent_keys
+
+    def attach(self) -> None:
+        self.key_filter.publisher = self.publish
+        self.key_filter.recent_keys = self.recent_keys
+
+    def detach(self) -> None:
+        self.key_filter.publisher = None
+        self.key_filter.recent_keys = None
+
+    async def on_key(self, key: str) -> None:
+        await self.key_filter.add(key, propagate=False)
+
+
+class KeyFilterRebuilder:
+    """Builds the key filter at startup and rebuilds it on an interval.
+
+    Rebuilding drops deactivated keys and picks up any announcement a worker
+    missed while disconnected from Redis.
+    """
+
+    def __init__(self, rebuild: Callable[[], Awaitable[None]], interval_seconds: float):
+        self.rebuild = rebuild
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as error:
+                logger.error("Failed to rebuild key filter", error=str(error))
+            await asyncio.sleep(self.interval_seconds)
+
+
+def recent_keys_for(redis_client: redis.Redis) -> RecentKeys:
+    settings = get_settings()
+    return RecentKeys(
+        redis_client=redis_client,
+        name=f"{settings.key_filter_channel}:recent",
+        # Two rebuild intervals, so one failed rebuild doesn't yet make the filter stale.
+        retention_seconds=settings.key_filter_rebuild_interval_seconds * 2
+    )
+
+
+@lru_cache()
+def get_key_filter() -> KeyFilter:
+    settings = get_settings()
+    return KeyFilter(
+        error_rate=settings.key_filter_error_rate,
+        min_capacity=settings.key_filter_min_capacity
+    )
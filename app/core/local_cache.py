@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import redis.asyncio as redis
+from app.domain.entities.url import UrlEntity
+from app.utils.urls import encode_location
+from .config import get_settings
+from .key_bus import RedisKeyBus
+
+Loader = Callable[[str], Awaitable[Optional[UrlEntity]]]
+
+
+class LocalUrlCache:
+    """Bounded in-process LRU cache of active URL entities with a TTL.
+
+    Concurrent misses for the same key are coalesced so only one caller runs
+    the loader; the others await its result. Each entry also keeps the encoded
+    Location header so the redirect fast path can answer without building
+    anything per request.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.publisher: Optional[Callable[[str], Awaitable[None]]] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+
+    async def get_or_load(self, key: str, loader: Loader) -> Optional[UrlEntity]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, url_entity, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return replace(url_entity)
+            del self._entries[key]
+
+        self.misses += 1
+        flight = self._inflight.get(key)
+        if flight is not None:
+            try:
+                result = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                result = await loader(key)
+            return replace(result) if result else None
+
+        flight = self._inflight[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            result = await loader(key)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            flight.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        flight.set_result(result)
+        if result is not None and generation == self._generation:
+            self._put(key, result)
+        return replace(result) if result else None
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def peek(self, key: str) -> Optional[Tuple[UrlEntity, bytes]]:
+        """Return the cached entity and its encoded Location without loading on a miss.
+
+        The entity is the cached instance, not a copy, so callers must not modify it.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; preload() uses it to drop entities loaded before one."""
+        return self._generation
+
+    def preload(self, url_entities: List[UrlEntity], generation: int) -> int:
+        """Add entities ahead of any request for them and return how many were added.
+
+        Nothing is added if an invalidation happened since `generation` was
+        read, and nothing is evicted: keys already cached stay as they are and
+        preloading stops once the cache is full, so callers pass the hottest
+        entities first.
+        """
+        if generation != self._generation:
+            return 0
+        added = 0
+        for url_entity in url_entities:
+            if len(self._entries) >= self.max_size:
+                break
+            if url_entity.key in self._entries:
+                continue
+            self._put(url_entity.key, url_entity)
+            added += 1
+        return added
+
+    async def invalidate(self, key: str, propagate: bool = True) -> None:
+        self._entries.pop(key, None)
+        self._generation += 1
+        if propagate and self.publisher:
+            await self.publisher(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generation += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _put(self, key: str, url_entity: UrlEntity) -> None:
+        self._entries[key] = (
+            time.monotonic() + self.ttl_seconds,
+            replace(url_entity),
+            encode_location(url_entity.target_url)
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class CacheInvalidationBus(RedisKeyBus):
+    """Broadcasts local cache invalidations to every worker over Redis pub/sub."""
+
+    def __init__(self, redis_client: redis.Redis, channel: str, local_cache: LocalUrlCache):
+        super().__init__(redis_client, channel)
+        self.local_cache = local_cache
+
+    def attach(self) -> None:
+        self.local_cache.publisher = self.publish
+
+    def detach(self) -> None:
+        self.local_cache.publisher = None
+
+    async def on_key(self, key: str) -> None:
+        await self.local_cache.invalidate(key, propagate=False)
+
+
+@lru_cache()
+def get_local_url_cache() -> LocalUrlCache:
+    settings = get_settings()
+    return LocalUrlCache(
+        max_size=settings.local_cache_max_size,
+        ttl_seconds=settings.local_cache_ttl_seconds
+    )
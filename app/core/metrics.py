@@ -0,0 +1,149 @@
+import time
+from prometheus_client import Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "tinyurl_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "tinyurl_stage_duration_seconds",
+    "Time spent in each stage of request handling.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Label children are bound once so timing a stage costs a clock read and an observe.
+CACHE_LOOKUP = STAGE_LATENCY.labels("cache_lookup")
+DB_QUERY = STAGE_LATENCY.labels("db_query")
+DB_COMMIT = STAGE_LATENCY.labels("db_commit")
+RESPONSE_BUILD = STAGE_LATENCY.labels("response_build")
+CLICK_FLUSH = STAGE_LATENCY.labels("click_flush")
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(path: str, route) -> str:
+    """Return the template of the route that served path, including the prefix it is mounted under.
+
+    Depending on the FastAPI version, a router included with a prefix leaves
+    either a copy of the route carrying the prefix or the router's own route
+    in the scope. In the second case the prefix is the part of the path before
+    the route's own match.
+    """
+    template = getattr(route, "path", None)
+    path_regex = getattr(route, "path_regex", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    if path_regex is None or path_regex.match(path):
+        return template
+    start = path.find("/", 1)
+    while start != -1:
+        if path_regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+
+class MetricsMiddleware:
+    """Records request latency per route template.
+
+    The route template rather than the raw path is used as the label so short
+    URL keys don't turn into one time series each.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route_template(scope["path"], scope.get("route")),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+class TinyUrlCollector(Collector):
+    """Exposes pool, cache and click buffer state, read only when scraped."""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        from app.application.click_buffer import get_click_buffer
+        from app.core.cache import cache_stats
+        from app.core.key_filter import get_key_filter
+        from app.core.local_cache import get_local_url_cache
+        from app.core.rate_limit import get_rate_limiter
+        from app.database import get_pool_status
+
+        pool = get_pool_status()
+        if pool["initialized"]:
+            for name in ("size", "checked_in", "checked_out", "overflow"):
+                yield GaugeMetricFamily(f"tinyurl_db_pool_{name}", f"Database pool {name.replace('_', ' ')}.",
+                                        value=pool[name])
+            yield CounterMetricFamily("tinyurl_db_pool_checkouts", "Connections checked out of the pool.",
+                                      value=pool["checkouts"])
+            yield GaugeMetricFamily("tinyurl_db_pool_wait_seconds_max", "Longest wait for a pooled connection.",
+                                    value=pool["wait_seconds_max"])
+            if pool["replicas"]:
+                yield GaugeMetricFamily("tinyurl_db_replicas_healthy", "Read replicas currently taking reads.",
+                                        value=sum(replica["healthy"] for replica in pool["replicas"]))
+
+        cache = cache_stats.snapshot()
+        lookups = CounterMetricFamily("tinyurl_cache_lookups", "Redis URL cache lookups by result.",
+                                      labels=["result"])
+        for result in ("hits", "negative_hits", "misses", "errors"):
+            lookups.add_metric([result], cache[result])
+        yield lookups
+        yield GaugeMetricFamily("tinyurl_cache_hit_ratio", "Share of Redis lookups answered from cache.",
+                                value=cache["hit_ratio"])
+
+        local_cache = get_local_url_cache().snapshot()
+        yield GaugeMetricFamily("tinyurl_local_cache_size", "Entries in the in-process URL cache.",
+                                value=local_cache["size"])
+        local_lookups = CounterMetricFamily("tinyurl_local_cache_lookups", "In-process URL cache lookups by result.",
+                                            labels=["result"])
+        local_lookups.add_metric(["hits"], local_cache["hits"])
+        local_lookups.add_metric(["misses"], local_cache["misses"])
+        yield local_lookups
+
+        key_filter = get_key_filter().snapshot()
+        yield GaugeMetricFamily("tinyurl_key_filter_keys", "Keys in the key filter.", value=key_filter["keys"])
+        yield CounterMetricFamily("tinyurl_key_filter_rejections", "Lookups answered as missing by the key filter.",
+                                  value=key_filter["rejections"])
+
+        rate_limited = CounterMetricFamily("tinyurl_rate_limited_requests", "Requests answered with 429, by limit.",
+                                           labels=["limit"])
+        for name, count in get_rate_limiter().snapshot()["rejected"].items():
+            rate_limited.add_metric([name], count)
+        yield rate_limited
+
+        click_buffer = get_click_buffer()
+        yield GaugeMetricFamily("tinyurl_click_buffer_pending_keys", "Short URL keys with unflushed clicks.",
+                                value=len(click_buffer))
+        yield GaugeMetricFamily("tinyurl_click_flush_lag_seconds", "Age of the oldest click not yet written.",
+                                value=click_buffer.lag_seconds())
+
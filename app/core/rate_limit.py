@@ -0,0 +1,225 @@
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.utils.logging import get_logger
+from .cache import get_redis
+from .config import get_settings
+
+logger = get_logger()
+
+CREATE = "create"
+REDIRECT = "redirect"
+CREATE_PATHS = frozenset({"/url", "/custom_url", "/urls/bulk"})
+NON_REDIRECT_SEGMENTS = frozenset({"", "admin", "docs", "openapi.json"})
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Sustained rate and burst allowance for one class of requests."""
+    per_minute: float
+    burst: int
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60
+
+
+class TokenBuckets:
+    """In-process token buckets per client, bounded as an LRU."""
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, identities: List[str], limit: RateLimit) -> float:
+        """Take one token from each identity's bucket and return 0, or the seconds until all have one.
+
+        Tokens are only taken when every bucket has one, so a request rejected
+        for one identity doesn't drain the others.
+        """
+        now = time.monotonic()
+        available = {}
+        for identity in identities:
+            tokens, updated = self._buckets.get(identity, (float(limit.burst), now))
+            available[identity] = min(float(limit.burst), tokens + (now - updated) * limit.per_second)
+        retry_after = max((1 - tokens) / limit.per_second if tokens < 1 else 0.0 for tokens in available.values())
+        for identity, tokens in available.items():
+            self._buckets[identity] = (tokens if retry_after else tokens - 1, now)
+            self._buckets.move_to_end(identity)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Per-IP and per-API-key limits on creates and redirects.
+
+    Local buckets answer first, so a flooding client is turned away without a
+    network round trip. With Redis enabled, every worker also counts into a
+    shared fixed window per client, which caps the total across workers at the
+    per-minute rate plus burst. Redis errors let the request through.
+    """
+
+    def __init__(
+            self,
+            limits: Dict[str, RateLimit],
+            max_clients: int,
+            redis_client: Optional[redis.Redis] = None,
+            redis_prefix: str = "tinyurl:ratelimit",
+            window_seconds: int = 60
+    ):
+        self.limits = limits
+        self.redis = redis_client
+        self.redis_prefix = redis_prefix
+        self.window_seconds = window_seconds
+        self.buckets = TokenBuckets(max_clients)
+        self.rejected: Dict[str, int] = {name: 0 for name in limits}
+        self.redis_errors = 0
+
+    async def check(self, request_class: str, identities: List[str]) -> float:
+        """Return 0 if the request may proceed, otherwise the Retry-After in seconds."""
+        limit = self.limits[request_class]
+        retry_after = self.buckets.take([f"{request_class}:{identity}" for identity in identities], limit)
+        if not retry_after and self.redis is not None:
+            retry_after = await self._check_shared(request_class, identities, limit)
+        if retry_after:
+            self.rejected[request_class] += 1
+        return retry_after
+
+    async def _check_shared(self, request_class: str, identities: List[str], limit: RateLimit) -> float:
+        now = time.time()
+        window = int(now // self.window_seconds)
+        allowed = limit.per_minute * self.window_seconds / 60 + limit.burst
+        counters = [f"{self.redis_prefix}:{request_class}:{identity}:{window}" for identity in identities]
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for counter in counters:
+                    pipeline.incr(counter)
+                    pipeline.expire(counter, self.window_seconds * 2)
+                counts = (await pipeline.execute())[::2]
+                if max(counts) <= allowed:
+                    return 0.0
+                # A rejected request doesn't count against the identities that were still under the limit.
+                for counter in counters:
+                    pipeline.decr(counter)
+                await pipeline.execute()
+        except RedisError as error:
+            self.redis_errors += 1
+            logger.warning("Shared rate limit check failed", error=str(error), sample=True)
+            return 0.0
+        return (window + 1) * self.window_seconds - now
+
+    def snapshot(self) -> dict:
+        return {
+            "clients": len(self.buckets),
+            "rejected": dict(self.rejected),
+            "redis_errors": self.redis_errors,
+        }
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Map an API path (below the router prefix) to the limit that applies to it."""
+    if method == "POST" and path in CREATE_PATHS:
+        return CREATE
+    if method == "GET" and path.count("/") == 1 and path[1:] not in NON_REDIRECT_SEGMENTS:
+        return REDIRECT
+    return None
+
+
+def forwarded_client_ip(forwarded_for: str, trusted_proxy_hops: int) -> Optional[str]:
+    """The address the outermost trusted proxy appended to an X-Forwarded-For value."""
+    addresses = [address.strip() for address in forwarded_for.split(",") if address.strip()]
+    if not addresses:
+        return None
+    # Fewer entries than proxies means the request skipped some; each entry was still appended by one.
+    return addresses[-min(trusted_proxy_hops, len(addresses))]
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.blake2b(api_key.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class RateLimitMiddleware:
+    """Answers over-limit creates and redirects with 429 before routing.
+
+    Runs ahead of dependency resolution, so a throttled request never opens a
+    database session. Every request is limited by client IP, and requests
+    carrying X-API-Key are additionally limited by that key.
+
+    Behind trusted_proxy_hops proxies, the client IP is the X-Forwarded-For
+    entry the outermost of them appended, counted from the right. Entries
+    further left come from the client and are ignored, since a client could
+    otherwise pick a fresh identity for every request.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "", trusted_proxy_hops: int = 0):
+        self.app = app
+        self.prefix = prefix
+        self.trusted_proxy_hops = trusted_proxy_hops
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        request_class = classify(scope["method"], path[len(self.prefix):])
+        rate_limiter = get_rate_limiter()
+        if request_class not in rate_limiter.limits:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await rate_limiter.check(request_class, self._identities(scope))
+        if retry_after:
+            await self._reject(send, retry_after)
+            return
+        await self.app(scope, receive, send)
+
+    def _identities(self, scope: Scope) -> List[str]:
+        headers = dict(scope["headers"])
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        forwarded_for = headers.get(b"x-forwarded-for")
+        if self.trusted_proxy_hops and forwarded_for:
+            client_ip = forwarded_client_ip(forwarded_for.decode("latin-1"), self.trusted_proxy_hops) or client_ip
+        identities = [f"ip:{client_ip}"]
+        api_key = headers.get(b"x-api-key")
+        if api_key:
+            identities.append(f"key:{hash_api_key(api_key.decode('latin-1'))}")
+        return identities
+
+    @staticmethod
+    async def _reject(send: Send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    settings = get_settings()
+    limits = {CREATE: RateLimit(settings.rate_limit_create_per_minute, settings.rate_limit_create_burst)}
+    if settings.rate_limit_redirects_enabled:
+        limits[REDIRECT] = RateLimit(settings.rate_limit_redirect_per_minute, settings.rate_limit_redirect_burst)
+    return RateLimiter(
+        limits=limits,
+        max_clients=settings.rate_limit_max_clients,
+        redis_client=get_redis() if settings.rate_limit_shared else None
+    )
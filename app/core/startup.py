@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StartupTimer:
+    """Durations of the import and initialization steps of this worker, in order."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "phases_seconds": dict(self.phases),
+            "total_seconds": sum(self.phases.values()),
+        }
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Optional
+from app.utils.logging import get_logger
+from .config import get_settings
+from .startup import startup_timer
+
+logger = get_logger()
+
+CACHE_WARMUP_STRATEGIES = ("clicks", "recent")
+
+Warm = Callable[[], AsyncIterator[int]]
+
+
+class CacheWarmup:
+    """Fills the caches with the hottest URLs once per worker, in the background.
+
+    The worker reports ready on /health once the warm-up finished, failed or
+    ran out of time, so a load balancer only sends it traffic after its
+    caches hold the links most of that traffic asks for. A warm-up that takes
+    too long is cancelled: a worker with partly warm caches beats one that
+    never becomes ready.
+    """
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.state = "pending"
+        self.urls = 0
+        self.seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state not in ("pending", "warming")
+
+    def start(self, warm: Warm) -> None:
+        self.state = "warming"
+        self._task = asyncio.create_task(self._run(warm))
+
+    def skip(self) -> None:
+        self.state = "disabled"
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, warm: Warm) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._consume(warm()), self.timeout_seconds)
+            self.state = "warm"
+        except asyncio.TimeoutError:
+            self.state = "timed_out"
+            logger.warning("Cache warm-up timed out", urls=self.urls, timeout_seconds=self.timeout_seconds)
+        except Exception as error:
+            self.state = "failed"
+            logger.error("Cache warm-up failed", urls=self.urls, error=str(error))
+        finally:
+            self.seconds = time.perf_counter() - started
+            startup_timer.record("cache_warmup", self.seconds)
+        logger.info("Cache warm-up finished", state=self.state, urls=self.urls, seconds=round(self.seconds, 3))
+
+    async def _consume(self, chunks: AsyncIterator[int]) -> None:
+        async for count in chunks:
+            self.urls += count
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "ready": self.ready, "urls": self.urls, "seconds": self.seconds}
+
+
+@lru_cache()
+def get_cache_warmup() -> CacheWarmup:
+    return CacheWarmup(timeout_seconds=get_settings().cache_warmup_timeout_seconds)
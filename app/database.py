@@ -1,13 +1,265 @@
+import time
+from typing import List, Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from .core.config import get_session_local, get_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .core.config import Settings, get_settings
+from .utils.hash_ring import HashRing
+from .utils.logging import get_logger
 
-engine = get_engine()
-SessionLocal = get_session_local
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+logger = get_logger()
+
+_engine: Optional[AsyncEngine] = None
+_session_local: Optional[async_sessionmaker] = None
+_replica_pool: Optional["ReplicaPool"] = None
+_shard_pool: Optional["ShardPool"] = None
+
+
+class PoolStats:
+    """Counters describing how connections are acquired from the pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        if waited > self.wait_seconds_max:
+            self.wait_seconds_max = waited
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited for a connection."""
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        pool_stats.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+class ReplicaPool:
+    """Read replicas taken in round-robin order, skipping any that failed recently.
+
+    A replica that raises is left out for retry_seconds and then tried again,
+    so a restarted replica rejoins without intervention.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], retry_seconds: float):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._session_factories = [
+            async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+            for engine in engines
+        ]
+        self._down_until = [0.0] * len(engines)
+        self._next = 0
+
+    def choose(self) -> Optional[int]:
+        """Return the index of the next healthy replica, or None if all are down."""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = self._next
+            self._next = (index + 1) % len(self.engines)
+            if self._down_until[index] <= now:
+                return index
+        return None
+
+    def session(self, index: int) -> AsyncSession:
+        return self._session_factories[index]()
+
+    def mark_down(self, index: int, error: Exception) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+        logger.warning("Read replica failed, routing around it", replica=index, error=str(error),
+                       retry_seconds=self.retry_seconds)
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+    def snapshot(self) -> List[dict]:
+        now = time.monotonic()
+        return [
+            {"replica": index, "healthy": down_until <= now, "checked_out": engine.pool.checkedout()}
+            for index, (engine, down_until) in enumerate(zip(self.engines, self._down_until))
+        ]
+
+
+class ShardPool:
+    """The databases the urls table is split across, and which shard owns each key.
+
+    Shard 0 is DB_URL, which also keeps every other table, and DB_SHARD_URLS
+    adds shards 1..n in order, so new shards must be appended. Keys are
+    placed by a consistent hash ring. While previous_count is set, the layout
+    is being grown from that many shards: previous_shard_for names where a key
+    lived before, until the rebalance has moved it.
+    """
+
+    def __init__(
+            self,
+            engines: List[AsyncEngine],
+            session_factories: List[async_sessionmaker],
+            virtual_nodes: int,
+            previous_count: int = 0
+    ):
+        if not 0 <= previous_count < len(engines):
+            raise ValueError("DB_SHARD_PREVIOUS_COUNT must be below the number of shards")
+        self.engines = engines
+        self._session_factories = session_factories
+        self.ring = HashRing(len(session_factories), virtual_nodes)
+        self.previous_ring = HashRing(previous_count, virtual_nodes) if previous_count else None
+
+    def __len__(self) -> int:
+        return len(self._session_factories)
+
+    @property
+    def rebalancing(self) -> bool:
+        return self.previous_ring is not None
+
+    def shard_for(self, key: str) -> int:
+        return self.ring.node_for(key)
+
+    def previous_shard_for(self, key: str) -> Optional[int]:
+        """The shard a key lived on before the rebalance, or None if it stays where it is."""
+        if self.previous_ring is None:
+            return None
+        previous = self.previous_ring.node_for(key)
+        return previous if previous != self.ring.node_for(key) else None
+
+    def session(self, index: int) -> AsyncSession:
+        return self._session_factories[index]()
+
+    async def dispose(self) -> None:
+        # Shard 0 is the main engine, which dispose_engine disposes itself.
+        for engine in self.engines[1:]:
+            await engine.dispose()
+
+    def snapshot(self) -> dict:
+        return {
+            "count": len(self),
+            "previous_count": self.previous_ring.node_count if self.previous_ring else None,
+            "checked_out": [engine.pool.checkedout() for engine in self.engines],
+        }
+
+
+def to_async_url(db_url: str) -> str:
+    """Swap a sync driver in a database URL for its asyncio counterpart."""
+    url = make_url(db_url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver is None:
+        return db_url
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def create_db_engine(settings: Settings, db_url: Optional[str] = None) -> AsyncEngine:
+    return create_async_engine(
+        to_async_url(db_url or settings.db_url),
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+    )
+
+
+def init_engine(settings: Optional[Settings] = None) -> AsyncEngine:
+    """Create the process-wide engine, session factory, replica and shard pools if they don't exist yet."""
+    global _engine, _session_local, _replica_pool, _shard_pool
+    if _engine is None:
+        settings = settings or get_settings()
+        _engine = create_db_engine(settings)
+        if settings.db_replica_urls:
+            _replica_pool = ReplicaPool(
+                [create_db_engine(settings, replica_url) for replica_url in settings.db_replica_urls],
+                retry_seconds=settings.db_replica_retry_seconds
+            )
+        _session_local = async_sessionmaker(
+            bind=_engine,
+            autoflush=False,
+            expire_on_commit=False
+        )
+        if settings.db_shard_urls:
+            engines = [create_db_engine(settings, shard_url) for shard_url in settings.db_shard_urls]
+            _shard_pool = ShardPool(
+                engines=[_engine] + engines,
+                session_factories=[_session_local] + [
+                    async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False) for engine in engines
+                ],
+                virtual_nodes=settings.db_shard_virtual_nodes,
+                previous_count=settings.db_shard_previous_count
+            )
+    return _engine
+
+
+async def dispose_engine() -> None:
+    global _engine, _session_local, _replica_pool, _shard_pool
+    if _engine is not None:
+        await _engine.dispose()
+    if _replica_pool is not None:
+        await _replica_pool.dispose()
+    if _shard_pool is not None:
+        await _shard_pool.dispose()
+    _engine = None
+    _session_local = None
+    _replica_pool = None
+    _shard_pool = None
+    pool_stats.reset()
+
+
+def get_session_local() -> async_sessionmaker:
+    init_engine()
+    return _session_local
+
+
+def get_replica_pool() -> Optional[ReplicaPool]:
+    """The read replica pool, or None when DB_REPLICA_URLS is empty."""
+    init_engine()
+    return _replica_pool
+
+
+def get_shard_pool() -> Optional[ShardPool]:
+    """The shard pool, or None when DB_SHARD_URLS is empty and DB_URL holds every URL."""
+    init_engine()
+    return _shard_pool
+
+
+def get_pool_status() -> dict:
+    if _engine is None:
+        return {"initialized": False}
+
+    pool = _engine.pool
+    checkouts = pool_stats.checkouts
+    return {
+        "initialized": True,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "wait_seconds_avg": pool_stats.wait_seconds_total / checkouts if checkouts else 0.0,
+        "wait_seconds_max": pool_stats.wait_seconds_max,
+        "replicas": _replica_pool.snapshot() if _replica_pool else [],
+        "shards": _shard_pool.snapshot() if _shard_pool else None,
+    }
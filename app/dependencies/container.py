@@ -0,0 +1,91 @@
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..application import UrlService
+from ..application.click_buffer import get_click_buffer, get_click_event_buffer
+from ..core.cache import get_redis
+from ..core.config import Settings, get_settings
+from ..core.key_filter import get_key_filter, recent_keys_for
+from ..core.local_cache import get_local_url_cache
+from ..database import get_replica_pool, get_session_local, get_shard_pool
+from ..domain.repositories import ClickStatsRepository, UrlRepository
+from ..infrastructure.repositories import (
+    AsyncSqlAlchemyClickStatsRepository,
+    AsyncSqlAlchemyUrlRepository,
+    CachedUrlRepository,
+    ShardedUrlRepository,
+)
+
+
+class Container:
+    """The one place that wires repositories and services together.
+
+    Nothing is built on import: the engine, Redis client and in-process caches
+    are created by their getters the first time a session or service is asked
+    for. Request handlers reach it through the FastAPI dependencies in
+    services.py; background workers and streaming responses, which outlive a
+    request, open their own sessions through it.
+    """
+
+    @property
+    def settings(self) -> Settings:
+        return get_settings()
+
+    def session(self) -> AsyncSession:
+        return get_session_local()()
+
+    def url_storage(self, db: AsyncSession) -> UrlRepository:
+        """The URL repository backed by the database, or by every shard, without the Redis cache."""
+        shards = get_shard_pool()
+        if shards is not None:
+            return ShardedUrlRepository(shards)
+        replicas = get_replica_pool()
+        # Replica misses for keys created in the last rebuild intervals are retried on the primary.
+        recent_keys = recent_keys_for(get_redis()) if replicas is not None and self.settings.key_filter_active else None
+        return AsyncSqlAlchemyUrlRepository(db_session=db, replicas=replicas, recent_keys=recent_keys)
+
+    def url_repository(self, db: AsyncSession) -> UrlRepository:
+        settings = self.settings
+        repository = self.url_storage(db)
+        if not settings.cache_enabled:
+            return repository
+        return CachedUrlRepository(
+            repository=repository,
+            redis_client=get_redis(),
+            ttl_seconds=settings.cache_ttl_seconds,
+            negative_ttl_seconds=settings.cache_negative_ttl_seconds
+        )
+
+    def click_stats_repository(self, db: AsyncSession) -> Optional[ClickStatsRepository]:
+        if not self.settings.click_events_enabled:
+            return None
+        return AsyncSqlAlchemyClickStatsRepository(db_session=db)
+
+    def url_service(
+            self,
+            url_repository: UrlRepository,
+            click_stats_repository: Optional[ClickStatsRepository] = None
+    ) -> UrlService:
+        settings = self.settings
+        url_cache = get_local_url_cache() if settings.local_cache_enabled else None
+        click_buffer = get_click_buffer() if settings.click_buffer_enabled else None
+        click_events = get_click_event_buffer() if click_stats_repository is not None else None
+        key_filter = get_key_filter() if settings.key_filter_active else None
+        return UrlService(
+            url_repository=url_repository,
+            url_cache=url_cache,
+            click_buffer=click_buffer,
+            deduplicate=settings.dedup_target_urls,
+            click_events=click_events,
+            click_stats_repository=click_stats_repository,
+            max_stats_buckets=settings.click_stats_max_buckets,
+            key_filter=key_filter
+        )
+
+    def url_service_for(self, db: AsyncSession) -> UrlService:
+        return self.url_service(self.url_repository(db), self.click_stats_repository(db))
+
+
+@lru_cache()
+def get_container() -> Container:
+    return Container()
@@ -1,10 +1,26 @@
-from sqlalchemy.orm import Session
+from typing import AsyncGenerator, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 from ..application import UrlService
-from ..infrastructure.repositories import SqlAlchemyUrlRepository
-from .database import get_db
+from ..domain.repositories import ClickStatsRepository, UrlRepository
+from .container import get_container
 
 
-def get_url_service(db: Session = Depends(get_db)) -> UrlService:
-    repository = SqlAlchemyUrlRepository(db_session=db)
-    return UrlService(url_repository=repository)
\ No newline at end of file
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_container().session() as db:
+        yield db
+
+
+def get_url_repository(db: AsyncSession = Depends(get_db)) -> UrlRepository:
+    return get_container().url_repository(db)
+
+
+def get_click_stats_repository(db: AsyncSession = Depends(get_db)) -> Optional[ClickStatsRepository]:
+    return get_container().click_stats_repository(db)
+
+
+def get_url_service(
+        url_repository: UrlRepository = Depends(get_url_repository),
+        click_stats_repository: Optional[ClickStatsRepository] = Depends(get_click_stats_repository)
+) -> UrlService:
+    return get_container().url_service(url_repository, click_stats_repository)
@@ -1,3 +1,4 @@
 from .url import UrlEntity
+from .click import ClickEventKey, ClickRollup
 
-__all__ = ["UrlEntity"]
\ No newline at end of file
+__all__ = ["UrlEntity", "ClickEventKey", "ClickRollup"]
\ No newline at end of file
@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+from typing import NamedTuple
+
+DIRECT_REFERRER = "direct"
+# Referrer hosts past the per-bucket limit, or that aren't plausible hostnames, are counted here.
+OTHER_REFERRER = "other"
+UNKNOWN_USER_AGENT = "unknown"
+
+GRANULARITY_SECONDS = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+
+class ClickEventKey(NamedTuple):
+    """Identifies clicks that are indistinguishable once bucketed to the minute.
+
+    Redirects are buffered under this key so one stored event can stand for
+    many clicks.
+    """
+    key: str
+    minute_start: int
+    referrer_host: str
+    user_agent_family: str
+
+
+@dataclass
+class ClickRollup:
+    """Clicks for one key in one time bucket, overall or for one dimension value."""
+    bucket_start: int
+    dimension: str
+    value: str
+    clicks: int
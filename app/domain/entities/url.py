@@ -1,8 +1,14 @@
 from dataclasses import dataclass
 from typing import Optional
-from datetime import datetime
-import validators
-from urllib.parse import urlparse
+from datetime import datetime, timezone
+from app.domain.url_validator import validate_url
+
+MAX_KEY_LENGTH = 20
+
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, the form timestamps are stored in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 @dataclass
@@ -11,13 +17,16 @@ class UrlEntity:
     Domain entity representing a URL shortener entry.
 
     This entity contains the core business logic and data for a shortened URL.
+    Only a hash of the secret key is stored, so secret_key is set on entities
+    that were just created or looked up by their secret key, and None otherwise.
     """
     target_url: str
     key: str
-    secret_key: str
+    secret_key: Optional[str] = None
     is_active: bool = True
     clicks: int = 0
     created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
 
     def activate(self) -> None:
         self.is_active = True
@@ -25,25 +34,11 @@ class UrlEntity:
     def deactivate(self) -> None:
         self.is_active = False
 
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at is not None and self.expires_at <= (now or utcnow())
+
     def increment_clicks(self) -> None:
         self.clicks += 1
 
     def validate_url(self) -> bool:
-        try:
-            if not validators.url(str(self.target_url)):
-                return False
-
-            parsed = urlparse(str(self.target_url))
-
-            if parsed.scheme not in ['http', 'https']:
-                return False
-
-            if parsed.hostname in ['localhost', '127.0.0.1', '0.0.0.0']:
-                return False
-
-            if parsed.scheme in ['file', 'javascript', 'data', 'vbscript']:
-                return False
-
-            return True
-        except:
-            return False
\ No newline at end of file
+        return validate_url(str(self.target_url))
\ No newline at end of file
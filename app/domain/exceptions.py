@@ -0,0 +1,6 @@
+class DuplicateKeyError(ValueError):
+    """Raised when a URL is stored under a key or secret key that is already taken."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Key '{key}' already exists")
+        self.key = key
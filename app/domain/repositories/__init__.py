@@ -1,3 +1,4 @@
 from .url_repository import UrlRepository
+from .click_stats_repository import ClickStatsRepository
 
-__all__ = ["UrlRepository"]
\ No newline at end of file
+__all__ = ["UrlRepository", "ClickStatsRepository"]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+from app.domain.entities.click import ClickEventKey, ClickRollup
+
+
+class ClickStatsRepository(ABC):
+    """Interface for the click event stream and its time-bucketed rollups."""
+
+    @abstractmethod
+    async def add_events(self, counts: Dict[ClickEventKey, int]) -> None:
+        """Append buffered click events in one batch."""
+        pass
+
+    @abstractmethod
+    async def rollup(self, batch_size: int, settled_before: int) -> int:
+        """Fold events recorded before `settled_before` into the rollups.
+
+        Processes at most `batch_size` events, deletes them once folded in
+        and returns how many there were.
+        """
+        pass
+
+    @abstractmethod
+    async def get_rollups(self, key: str, granularity: str, start: int, end: int) -> List[ClickRollup]:
+        """Return rollups for a key whose bucket starts in [start, end)."""
+        pass
@@ -1,31 +1,96 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
 from app.domain.entities.url import UrlEntity
 
 
 class UrlRepository(ABC):
-    """Interface for URL repository implementations."""
+    """Interface for asynchronous URL repository implementations."""
 
     @abstractmethod
-    def create(self, url_entity: UrlEntity) -> UrlEntity:
+    async def create(self, url_entity: UrlEntity) -> UrlEntity:
         pass
 
     @abstractmethod
-    def get_by_key(self, key: str) -> Optional[UrlEntity]:
+    async def create_if_absent(self, url_entity: UrlEntity) -> Optional[UrlEntity]:
+        """Insert the entity in one statement unless its key or secret key is taken.
+
+        Returns the stored entity, or None when it conflicted with an existing row.
+        """
+        pass
+
+    @abstractmethod
+    async def create_many(self, url_entities: List[UrlEntity]) -> List[UrlEntity]:
+        """Insert entities in one statement and return those that were stored.
+
+        Entities whose key or secret key is already taken are skipped rather than
+        raising, so callers can retry just the missing ones.
+        """
+        pass
+
+    @abstractmethod
+    async def get_by_key(self, key: str) -> Optional[UrlEntity]:
+        pass
+
+    @abstractmethod
+    async def get_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        pass
+
+    @abstractmethod
+    async def get_by_target_urls(self, target_urls: List[str]) -> Dict[str, UrlEntity]:
+        """Return active entities whose normalized target URL is in the given list."""
+        pass
+
+    @abstractmethod
+    async def update(self, url_entity: UrlEntity) -> UrlEntity:
+        pass
+
+    @abstractmethod
+    async def increment_clicks(self, counts: Dict[str, int]) -> None:
+        pass
+
+    @abstractmethod
+    async def deactivate_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        """Deactivate the active URL with this secret key in one statement.
+
+        Returns the deactivated entity, or None when no active URL matched.
+        """
         pass
 
     @abstractmethod
-    def get_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+    async def deactivate_expired(self, now: datetime, limit: int) -> List[str]:
+        """Deactivate up to `limit` active URLs that expired by `now` and return their keys."""
         pass
 
     @abstractmethod
-    def update(self, url_entity: UrlEntity) -> UrlEntity:
+    async def list_page(self, after: Optional[str], limit: int) -> List[UrlEntity]:
+        """Return up to `limit` entities ordered by key, starting after the given key."""
         pass
 
     @abstractmethod
-    def delete_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+    async def count_active(self) -> int:
         pass
 
     @abstractmethod
-    def get_all(self) -> List[UrlEntity]:
-        pass
\ No newline at end of file
+    def stream_active_keys(self, chunk_size: int) -> AsyncIterator[List[str]]:
+        """Yield the keys of all active URLs in chunks."""
+        pass
+
+    @abstractmethod
+    def stream_all(self, chunk_size: int) -> AsyncIterator[List[UrlEntity]]:
+        """Yield every entity in chunks without loading the whole table at once."""
+        pass
+
+    @abstractmethod
+    def stream_hottest(
+            self,
+            limit: int,
+            chunk_size: int,
+            clicks_since: Optional[int] = None
+    ) -> AsyncIterator[List[UrlEntity]]:
+        """Yield up to `limit` active, unexpired URLs in chunks, most clicked first.
+
+        With clicks_since, a unix timestamp, URLs are ranked by their clicks in the
+        hourly rollups since then instead of their lifetime clicks.
+        """
+        pass
@@ -1,3 +1,15 @@
-from .sqlalchemy_url_repository import SqlAlchemyUrlRepository
+from .async_sqlalchemy_url_repository import AsyncSqlAlchemyUrlRepository
+from .async_sqlalchemy_click_stats_repository import AsyncSqlAlchemyClickStatsRepository
+from .cached_url_repository import CachedUrlRepository
+from .sharded_url_repository import ShardedUrlRepository, ShardRebalancer
+from .url_bulk_loader import ShardedUrlBulkLoader, UrlBulkLoader
 
-__all__ = ["SqlAlchemyUrlRepository"]
\ No newline at end of file
+__all__ = [
+    "AsyncSqlAlchemyUrlRepository",
+    "AsyncSqlAlchemyClickStatsRepository",
+    "CachedUrlRepository",
+    "ShardedUrlRepository",
+    "ShardRebalancer",
+    "ShardedUrlBulkLoader",
+    "UrlBulkLoader",
+]
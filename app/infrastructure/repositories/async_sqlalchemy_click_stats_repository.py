@@ -0,0 +1,188 @@
+import time
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import DB_COMMIT, DB_QUERY
+from app.domain.entities.click import GRANULARITY_SECONDS, OTHER_REFERRER, ClickEventKey, ClickRollup
+from app.domain.repositories.click_stats_repository import ClickStatsRepository
+from app.models.clicks import ClickEvent as ClickEventModel
+from app.models.clicks import ClickRollup as ClickRollupModel
+
+UPSERT_CHUNK_SIZE = 1000
+
+RollupKey = Tuple[str, str, int, str, str]
+
+
+class AsyncSqlAlchemyClickStatsRepository(ClickStatsRepository):
+    """SQL Alchemy AsyncSession implementation of the click stats repository.
+
+    Rollups delete the settled events they fold in, inside the same
+    transaction as the bucket upserts, so a batch is either folded in once or
+    not at all. Workers lock their batch with SKIP LOCKED, so concurrent
+    rollups take disjoint events, and any event left behind, whatever its id,
+    is picked up by a later batch.
+
+    Referrer hosts come from clients, so each key and bucket keeps at most
+    max_referrers of them. The busiest hosts in a batch claim the free slots,
+    and the clicks of the rest count towards "other".
+    """
+
+    def __init__(self, db_session: AsyncSession, max_referrers: int = 50):
+        self.db_session = db_session
+        self.max_referrers = max_referrers
+
+    async def add_events(self, counts: Dict[ClickEventKey, int]) -> None:
+        if not counts:
+            return
+        recorded_at = int(time.time())
+        rows = [
+            {
+                "key": event.key,
+                "minute_start": event.minute_start,
+                "referrer_host": event.referrer_host,
+                "user_agent_family": event.user_agent_family,
+                "clicks": clicks,
+                "recorded_at": recorded_at,
+            }
+            for event, clicks in counts.items()
+        ]
+        connection = await self.db_session.connection()
+        with DB_QUERY.time():
+            await connection.execute(insert(ClickEventModel), rows)
+        await self._commit()
+
+    async def rollup(self, batch_size: int, settled_before: int) -> int:
+        settled = (
+            select(ClickEventModel.id)
+            .where(ClickEventModel.recorded_at < settled_before)
+            .order_by(ClickEventModel.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            delete(ClickEventModel)
+            .where(ClickEventModel.id.in_(settled.scalar_subquery()))
+            .returning(
+                ClickEventModel.key,
+                ClickEventModel.minute_start,
+                ClickEventModel.referrer_host,
+                ClickEventModel.user_agent_family,
+                ClickEventModel.clicks,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        with DB_QUERY.time():
+            events = (await self.db_session.execute(statement)).all()
+        if not events:
+            await self.db_session.rollback()
+            return 0
+
+        totals: Dict[RollupKey, int] = defaultdict(int)
+        for event in events:
+            for granularity, seconds in GRANULARITY_SECONDS.items():
+                bucket_start = event.minute_start - event.minute_start % seconds
+                totals[(event.key, granularity, bucket_start, "total", "")] += event.clicks
+                totals[(event.key, granularity, bucket_start, "referrer", event.referrer_host)] += event.clicks
+                totals[(event.key, granularity, bucket_start, "user_agent", event.user_agent_family)] += event.clicks
+
+        totals = await self._cap_referrers(totals)
+        rows = [
+            {"key": key, "granularity": granularity, "bucket_start": bucket_start,
+             "dimension": dimension, "value": value, "clicks": clicks}
+            for (key, granularity, bucket_start, dimension, value), clicks in totals.items()
+        ]
+        connection = await self.db_session.connection()
+        with DB_QUERY.time():
+            for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                await connection.execute(self._upsert_rollups(rows[offset:offset + UPSERT_CHUNK_SIZE]))
+
+        await self._commit()
+        return len(events)
+
+    async def get_rollups(self, key: str, granularity: str, start: int, end: int) -> List[ClickRollup]:
+        with DB_QUERY.time():
+            rows = (await self.db_session.execute(
+                select(
+                    ClickRollupModel.bucket_start,
+                    ClickRollupModel.dimension,
+                    ClickRollupModel.value,
+                    ClickRollupModel.clicks,
+                )
+                .where(
+                    ClickRollupModel.key == key,
+                    ClickRollupModel.granularity == granularity,
+                    ClickRollupModel.bucket_start >= start,
+                    ClickRollupModel.bucket_start < end,
+                )
+                .order_by(ClickRollupModel.bucket_start)
+            )).all()
+        return [
+            ClickRollup(bucket_start=row.bucket_start, dimension=row.dimension, value=row.value, clicks=row.clicks)
+            for row in rows
+        ]
+
+    async def _cap_referrers(self, totals: Dict[RollupKey, int]) -> Dict[RollupKey, int]:
+        referrers = {rollup_key: clicks for rollup_key, clicks in totals.items() if rollup_key[3] == "referrer"}
+        if not referrers:
+            return totals
+        earliest: Dict[str, int] = {}
+        for _, granularity, bucket_start, _, _ in referrers:
+            earliest[granularity] = min(earliest.get(granularity, bucket_start), bucket_start)
+        with DB_QUERY.time():
+            existing = await self.db_session.execute(
+                select(
+                    ClickRollupModel.key,
+                    ClickRollupModel.granularity,
+                    ClickRollupModel.bucket_start,
+                    ClickRollupModel.value,
+                )
+                .where(
+                    ClickRollupModel.dimension == "referrer",
+                    ClickRollupModel.value != OTHER_REFERRER,
+                    ClickRollupModel.key.in_({rollup_key[0] for rollup_key in referrers}),
+                    or_(*(
+                        and_(ClickRollupModel.granularity == granularity, ClickRollupModel.bucket_start >= start)
+                        for granularity, start in earliest.items()
+                    )),
+                )
+            )
+        known: Dict[Tuple[str, str, int], Set[str]] = defaultdict(set)
+        for row in existing:
+            known[(row.key, row.granularity, row.bucket_start)].add(row.value)
+
+        capped: Dict[RollupKey, int] = defaultdict(int)
+        for rollup_key, clicks in totals.items():
+            if rollup_key[3] != "referrer":
+                capped[rollup_key] = clicks
+        for (key, granularity, bucket_start, dimension, host), clicks in sorted(
+                referrers.items(), key=lambda item: item[1], reverse=True
+        ):
+            hosts = known[(key, granularity, bucket_start)]
+            if host != OTHER_REFERRER and host not in hosts:
+                if len(hosts) < self.max_referrers:
+                    hosts.add(host)
+                else:
+                    host = OTHER_REFERRER
+            capped[(key, granularity, bucket_start, dimension, host)] += clicks
+        return capped
+
+    async def _commit(self) -> None:
+        with DB_COMMIT.time():
+            await self.db_session.commit()
+
+    def _upsert_rollups(self, rows: List[dict]):
+        dialect = self.db_session.get_bind().dialect.name
+        module = postgresql if dialect == "postgresql" else sqlite
+        statement = module.insert(ClickRollupModel).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[
+                ClickRollupModel.key,
+                ClickRollupModel.granularity,
+                ClickRollupModel.bucket_start,
+                ClickRollupModel.dimension,
+                ClickRollupModel.value,
+            ],
+            set_={"clicks": ClickRollupModel.clicks + statement.excluded.clicks}
+        )
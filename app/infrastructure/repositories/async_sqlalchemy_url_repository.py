@@ -0,0 +1,343 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+from sqlalchemy import bindparam, case, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.key_filter import RecentKeys
+from app.core.metrics import DB_COMMIT, DB_QUERY
+from app.database import ReplicaPool
+from app.domain.entities.click import GRANULARITY_SECONDS
+from app.domain.entities.url import UrlEntity, utcnow
+from app.domain.exceptions import DuplicateKeyError
+from app.domain.repositories.url_repository import UrlRepository
+from app.models.clicks import ClickRollup as ClickRollupModel
+from app.models.urls import URL as URLModel
+from app.utils.keygen import hash_secret_key, key_from_secret_key
+from app.utils.urls import hash_url, normalize_url
+
+RECENT_CLICKS_GRANULARITY = "hour"
+INCREMENT_CHUNK_SIZE = 500
+
+
+def insert_ignoring_conflicts(db_session: AsyncSession, table=URLModel):
+    """An INSERT into urls that skips rows whose key is taken, where the dialect supports it."""
+    dialect = db_session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def is_live(now: datetime) -> tuple:
+    return URLModel.is_active, or_(URLModel.expires_at.is_(None), URLModel.expires_at > now)
+
+
+def recent_click_totals(clicks_since: int, limit: int):
+    """The `limit` keys with the most clicks in hourly rollups since the given unix time, as (key, recent_clicks)."""
+    bucket_start = clicks_since - clicks_since % GRANULARITY_SECONDS[RECENT_CLICKS_GRANULARITY]
+    recent_clicks = func.sum(ClickRollupModel.clicks).label("recent_clicks")
+    return (
+        select(ClickRollupModel.key, recent_clicks)
+        .where(
+            ClickRollupModel.granularity == RECENT_CLICKS_GRANULARITY,
+            ClickRollupModel.dimension == "total",
+            ClickRollupModel.bucket_start >= bucket_start,
+        )
+        .group_by(ClickRollupModel.key)
+        .order_by(recent_clicks.desc())
+        .limit(limit)
+    )
+
+
+class AsyncSqlAlchemyUrlRepository(UrlRepository):
+    """SQL Alchemy AsyncSession implementation of the URL repository.
+
+    With a replica pool, lookups by key and secret key go to a replica and
+    everything else runs on the primary session. A lookup falls back to the
+    primary when the replica fails, and once this repository has written, its
+    reads stay on the primary. A replica miss is only retried on the primary
+    for a key RecentKeys lists, so a link created moments ago is found before
+    it has replicated while unknown keys cost one query.
+    """
+
+    def __init__(
+            self,
+            db_session: AsyncSession,
+            replicas: Optional[ReplicaPool] = None,
+            recent_keys: Optional[RecentKeys] = None
+    ):
+        self.db_session = db_session
+        self.replicas = replicas
+        self.recent_keys = recent_keys
+        self._wrote = False
+
+    async def create(self, url_entity: UrlEntity) -> UrlEntity:
+        result = await self.create_if_absent(url_entity)
+        if result is None:
+            raise DuplicateKeyError(url_entity.key)
+        return result
+
+    async def create_if_absent(self, url_entity: UrlEntity) -> Optional[UrlEntity]:
+        statement = insert_ignoring_conflicts(self.db_session).values(self._to_row(url_entity)).returning(URLModel)
+        try:
+            with DB_QUERY.time():
+                db_url = await self.db_session.scalar(statement)
+            await self._commit()
+        except IntegrityError:
+            await self.db_session.rollback()
+            return None
+        return self._map_to_entity(db_url, url_entity.secret_key) if db_url else None
+
+    async def create_many(self, url_entities: List[UrlEntity]) -> List[UrlEntity]:
+        if not url_entities:
+            return []
+
+        rows = [self._to_row(url_entity) for url_entity in url_entities]
+        statement = insert_ignoring_conflicts(self.db_session).values(rows).returning(URLModel)
+        with DB_QUERY.time():
+            db_urls = (await self.db_session.scalars(statement)).all()
+        await self._commit()
+
+        secret_keys = {url_entity.key: url_entity.secret_key for url_entity in url_entities}
+        return [self._map_to_entity(db_url, secret_keys[db_url.key]) for db_url in db_urls]
+
+    async def get_by_key(self, key: str) -> Optional[UrlEntity]:
+        return await self._read_one(
+            key,
+            select(URLModel)
+            .where(URLModel.key == key, URLModel.is_active)
+            .limit(1)
+        )
+
+    async def get_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        url_entity = await self._read_one(
+            key_from_secret_key(secret_key),
+            select(URLModel)
+            .where(*self._matches_secret_key(secret_key), URLModel.is_active)
+            .limit(1)
+        )
+        if url_entity:
+            url_entity.secret_key = secret_key
+        return url_entity
+
+    async def get_by_target_urls(self, target_urls: List[str]) -> Dict[str, UrlEntity]:
+        normalized = {normalize_url(target_url) for target_url in target_urls}
+        if not normalized:
+            return {}
+
+        with DB_QUERY.time():
+            db_urls = (await self.db_session.scalars(
+                select(URLModel)
+                .where(
+                    URLModel.target_url_hash.in_([hash_url(url) for url in normalized]),
+                    URLModel.is_active
+                )
+                .order_by(URLModel.id)
+            )).all()
+        matches: Dict[str, UrlEntity] = {}
+        for db_url in db_urls:
+            target_url = normalize_url(db_url.target_url)
+            if target_url in normalized and target_url not in matches:
+                matches[target_url] = self._map_to_entity(db_url)
+        return matches
+
+    async def update(self, url_entity: UrlEntity) -> UrlEntity:
+        db_url = await self.db_session.scalar(
+            select(URLModel)
+            .where(URLModel.key == url_entity.key)
+            .limit(1)
+        )
+
+        if db_url:
+            db_url.target_url = url_entity.target_url
+            db_url.is_active = url_entity.is_active
+            db_url.clicks = url_entity.clicks
+            if url_entity.secret_key:
+                db_url.secret_key_hash = hash_secret_key(url_entity.secret_key)
+
+            await self._commit()
+            await self.db_session.refresh(db_url)
+
+            return self._map_to_entity(db_url, url_entity.secret_key)
+        return None
+
+    async def increment_clicks(self, counts: Dict[str, int]) -> None:
+        statement = (
+            update(URLModel)
+            .where(URLModel.key == bindparam("url_key"))
+            .values(clicks=URLModel.clicks + bindparam("increment"))
+            .execution_options(synchronize_session=False)
+        )
+        connection = await self.db_session.connection()
+        with DB_QUERY.time():
+            await connection.execute(
+                statement,
+                [{"url_key": key, "increment": count} for key, count in counts.items()]
+            )
+        await self._commit()
+
+    async def increment_existing_clicks(self, counts: Dict[str, int]) -> Set[str]:
+        """Add click counts like increment_clicks and return the keys that had a row to update."""
+        updated: Set[str] = set()
+        items = list(counts.items())
+        for offset in range(0, len(items), INCREMENT_CHUNK_SIZE):
+            chunk = dict(items[offset:offset + INCREMENT_CHUNK_SIZE])
+            statement = (
+                update(URLModel)
+                .where(URLModel.key.in_(chunk))
+                .values(clicks=URLModel.clicks + case(chunk, value=URLModel.key, else_=0))
+                .returning(URLModel.key)
+                .execution_options(synchronize_session=False)
+            )
+            with DB_QUERY.time():
+                updated.update(await self.db_session.scalars(statement))
+        await self._commit()
+        return updated
+
+    async def deactivate_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        statement = (
+            update(URLModel)
+            .where(*self._matches_secret_key(secret_key), URLModel.is_active)
+            .values(is_active=False)
+            .returning(URLModel)
+            .execution_options(synchronize_session=False)
+        )
+        with DB_QUERY.time():
+            db_url = await self.db_session.scalar(statement)
+        await self._commit()
+        return self._map_to_entity(db_url, secret_key) if db_url else None
+
+    async def deactivate_expired(self, now: datetime, limit: int) -> List[str]:
+        expired = (
+            select(URLModel.id)
+            .where(URLModel.is_active, URLModel.expires_at.isnot(None), URLModel.expires_at <= now)
+            .order_by(URLModel.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(URLModel)
+            .where(URLModel.id.in_(expired.scalar_subquery()))
+            .values(is_active=False)
+            .returning(URLModel.key)
+            .execution_options(synchronize_session=False)
+        )
+        with DB_QUERY.time():
+            keys = (await self.db_session.scalars(statement)).all()
+        await self._commit()
+        return list(keys)
+
+    async def list_page(self, after: Optional[str], limit: int) -> List[UrlEntity]:
+        query = select(URLModel).order_by(URLModel.key).limit(limit)
+        if after is not None:
+            query = query.where(URLModel.key > after)
+        with DB_QUERY.time():
+            db_urls = (await self.db_session.scalars(query)).all()
+        return [self._map_to_entity(db_url) for db_url in db_urls]
+
+    async def count_active(self) -> int:
+        with DB_QUERY.time():
+            return await self.db_session.scalar(select(func.count()).select_from(URLModel).where(URLModel.is_active))
+
+    async def stream_active_keys(self, chunk_size: int) -> AsyncIterator[List[str]]:
+        result = await self.db_session.stream_scalars(
+            select(URLModel.key)
+            .where(URLModel.is_active)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for keys in result.partitions():
+            yield list(keys)
+
+    async def stream_all(self, chunk_size: int) -> AsyncIterator[List[UrlEntity]]:
+        # yield_per makes the driver use a server-side cursor where it has one,
+        # and the session's identity map only holds rows weakly.
+        result = await self.db_session.stream_scalars(
+            select(URLModel)
+            .order_by(URLModel.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for db_urls in result.partitions():
+            yield [self._map_to_entity(db_url) for db_url in db_urls]
+
+    async def stream_hottest(
+            self,
+            limit: int,
+            chunk_size: int,
+            clicks_since: Optional[int] = None
+    ) -> AsyncIterator[List[UrlEntity]]:
+        if clicks_since is None:
+            query = select(URLModel).where(*is_live(utcnow())).order_by(URLModel.clicks.desc()).limit(limit)
+        else:
+            recent = recent_click_totals(clicks_since, limit).subquery()
+            query = (
+                select(URLModel)
+                .join(recent, recent.c.key == URLModel.key)
+                .where(*is_live(utcnow()))
+                .order_by(recent.c.recent_clicks.desc())
+            )
+        result = await self.db_session.stream_scalars(query.execution_options(yield_per=chunk_size))
+        async for db_urls in result.partitions():
+            yield [self._map_to_entity(db_url) for db_url in db_urls]
+
+    async def get_live_by_keys(self, keys: List[str]) -> Dict[str, UrlEntity]:
+        """Active, unexpired entities for the given keys, by key. Used to assemble sharded results."""
+        if not keys:
+            return {}
+        with DB_QUERY.time():
+            db_urls = await self.db_session.scalars(
+                select(URLModel).where(URLModel.key.in_(keys), *is_live(utcnow()))
+            )
+        return {db_url.key: self._map_to_entity(db_url) for db_url in db_urls}
+
+    async def _read_one(self, key: str, statement) -> Optional[UrlEntity]:
+        index = self.replicas.choose() if self.replicas is not None and not self._wrote else None
+        if index is not None:
+            try:
+                async with self.replicas.session(index) as db:
+                    with DB_QUERY.time():
+                        db_url = await db.scalar(statement)
+            except (SQLAlchemyError, OSError) as error:
+                self.replicas.mark_down(index, error)
+            else:
+                if db_url is not None:
+                    return self._map_to_entity(db_url)
+                if self.recent_keys is None or not await self.recent_keys.contains(key):
+                    return None
+        with DB_QUERY.time():
+            db_url = await self.db_session.scalar(statement)
+        return self._map_to_entity(db_url) if db_url else None
+
+    async def _commit(self) -> None:
+        self._wrote = True
+        with DB_COMMIT.time():
+            await self.db_session.commit()
+
+    def _to_row(self, url_entity: UrlEntity) -> dict:
+        return {
+            "target_url": url_entity.target_url,
+            "target_url_hash": hash_url(normalize_url(url_entity.target_url)),
+            "key": url_entity.key,
+            "secret_key_hash": hash_secret_key(url_entity.secret_key),
+            "is_active": url_entity.is_active,
+            "clicks": url_entity.clicks,
+            "created_at": url_entity.created_at or utcnow(),
+            "expires_at": url_entity.expires_at,
+        }
+
+    @staticmethod
+    def _matches_secret_key(secret_key: str) -> tuple:
+        # Found through the key index; the hash comparison then proves the secret.
+        return URLModel.key == key_from_secret_key(secret_key), URLModel.secret_key_hash == hash_secret_key(secret_key)
+
+    def _map_to_entity(self, db_url, secret_key: Optional[str] = None) -> UrlEntity:
+        return UrlEntity(
+            target_url=db_url.target_url,
+            key=db_url.key,
+            secret_key=secret_key,
+            is_active=db_url.is_active,
+            clicks=db_url.clicks,
+            created_at=db_url.created_at,
+            expires_at=db_url.expires_at
+        )
@@ -0,0 +1,199 @@
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+import redis.asyncio as redis
+from app.core.cache import cache_stats
+from app.core.metrics import CACHE_LOOKUP
+from app.domain.entities.url import UrlEntity, utcnow
+from app.domain.repositories.url_repository import UrlRepository
+from app.utils.logging import get_logger
+
+logger = get_logger()
+
+NEGATIVE_ENTRY = b""
+
+
+class CachedUrlRepository(UrlRepository):
+    """Read-through Redis cache in front of another URL repository.
+
+    Only lookups by key are cached. Unknown keys are stored as short-lived
+    negative entries so repeated 404s never reach the database.
+    """
+
+    key_prefix = "tinyurl:url:"
+
+    def __init__(
+            self,
+            repository: UrlRepository,
+            redis_client: redis.Redis,
+            ttl_seconds: int,
+            negative_ttl_seconds: int
+    ):
+        self.repository = repository
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+    async def create(self, url_entity: UrlEntity) -> UrlEntity:
+        result = await self.repository.create(url_entity)
+        await self._store(result)
+        return result
+
+    async def create_if_absent(self, url_entity: UrlEntity) -> Optional[UrlEntity]:
+        result = await self.repository.create_if_absent(url_entity)
+        if result:
+            await self._store(result)
+        return result
+
+    async def create_many(self, url_entities: List[UrlEntity]) -> List[UrlEntity]:
+        results = await self.repository.create_many(url_entities)
+        await self._store_many(results)
+        return results
+
+    async def get_by_key(self, key: str) -> Optional[UrlEntity]:
+        try:
+            with CACHE_LOOKUP.time():
+                cached = await self.redis.get(self._cache_key(key))
+        except redis.RedisError as error:
+            self._on_error("get", key, error)
+            return await self.repository.get_by_key(key)
+
+        if cached == NEGATIVE_ENTRY:
+            cache_stats.incr("negative_hits")
+            return None
+        if cached is not None:
+            cache_stats.incr("hits")
+            return self._deserialize(cached)
+
+        cache_stats.incr("misses")
+        url_entity = await self.repository.get_by_key(key)
+        if url_entity:
+            await self._store(url_entity)
+        else:
+            await self._store_negative(key)
+        return url_entity
+
+    async def get_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        return await self.repository.get_by_secret_key(secret_key)
+
+    async def get_by_target_urls(self, target_urls: List[str]) -> Dict[str, UrlEntity]:
+        return await self.repository.get_by_target_urls(target_urls)
+
+    async def update(self, url_entity: UrlEntity) -> UrlEntity:
+        result = await self.repository.update(url_entity)
+        if result and result.is_active:
+            await self._store(result)
+        else:
+            await self.invalidate(url_entity.key)
+        return result
+
+    async def increment_clicks(self, counts: Dict[str, int]) -> None:
+        await self.repository.increment_clicks(counts)
+
+    async def deactivate_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        result = await self.repository.deactivate_by_secret_key(secret_key)
+        if result:
+            await self.invalidate(result.key)
+        return result
+
+    async def deactivate_expired(self, now: datetime, limit: int) -> List[str]:
+        keys = await self.repository.deactivate_expired(now, limit)
+        await self.invalidate_many(keys)
+        return keys
+
+    async def list_page(self, after: Optional[str], limit: int) -> List[UrlEntity]:
+        return await self.repository.list_page(after, limit)
+
+    async def count_active(self) -> int:
+        return await self.repository.count_active()
+
+    def stream_active_keys(self, chunk_size: int) -> AsyncIterator[List[str]]:
+        return self.repository.stream_active_keys(chunk_size)
+
+    def stream_all(self, chunk_size: int) -> AsyncIterator[List[UrlEntity]]:
+        return self.repository.stream_all(chunk_size)
+
+    async def stream_hottest(
+            self,
+            limit: int,
+            chunk_size: int,
+            clicks_since: Optional[int] = None
+    ) -> AsyncIterator[List[UrlEntity]]:
+        # Stores each chunk on the way through: cache warm-up is what asks for the hottest URLs.
+        async for url_entities in self.repository.stream_hottest(limit, chunk_size, clicks_since):
+            await self._store_many(url_entities)
+            yield url_entities
+
+    async def invalidate(self, key: str) -> None:
+        try:
+            await self.redis.delete(self._cache_key(key))
+        except redis.RedisError as error:
+            self._on_error("delete", key, error)
+
+    async def invalidate_many(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*(self._cache_key(key) for key in keys))
+        except redis.RedisError as error:
+            self._on_error("delete", keys[0], error)
+
+    async def _store(self, url_entity: UrlEntity) -> None:
+        try:
+            await self.redis.set(
+                self._cache_key(url_entity.key),
+                self._serialize(url_entity),
+                ex=self._ttl_for(url_entity)
+            )
+        except redis.RedisError as error:
+            self._on_error("set", url_entity.key, error)
+
+    async def _store_many(self, url_entities: List[UrlEntity]) -> None:
+        if not url_entities:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for url_entity in url_entities:
+                    pipeline.set(
+                        self._cache_key(url_entity.key),
+                        self._serialize(url_entity),
+                        ex=self._ttl_for(url_entity)
+                    )
+                await pipeline.execute()
+        except redis.RedisError as error:
+            self._on_error("set", url_entities[0].key, error)
+
+    async def _store_negative(self, key: str) -> None:
+        try:
+            await self.redis.set(self._cache_key(key), NEGATIVE_ENTRY, ex=self.negative_ttl_seconds)
+        except redis.RedisError as error:
+            self._on_error("set", key, error)
+
+    def _on_error(self, operation: str, key: str, error: Exception) -> None:
+        cache_stats.incr("errors")
+        logger.warning("URL cache unavailable", operation=operation, key=key, error=str(error))
+
+    def _ttl_for(self, url_entity: UrlEntity) -> int:
+        """Cache TTL, cut short so an entry never outlives the link's expiry by more than a second."""
+        if url_entity.expires_at is None:
+            return self.ttl_seconds
+        remaining = int((url_entity.expires_at - utcnow()).total_seconds()) + 1
+        return max(1, min(self.ttl_seconds, remaining))
+
+    def _cache_key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    def _serialize(self, url_entity: UrlEntity) -> str:
+        return json.dumps({
+            "target_url": url_entity.target_url,
+            "key": url_entity.key,
+            "is_active": url_entity.is_active,
+            "clicks": url_entity.clicks,
+            "expires_at": url_entity.expires_at.isoformat() if url_entity.expires_at else None,
+        })
+
+    def _deserialize(self, payload: bytes) -> UrlEntity:
+        data = json.loads(payload)
+        data.pop("secret_key", None)
+        expires_at = data.pop("expires_at", None)
+        return UrlEntity(**data, expires_at=datetime.fromisoformat(expires_at) if expires_at else None)
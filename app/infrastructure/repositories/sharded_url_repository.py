@@ -0,0 +1,338 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set, TypeVar
+from sqlalchemy import bindparam, case, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import DB_COMMIT, DB_QUERY
+from app.database import ShardPool
+from app.domain.entities.url import UrlEntity
+from app.domain.exceptions import DuplicateKeyError
+from app.domain.repositories.url_repository import UrlRepository
+from app.models.urls import URL as URLModel
+from app.utils.keygen import key_from_secret_key
+from app.utils.logging import get_logger
+from .async_sqlalchemy_url_repository import (
+    AsyncSqlAlchemyUrlRepository,
+    insert_ignoring_conflicts,
+    recent_click_totals,
+)
+
+logger = get_logger()
+
+T = TypeVar("T")
+ShardOperation = Callable[[UrlRepository], Awaitable[T]]
+
+# Every column but the per-shard id, in the form rows are moved between shards.
+MOVED_COLUMNS = [column for column in URLModel.__table__.columns if column.name != "id"]
+
+
+class ShardedUrlRepository(UrlRepository):
+    """Spreads the urls table across the databases of a ShardPool.
+
+    Lookups and writes for one key go to the shard that owns it, and secret
+    keys are routed by the key they embed. Operations with no key fan out to
+    every shard concurrently and merge the results. That covers target URL
+    lookups, listing, counting, streaming and expiry. Each operation runs in its
+    own short session on the shards it touches.
+
+    While the pool is rebalancing, a key not found on its new shard is looked up
+    on the shard it used to live on. Writes that find nothing there try the new
+    shard once more, in case ShardRebalancer moved the row in between. A key
+    still on its old shard counts as taken when creating.
+    """
+
+    def __init__(self, shards: ShardPool):
+        self.shards = shards
+
+    async def create(self, url_entity: UrlEntity) -> UrlEntity:
+        result = await self.create_if_absent(url_entity)
+        if result is None:
+            raise DuplicateKeyError(url_entity.key)
+        return result
+
+    async def create_if_absent(self, url_entity: UrlEntity) -> Optional[UrlEntity]:
+        if await self._taken_on_previous_shards([url_entity.key]):
+            return None
+        return await self._on_shard(
+            self.shards.shard_for(url_entity.key),
+            lambda repository: repository.create_if_absent(url_entity)
+        )
+
+    async def create_many(self, url_entities: List[UrlEntity]) -> List[UrlEntity]:
+        taken = await self._taken_on_previous_shards([url_entity.key for url_entity in url_entities])
+        by_shard: Dict[int, List[UrlEntity]] = defaultdict(list)
+        for url_entity in url_entities:
+            if url_entity.key not in taken:
+                by_shard[self.shards.shard_for(url_entity.key)].append(url_entity)
+        created = await asyncio.gather(*(
+            self._on_shard(index, lambda repository, chunk=chunk: repository.create_many(chunk))
+            for index, chunk in by_shard.items()
+        ))
+        return [url_entity for chunk in created for url_entity in chunk]
+
+    async def get_by_key(self, key: str) -> Optional[UrlEntity]:
+        return await self._find(key, lambda repository: repository.get_by_key(key))
+
+    async def get_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        return await self._find(
+            key_from_secret_key(secret_key),
+            lambda repository: repository.get_by_secret_key(secret_key)
+        )
+
+    async def get_by_target_urls(self, target_urls: List[str]) -> Dict[str, UrlEntity]:
+        matches: Dict[str, UrlEntity] = {}
+        for shard_matches in await self._scatter(lambda repository: repository.get_by_target_urls(target_urls)):
+            for target_url, url_entity in shard_matches.items():
+                matches.setdefault(target_url, url_entity)
+        return matches
+
+    async def update(self, url_entity: UrlEntity) -> UrlEntity:
+        return await self._write(url_entity.key, lambda repository: repository.update(url_entity))
+
+    async def increment_clicks(self, counts: Dict[str, int]) -> None:
+        # While rebalancing, a key that may be moving is counted on its old shard first.
+        # ShardRebalancer keeps the rows it moves locked there until they are committed on
+        # the new shard, so a key the old shard no longer has is safe to count on the new one.
+        by_shard: Dict[int, Dict[str, int]] = defaultdict(dict)
+        moving: Dict[int, Dict[str, int]] = defaultdict(dict)
+        for key, count in counts.items():
+            previous = self.shards.previous_shard_for(key)
+            if previous is None:
+                by_shard[self.shards.shard_for(key)][key] = count
+            else:
+                moving[previous][key] = count
+        counted = await asyncio.gather(*(
+            self._on_shard(index, lambda repository, chunk=chunk: repository.increment_existing_clicks(chunk))
+            for index, chunk in moving.items()
+        ))
+        for chunk, keys in zip(moving.values(), counted):
+            for key, count in chunk.items():
+                if key not in keys:
+                    by_shard[self.shards.shard_for(key)][key] = count
+        await asyncio.gather(*(
+            self._on_shard(index, lambda repository, chunk=chunk: repository.increment_clicks(chunk))
+            for index, chunk in by_shard.items()
+        ))
+
+    async def deactivate_by_secret_key(self, secret_key: str) -> Optional[UrlEntity]:
+        return await self._write(
+            key_from_secret_key(secret_key),
+            lambda repository: repository.deactivate_by_secret_key(secret_key)
+        )
+
+    async def deactivate_expired(self, now: datetime, limit: int) -> List[str]:
+        keys: List[str] = []
+        for index in range(len(self.shards)):
+            remaining = limit - len(keys)
+            if remaining <= 0:
+                break
+            keys.extend(await self._on_shard(
+                index, lambda repository: repository.deactivate_expired(now, remaining)
+            ))
+        return keys
+
+    async def list_page(self, after: Optional[str], limit: int) -> List[UrlEntity]:
+        pages = await self._scatter(lambda repository: repository.list_page(after, limit))
+        page: List[UrlEntity] = []
+        for url_entity in heapq.merge(*pages, key=lambda url_entity: url_entity.key):
+            # A row being moved can briefly exist on two shards.
+            if page and page[-1].key == url_entity.key:
+                continue
+            page.append(url_entity)
+            if len(page) == limit:
+                break
+        return page
+
+    async def count_active(self) -> int:
+        return sum(await self._scatter(lambda repository: repository.count_active()))
+
+    async def stream_active_keys(self, chunk_size: int) -> AsyncIterator[List[str]]:
+        for index in range(len(self.shards)):
+            async with self.shards.session(index) as db:
+                async for keys in AsyncSqlAlchemyUrlRepository(db_session=db).stream_active_keys(chunk_size):
+                    yield keys
+
+    async def stream_all(self, chunk_size: int) -> AsyncIterator[List[UrlEntity]]:
+        for index in range(len(self.shards)):
+            async with self.shards.session(index) as db:
+                async for url_entities in AsyncSqlAlchemyUrlRepository(db_session=db).stream_all(chunk_size):
+                    yield url_entities
+
+    async def stream_hottest(
+            self,
+            limit: int,
+            chunk_size: int,
+            clicks_since: Optional[int] = None
+    ) -> AsyncIterator[List[UrlEntity]]:
+        if clicks_since is None:
+            ranked = await self._scatter(lambda repository: self._collect(repository.stream_hottest(limit, chunk_size)))
+            candidates = heapq.merge(*ranked, key=lambda url_entity: -url_entity.clicks)
+        else:
+            candidates = await self._recently_clicked(clicks_since, limit)
+        hottest: List[UrlEntity] = []
+        seen: Set[str] = set()
+        for url_entity in candidates:
+            # A row being moved can briefly exist on two shards.
+            if url_entity.key in seen:
+                continue
+            seen.add(url_entity.key)
+            hottest.append(url_entity)
+            if len(hottest) == limit:
+                break
+        for offset in range(0, len(hottest), chunk_size):
+            yield hottest[offset:offset + chunk_size]
+
+    async def _recently_clicked(self, clicks_since: int, limit: int) -> List[UrlEntity]:
+        # Click rollups are not sharded: they live on shard 0 with the rest of the click data.
+        async with self.shards.session(0) as db:
+            with DB_QUERY.time():
+                keys = list((await db.execute(recent_click_totals(clicks_since, limit))).scalars())
+        by_shard: Dict[int, List[str]] = defaultdict(list)
+        for key in keys:
+            for index in self._shards_for(key):
+                by_shard[index].append(key)
+        found: Dict[str, UrlEntity] = {}
+        for shard_found in await asyncio.gather(*(
+            self._on_shard(index, lambda repository, chunk=chunk: repository.get_live_by_keys(chunk))
+            for index, chunk in by_shard.items()
+        )):
+            found.update(shard_found)
+        return [found[key] for key in keys if key in found]
+
+    @staticmethod
+    async def _collect(chunks: AsyncIterator[List[T]]) -> List[T]:
+        return [item async for chunk in chunks for item in chunk]
+
+    def _shards_for(self, key: str) -> List[int]:
+        """The shard that owns a key, then the one it is moving from, if any."""
+        owner = self.shards.shard_for(key)
+        previous = self.shards.previous_shard_for(key)
+        return [owner] if previous is None else [owner, previous]
+
+    async def _find(self, key: str, operation: ShardOperation) -> Optional[T]:
+        for index in self._shards_for(key):
+            result = await self._on_shard(index, operation)
+            if result is not None:
+                return result
+        return None
+
+    async def _write(self, key: str, operation: ShardOperation) -> Optional[T]:
+        result = await self._find(key, operation)
+        if result is None and self.shards.previous_shard_for(key) is not None:
+            result = await self._on_shard(self.shards.shard_for(key), operation)
+        return result
+
+    async def _taken_on_previous_shards(self, keys: Iterable[str]) -> Set[str]:
+        by_shard: Dict[int, List[str]] = defaultdict(list)
+        for key in keys:
+            previous = self.shards.previous_shard_for(key)
+            if previous is not None:
+                by_shard[previous].append(key)
+        taken: Set[str] = set()
+        for index, shard_keys in by_shard.items():
+            async with self.shards.session(index) as db:
+                with DB_QUERY.time():
+                    taken.update(await db.scalars(select(URLModel.key).where(URLModel.key.in_(shard_keys))))
+        return taken
+
+    async def _on_shard(self, index: int, operation: ShardOperation) -> T:
+        async with self.shards.session(index) as db:
+            return await operation(AsyncSqlAlchemyUrlRepository(db_session=db))
+
+    async def _scatter(self, operation: ShardOperation) -> List[T]:
+        return await asyncio.gather(*(self._on_shard(index, operation) for index in range(len(self.shards))))
+
+
+class ShardRebalancer:
+    """Moves rows whose key now belongs to another shard, after shards were added.
+
+    Each batch walks up to batch_size keys of one previous shard in key order.
+    Rows that belong elsewhere are deleted from the old shard and inserted on
+    the new one, and the old shard commits last. A batch that fails after the
+    target committed can simply be run again: the copies it left on the target
+    are kept, and take the old shard's click count, which kept growing since.
+    """
+
+    def __init__(self, shards: ShardPool):
+        if not shards.rebalancing:
+            raise ValueError("Set DB_SHARD_PREVIOUS_COUNT to the shard count before the new shards were added")
+        self.shards = shards
+        self._source = 0
+        self._after: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self._source >= self.shards.previous_ring.node_count
+
+    async def run_batch(self, batch_size: int) -> int:
+        """Scan the next batch_size keys and return how many rows were moved."""
+        if self.done:
+            return 0
+        source = self._source
+        async with self.shards.session(source) as db:
+            query = select(URLModel.key).order_by(URLModel.key).limit(batch_size)
+            if self._after is not None:
+                query = query.where(URLModel.key > self._after)
+            with DB_QUERY.time():
+                keys = list(await db.scalars(query))
+
+        by_target: Dict[int, List[str]] = defaultdict(list)
+        for key in keys:
+            target = self.shards.shard_for(key)
+            if target != source:
+                by_target[target].append(key)
+        moved = 0
+        for target, target_keys in by_target.items():
+            moved += await self._move(source, target, target_keys)
+
+        if len(keys) < batch_size:
+            logger.info("Rebalanced shard", shard=source)
+            self._source += 1
+            self._after = None
+        else:
+            self._after = keys[-1]
+        return moved
+
+    async def _move(self, source: int, target: int, keys: List[str]) -> int:
+        async with self.shards.session(source) as source_db, self.shards.session(target) as target_db:
+            # Deleting first locks the rows on the source (the whole database on SQLite) until
+            # they are committed on the target. Writes and click counts for them wait, find
+            # nothing, and the sharded repository retries them on the target. If the target
+            # fails, the source rolls back and keeps the rows.
+            with DB_QUERY.time():
+                rows = (await source_db.execute(
+                    delete(URLModel).where(URLModel.key.in_(keys)).returning(*MOVED_COLUMNS)
+                )).mappings().all()
+            if not rows:
+                return 0
+            with DB_QUERY.time():
+                inserted = set(await target_db.scalars(
+                    insert_ignoring_conflicts(target_db, URLModel.__table__).returning(URLModel.key),
+                    [dict(row) for row in rows]
+                ))
+            copied = [row for row in rows if row["key"] not in inserted]
+            if copied:
+                # Left by an earlier attempt whose source commit failed. Clicks were still
+                # counted on the source, so its count includes everything the copy has.
+                await self._merge_clicks(target_db, copied)
+            with DB_COMMIT.time():
+                await target_db.commit()
+            with DB_COMMIT.time():
+                await source_db.commit()
+        return len(rows)
+
+    @staticmethod
+    async def _merge_clicks(target_db: AsyncSession, rows: List[Mapping]) -> None:
+        moved_clicks = bindparam("moved_clicks")
+        statement = (
+            update(URLModel.__table__)
+            .where(URLModel.key == bindparam("moved_key"))
+            .values(clicks=case((URLModel.clicks < moved_clicks, moved_clicks), else_=URLModel.clicks))
+        )
+        connection = await target_db.connection()
+        with DB_QUERY.time():
+            await connection.execute(
+                statement, [{"moved_key": row["key"], "moved_clicks": row["clicks"]} for row in rows]
+            )
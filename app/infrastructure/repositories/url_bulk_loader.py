@@ -0,0 +1,114 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Sequence
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import DB_COMMIT, DB_QUERY
+from app.database import ShardPool
+from app.models.urls import URL as URLModel
+from .async_sqlalchemy_url_repository import insert_ignoring_conflicts
+
+STAGING_TABLE = "urls_import"
+KEY_LOOKUP_CHUNK_SIZE = 500
+
+
+def key_position(columns: Sequence[str]) -> int:
+    """Where the key sits in rows laid out in `columns` order."""
+    return list(columns).index("key")
+
+
+class UrlBulkLoader:
+    """Inserts already validated url rows for imports, skipping keys that are taken.
+
+    On Postgres the rows are COPYed into a temporary staging table and moved
+    into urls with one INSERT ... SELECT, which avoids building and parsing a
+    huge multi-row INSERT. Other databases get one executemany INSERT.
+    Nothing is committed until commit(), so the caller can record which keys
+    were inserted before they become visible.
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def insert(self, columns: Sequence[str], rows: List[tuple]) -> List[str]:
+        """Insert rows given as tuples in `columns` order and return the keys that were new."""
+        if not rows:
+            return []
+        if self.db_session.get_bind().dialect.name == "postgresql":
+            return await self._copy(columns, rows)
+        return await self._insert(columns, rows)
+
+    async def commit(self) -> None:
+        with DB_COMMIT.time():
+            await self.db_session.commit()
+
+    async def rollback(self) -> None:
+        await self.db_session.rollback()
+
+    async def _copy(self, columns: Sequence[str], rows: List[tuple]) -> List[str]:
+        column_list = ", ".join(columns)
+        table = URLModel.__tablename__
+        with DB_QUERY.time():
+            # Runs through the session first so the COPY below joins its transaction.
+            await self.db_session.execute(text(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DELETE ROWS AS "
+                f"SELECT {column_list} FROM {table} WITH NO DATA"
+            ))
+            connection = await self.db_session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                STAGING_TABLE, records=rows, columns=list(columns)
+            )
+            result = await self.db_session.execute(text(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {STAGING_TABLE} "
+                "ON CONFLICT (key) DO NOTHING RETURNING key"
+            ))
+        return list(result.scalars())
+
+    async def _insert(self, columns: Sequence[str], rows: List[tuple]) -> List[str]:
+        # RETURNING would make SQLAlchemy split the executemany into tiny statements, so
+        # taken keys are looked up first. The INSERT still skips conflicts, so a key taken
+        # in between is only miscounted, never overwritten.
+        key_index = key_position(columns)
+        keys = [row[key_index] for row in rows]
+        taken = set()
+        with DB_QUERY.time():
+            for offset in range(0, len(keys), KEY_LOOKUP_CHUNK_SIZE):
+                chunk = keys[offset:offset + KEY_LOOKUP_CHUNK_SIZE]
+                taken.update(await self.db_session.scalars(select(URLModel.key).where(URLModel.key.in_(chunk))))
+            values = [dict(zip(columns, row)) for row in rows if row[key_index] not in taken]
+            if values:
+                # The Core table, not the mapped class, so the ORM's per-row bulk machinery is skipped.
+                statement = insert_ignoring_conflicts(self.db_session, URLModel.__table__)
+                await self.db_session.execute(statement, values)
+        return [key for key in keys if key not in taken]
+
+
+class ShardedUrlBulkLoader:
+    """Splits import rows across the UrlBulkLoaders of a ShardPool by the shard that owns each key.
+
+    Shards commit one after another, so a failure can leave a batch committed
+    on some shards only. Running the batch again skips those rows as taken.
+    """
+
+    def __init__(self, shards: ShardPool, loaders: List[UrlBulkLoader]):
+        self.shards = shards
+        self.loaders = loaders
+
+    async def insert(self, columns: Sequence[str], rows: List[tuple]) -> List[str]:
+        key_index = key_position(columns)
+        by_shard: Dict[int, List[tuple]] = defaultdict(list)
+        for row in rows:
+            by_shard[self.shards.shard_for(row[key_index])].append(row)
+        inserted = await asyncio.gather(*(
+            self.loaders[index].insert(columns, shard_rows) for index, shard_rows in by_shard.items()
+        ))
+        return [key for keys in inserted for key in keys]
+
+    async def commit(self) -> None:
+        for loader in self.loaders:
+            await loader.commit()
+
+    async def rollback(self) -> None:
+        for loader in self.loaders:
+            await loader.rollback()
@@ -1,30 +1,213 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from .database import Base
-from .core.config import get_engine
-from .api.v1.urls import router
-from .utils.logging import configure_logging
+from fastapi import FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from typing import AsyncIterator, Dict
+from .database import init_engine, dispose_engine, get_pool_status
+from .application import BatchWorker, ClickFlusher
+from .application.click_buffer import get_click_buffer, get_click_event_buffer
+from .api.v1.redirects import RedirectFastPath
+from .api.v1.urls import forward_to_target_url, router
+from .core.cache import cache_stats, get_redis
+from .core.config import get_settings
+from .core.key_filter import KeyFilterBus, KeyFilterRebuilder, get_key_filter, recent_keys_for
+from .core.metrics import MetricsMiddleware, TinyUrlCollector
+from .core.rate_limit import RateLimitMiddleware, get_rate_limiter
+from .core.local_cache import CacheInvalidationBus, get_local_url_cache
+from .core.startup import startup_timer
+from .core.warmup import CACHE_WARMUP_STRATEGIES, get_cache_warmup
+from .dependencies.container import get_container
+from .domain.entities import ClickEventKey
+from .infrastructure.repositories import AsyncSqlAlchemyClickStatsRepository
+from .utils.logging import configure_logging, get_logger, shutdown_logging
 from datetime import datetime
 
+logger = get_logger()
+
+
+async def write_click_counts(counts: Dict[str, int]) -> None:
+    async with get_container().session() as db:
+        await get_container().url_storage(db).increment_clicks(counts)
+
+
+async def write_click_events(counts: Dict[ClickEventKey, int]) -> None:
+    async with get_container().session() as db:
+        await AsyncSqlAlchemyClickStatsRepository(db_session=db).add_events(counts)
+
+
+async def roll_up_click_events(batch_size: int) -> int:
+    settings = get_settings()
+    settled_before = int(time.time()) - settings.click_rollup_settle_seconds
+    async with get_container().session() as db:
+        repository = AsyncSqlAlchemyClickStatsRepository(db_session=db, max_referrers=settings.click_stats_max_referrers)
+        return await repository.rollup(batch_size, settled_before)
+
+
+async def rebuild_key_filter() -> None:
+    chunk_size = get_settings().key_filter_scan_chunk_size
+    async with get_container().session() as db:
+        repository = get_container().url_storage(db)
+        expected_keys = await repository.count_active()
+        await get_key_filter().rebuild(expected_keys, repository.stream_active_keys(chunk_size))
+
+
+async def warm_caches() -> AsyncIterator[int]:
+    settings = get_settings()
+    if settings.cache_warmup_strategy not in CACHE_WARMUP_STRATEGIES:
+        raise ValueError(f"CACHE_WARMUP_STRATEGY must be one of {', '.join(CACHE_WARMUP_STRATEGIES)}")
+    clicks_since = None
+    if settings.cache_warmup_strategy == "recent":
+        if not settings.click_events_enabled:
+            raise ValueError("CACHE_WARMUP_STRATEGY=recent needs CLICK_EVENTS_ENABLED")
+        clicks_since = int(time.time()) - settings.cache_warmup_window_seconds
+    async with get_container().session() as db:
+        service = get_container().url_service_for(db)
+        async for count in service.warm_caches(
+                settings.cache_warmup_top_n,
+                settings.cache_warmup_chunk_size,
+                clicks_since
+        ):
+            yield count
+
+
+async def reap_expired_urls(batch_size: int) -> int:
+    async with get_container().session() as db:
+        return await get_container().url_service_for(db).reap_expired_urls(batch_size)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    configure_logging()
-
-    engine = get_engine()
-    try:
-        Base.metadata.create_all(bind=engine)
-        print("Database tables created successfully")
-    except Exception as e:
-        print(f"Warning: Could not create database tables: {e}")
-        print("Make sure your database is running and credentials are correct")
+    with startup_timer.phase("logging"):
+        configure_logging()
+
+    # The schema is managed by `alembic upgrade head`, run once per deploy rather than per worker.
+    with startup_timer.phase("database_engine"):
+        app.state.engine = init_engine()
+
+    settings = get_settings()
+    background_started = time.perf_counter()
+    invalidation_bus = None
+    if settings.cache_enabled and settings.local_cache_enabled:
+        invalidation_bus = CacheInvalidationBus(
+            redis_client=get_redis(),
+            channel=settings.cache_invalidation_channel,
+            local_cache=get_local_url_cache()
+        )
+        invalidation_bus.start()
+
+    key_filter_bus = None
+    key_filter_rebuilder = None
+    if settings.key_filter_active:
+        key_filter_bus = KeyFilterBus(
+            redis_client=get_redis(),
+            channel=settings.key_filter_channel,
+            key_filter=get_key_filter(),
+            recent_keys=recent_keys_for(get_redis())
+        )
+        key_filter_bus.start()
+        key_filter_rebuilder = KeyFilterRebuilder(
+            rebuild=rebuild_key_filter,
+            interval_seconds=settings.key_filter_rebuild_interval_seconds
+        )
+        key_filter_rebuilder.start()
+
+    click_flusher = None
+    if settings.click_buffer_enabled:
+        click_flusher = ClickFlusher(
+            click_buffer=get_click_buffer(),
+            write_counts=write_click_counts,
+            interval_seconds=settings.click_flush_interval_seconds
+        )
+        click_flusher.start()
+
+    click_event_flusher = None
+    click_rollup_worker = None
+    if settings.click_events_enabled:
+        click_event_flusher = ClickFlusher(
+            click_buffer=get_click_event_buffer(),
+            write_counts=write_click_events,
+            interval_seconds=settings.click_flush_interval_seconds,
+            name="click events"
+        )
+        click_event_flusher.start()
+        click_rollup_worker = BatchWorker(
+            name="click rollup",
+            run_batch=roll_up_click_events,
+            interval_seconds=settings.click_rollup_interval_seconds,
+            batch_size=settings.click_rollup_batch_size
+        )
+        click_rollup_worker.start()
+
+    url_reaper = None
+    if settings.url_reaper_enabled:
+        url_reaper = BatchWorker(
+            name="expired url reaper",
+            run_batch=reap_expired_urls,
+            interval_seconds=settings.url_reaper_interval_seconds,
+            batch_size=settings.url_reaper_batch_size
+        )
+        url_reaper.start()
+
+    cache_warmup = get_cache_warmup()
+    if settings.cache_warmup_active:
+        cache_warmup.start(warm_caches)
+    else:
+        cache_warmup.skip()
+    startup_timer.record("background_tasks", time.perf_counter() - background_started)
+    logger.info("Worker started", **startup_timer.snapshot())
     yield
+    await cache_warmup.stop()
+    if url_reaper:
+        await url_reaper.stop()
+    if click_rollup_worker:
+        await click_rollup_worker.stop()
+    if click_event_flusher:
+        await click_event_flusher.stop()
+    if click_flusher:
+        await click_flusher.stop()
+    if key_filter_rebuilder:
+        await key_filter_rebuilder.stop()
+    if key_filter_bus:
+        await key_filter_bus.stop()
+    if invalidation_bus:
+        await invalidation_bus.stop()
+    if settings.cache_enabled:
+        await get_redis().aclose()
+        get_redis.cache_clear()
+        get_rate_limiter.cache_clear()
+    await dispose_engine()
+    shutdown_logging()
 
 
+API_PREFIX = "/api/v1"
+
 app = FastAPI(title="TinyURL API", version="1.0.0", lifespan=lifespan)
+if get_settings().redirect_fast_path_enabled and get_settings().local_cache_enabled:
+    app.add_middleware(
+        RedirectFastPath,
+        prefix=API_PREFIX,
+        url_cache=get_local_url_cache(),
+        click_buffer=get_click_buffer() if get_settings().click_buffer_enabled else None,
+        click_events=get_click_event_buffer() if get_settings().click_events_enabled else None,
+        route=next(route for route in router.routes if getattr(route, "endpoint", None) is forward_to_target_url)
+    )
+if get_settings().rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        prefix=API_PREFIX,
+        trusted_proxy_hops=get_settings().rate_limit_trusted_proxy_hops
+    )
+app.add_middleware(MetricsMiddleware)
+REGISTRY.register(TinyUrlCollector())
 
 
-app.include_router(router, prefix="/api/v1")
+app.include_router(router, prefix=API_PREFIX)
+startup_timer.record("import", time.perf_counter() - IMPORT_STARTED)
 
 
 @app.get("/")
@@ -34,8 +217,25 @@ async def read_root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
+    cache_warmup = get_cache_warmup()
+    health = {
+        "status": "healthy" if cache_warmup.ready else "warming",
         "timestamp": datetime.now(),
-        "service": "tinyurl-api"
-    }
\ No newline at end of file
+        "service": "tinyurl-api",
+        "database_pool": get_pool_status(),
+        "cache": cache_stats.snapshot(),
+        "local_cache": get_local_url_cache().snapshot(),
+        "key_filter": get_key_filter().snapshot(),
+        "cache_warmup": cache_warmup.snapshot(),
+        "pending_click_keys": len(get_click_buffer()),
+        "startup": startup_timer.snapshot()
+    }
+    if not cache_warmup.ready:
+        # Not ready for traffic until the caches are warm.
+        return JSONResponse(status_code=503, content=jsonable_encoder(health))
+    return health
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
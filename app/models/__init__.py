@@ -1,4 +1,5 @@
 from .urls import URL
+from .clicks import ClickEvent, ClickRollup
 
-__all__ = ["URL"]
+__all__ = ["URL", "ClickEvent", "ClickRollup"]
 
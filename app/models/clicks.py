@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, Index, Integer, String
+
+from app.database import Base
+
+
+class ClickEvent(Base):
+    """Append-only stream of buffered clicks, one row per minute/referrer/user-agent group."""
+    __tablename__ = "click_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    key = Column(String, nullable=False)
+    minute_start = Column(BigInteger, nullable=False)
+    referrer_host = Column(String, nullable=False)
+    user_agent_family = Column(String, nullable=False)
+    clicks = Column(Integer, nullable=False)
+    recorded_at = Column(BigInteger, nullable=False)
+
+
+class ClickRollup(Base):
+    __tablename__ = "click_rollups"
+
+    key = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(BigInteger, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # Cache warm-up ranks keys by their recent totals, which the key-first primary key can't serve.
+        Index("ix_click_rollups_recent", "granularity", "dimension", "bucket_start"),
+    )
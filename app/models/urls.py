@@ -1,14 +1,41 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, LargeBinary, String, true
 
 from app.database import Base
+from app.domain.entities.url import MAX_KEY_LENGTH
+from app.domain.url_validator import MAX_URL_LENGTH
+
+SECRET_KEY_HASH_LENGTH = 32
 
 
 class URL(Base):
     __tablename__ = "urls"
 
-    id = Column(Integer, primary_key=True)
-    key = Column(String, unique=True, index=True)
-    secret_key = Column(String, unique=True, index=True)
-    target_url = Column(String, index=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    key = Column(String(MAX_KEY_LENGTH), unique=True, index=True)
+    # SHA-256 of the secret key. Lookups go through the key index and compare
+    # the hash, so the secret needs no index of its own.
+    secret_key_hash = Column(LargeBinary(SECRET_KEY_HASH_LENGTH), nullable=False)
+    target_url = Column(String(MAX_URL_LENGTH))
+    target_url_hash = Column(BigInteger, index=True)
     is_active = Column(Boolean, default=True)
     clicks = Column(Integer, default=0)
+    created_at = Column(DateTime)
+    expires_at = Column(DateTime)
+
+    __table_args__ = (
+        # Partial index: the reaper only ever scans active links that can expire.
+        Index(
+            "ix_urls_active_expires_at",
+            "expires_at",
+            postgresql_where=is_active & expires_at.isnot(None),
+            sqlite_where=is_active & expires_at.isnot(None),
+        ),
+        # Cache warm-up reads the most clicked active links; only those are indexed.
+        # SQLite only uses a partial index whose condition matches the query's "is_active = 1".
+        Index(
+            "ix_urls_active_clicks",
+            clicks.desc(),
+            postgresql_where=is_active,
+            sqlite_where=is_active == true(),
+        ),
+    )
@@ -1,3 +1,3 @@
-from .schemas import URLBase, URLCustom, URLInfo
+from .schemas import URLBase, URLBulk, URLCustom, URLInfo
 
-__all__ = ["URLBase", "URLCustom", "URLInfo"]
\ No newline at end of file
+__all__ = ["URLBase", "URLBulk", "URLCustom", "URLInfo"]
\ No newline at end of file
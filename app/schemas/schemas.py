@@ -1,14 +1,36 @@
-from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, field_validator
+from app.domain.entities.url import MAX_KEY_LENGTH
 
 
 class URLBase(BaseModel):
     target_url: str
+    expires_at: Optional[datetime] = None
 
 
-class URLCustom(URLBase):
+class URLCreate(URLBase):
+    expires_at: Optional[datetime] = Field(
+        default=None,
+        description="When the short URL stops redirecting; treated as UTC when no offset is given"
+    )
+
+    @field_validator("expires_at")
+    @classmethod
+    def expiry_in_future(cls, value: Optional[datetime]) -> Optional[datetime]:
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if value <= datetime.now(timezone.utc).replace(tzinfo=None):
+            raise ValueError("expires_at must be in the future")
+        return value
+
+
+class URLCustom(URLCreate):
     custom_key: str = Field(
         min_length=3,
-        max_length=20,
+        max_length=MAX_KEY_LENGTH,
         description="Custom key for the short URL (3-20 characters, letters, numbers, hyphens, underscores)"
     )
 
@@ -19,4 +41,42 @@ class URLInfo(URLBase):
     key: str
     secret_key: str
     url: str
-    admin_url: str
\ No newline at end of file
+    admin_url: str
+
+
+class URLSummary(URLBase):
+    is_active: bool = True
+    clicks: int = 0
+    key: str
+    url: str
+
+
+class URLPage(BaseModel):
+    items: List[URLSummary]
+    next_after: Optional[str] = Field(
+        default=None,
+        description="Pass as 'after' to fetch the next page; null on the last page"
+    )
+
+
+class URLBulk(BaseModel):
+    target_urls: List[str] = Field(
+        min_length=1,
+        description="Target URLs to shorten in one request"
+    )
+
+
+class ClickBucket(BaseModel):
+    bucket_start: datetime
+    clicks: int
+
+
+class URLClickStats(BaseModel):
+    key: str
+    granularity: str
+    start: datetime
+    end: datetime
+    total_clicks: int
+    buckets: List[ClickBucket]
+    referrers: Dict[str, int]
+    user_agents: Dict[str, int]
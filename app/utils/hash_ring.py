@@ -0,0 +1,30 @@
+import bisect
+import hashlib
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashRing:
+    """Consistent hashing of string keys onto nodes 0..node_count-1.
+
+    Each node owns virtual_nodes points on a 64-bit ring and a key belongs to
+    the first point at or after its hash. Growing the ring from n to n+1 nodes
+    moves only the keys that land on the new node's points, about 1/(n+1) of
+    them, and never moves a key between two existing nodes.
+    """
+
+    def __init__(self, node_count: int, virtual_nodes: int = 128):
+        points = sorted(
+            (ring_hash(f"{node}#{replica}"), node)
+            for node in range(node_count)
+            for replica in range(virtual_nodes)
+        )
+        self.node_count = node_count
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> int:
+        index = bisect.bisect_left(self._hashes, ring_hash(key))
+        return self._nodes[index % len(self._nodes)]
@@ -1,12 +1,37 @@
+import hashlib
 import secrets
 import string
-import hashlib
-import time
+
+BASE62_ALPHABET = string.ascii_letters + string.digits
+
+
+def encode_base62(number: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        number, remainder = divmod(number, 62)
+        chars.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(chars))
+
 
 def create_random_key(length: int = 8) -> str:
-    timestamp = str(time.time()).encode('utf-8')
-    random_bytes = secrets.token_bytes(32)
-    combined = timestamp + random_bytes
-    hash_digest = hashlib.sha256(combined).hexdigest()
-    chars = string.ascii_letters + string.digits
-    return "".join(chars[int(hash_digest[i], 16) % len(chars)] for i in range(length))
\ No newline at end of file
+    """Return a key drawn uniformly from the full base62 keyspace of the given length."""
+    return encode_base62(secrets.randbelow(62 ** length), length)
+
+
+def create_secret_key(key: str) -> str:
+    return f"{key}_{create_random_key(length=8)}"
+
+
+def key_from_secret_key(secret_key: str) -> str:
+    """Return the short URL key a secret key was issued for (secret keys are "<key>_<random>")."""
+    return secret_key.rsplit("_", 1)[0]
+
+
+def hash_secret_key(secret_key: str) -> bytes:
+    """Fixed-width digest stored in place of the secret key.
+
+    Secret keys carry 47 random bits, which is far beyond what offline
+    guessing can reach, so a single SHA-256 is enough. A slow, salted hash such as
+    bcrypt would make every admin request slow and the result impossible to look up.
+    """
+    return hashlib.sha256(secret_key.encode("utf-8")).digest()
@@ -1,31 +1,154 @@
-import structlog
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional, TextIO
+import structlog
+from app.core.config import get_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class SampleEvents:
+    """Drops events logged with ``sample=True`` except for a random fraction.
+
+    Hot-path call sites opt in per event, so a redirect can log at DEBUG
+    without paying for every line once the level is lowered in production.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    def __call__(self, logger, method_name, event_dict):
+        if event_dict.pop("sample", False) and self.rate < 1.0 and random.random() >= self.rate:
+            raise structlog.DropEvent
+        return event_dict
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting them first.
+
+    The default handler renders the message on the calling thread, which is
+    exactly the work we want to move off the request path. Records are
+    dropped instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def capture_exc_info(logger, method_name, event_dict):
+    """Resolve ``exc_info=True`` while still on the thread that caught the exception."""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def add_record_timestamp(logger, method_name, event_dict):
+    """Stamp the time the event was logged, not the time the listener rendered it."""
+    record = event_dict.get("_record")
+    created = datetime.fromtimestamp(record.created, tz=timezone.utc) if record else datetime.now(tz=timezone.utc)
+    event_dict["timestamp"] = created.isoformat()
+    return event_dict
+
 
+def _orjson_dumps(event_dict, **kwargs) -> str:
+    return orjson.dumps(event_dict, default=str).decode()
+
+
+def build_renderer(name: str):
+    if name == "console":
+        return structlog.dev.ConsoleRenderer(colors=False)
+    if name == "orjson" and orjson is not None:
+        return structlog.processors.JSONRenderer(serializer=_orjson_dumps)
+    return structlog.processors.JSONRenderer(serializer=json.dumps)
+
+
+def configure_logging(stream: TextIO = sys.stdout):
+    global _listener
+    settings = get_settings()
+    level = logging.getLevelName(settings.log_level.upper())
+    if not isinstance(level, int):
+        level = logging.INFO
 
-def configure_logging():
     structlog.configure(
         processors=[
-            structlog.stdlib.filter_by_level,
+            SampleEvents(settings.log_sample_rate),
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
             structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
+            capture_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        wrapper_class=structlog.make_filtering_bound_logger(level),
         cache_logger_on_first_use=True,
     )
 
-    logging.basicConfig(
-        format="%(message)s",
-        level=logging.INFO,
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+        ],
+        processors=[
+            add_record_timestamp,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            build_renderer(settings.log_renderer),
+        ],
     )
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(formatter)
+
+    shutdown_logging()
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    _replace_root_handler(NonBlockingQueueHandler(log_queue))
+    logging.getLogger().setLevel(level)
+
+
+def shutdown_logging():
+    """Stop the background listener after it has written everything queued.
+
+    Anything logged afterwards is written synchronously by the stream handler.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _replace_root_handler(*_listener.handlers)
+        _listener = None
+
+
+def _replace_root_handler(*handlers: logging.Handler) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
 
 
 def get_logger():
-    return structlog.get_logger()
\ No newline at end of file
+    return structlog.get_logger()
@@ -0,0 +1,64 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import quote, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# The characters Starlette's RedirectResponse leaves unescaped in a Location header.
+LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+PLAIN_HOST = re.compile(r"^[a-z0-9._:-]{1,253}$")
+
+
+def normalize_url(url: str) -> str:
+    """Canonicalize the parts of a URL that don't change where it points.
+
+    The scheme and host are lowercased, default ports are dropped and an empty
+    path becomes "/". Path, query and fragment are kept byte-for-byte.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+
+def hash_url(url: str) -> int:
+    """Return a signed 64-bit hash of a URL, sized to fit a BIGINT column."""
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+@lru_cache(maxsize=4096)
+def referrer_host(referrer: Optional[str]) -> Optional[str]:
+    """Reduce a Referer header to its lowercased host, or None if it has none."""
+    if not referrer:
+        return None
+    try:
+        return urlsplit(referrer).hostname
+    except ValueError:
+        return None
+
+
+def is_plain_host(host: str) -> bool:
+    """Whether a host looks like a hostname or IP address rather than arbitrary client input."""
+    return PLAIN_HOST.match(host) is not None
+
+
+def encode_location(target_url: str) -> bytes:
+    """Location header value for a redirect to target_url, escaped like RedirectResponse does."""
+    return quote(target_url, safe=LOCATION_SAFE_CHARS).encode("latin-1")
@@ -0,0 +1,26 @@
+from functools import lru_cache
+from typing import Optional
+
+# Checked in order: several browsers also advertise the engines listed after them.
+USER_AGENT_FAMILIES = (
+    ("bot", ("bot", "crawler", "spider", "curl/", "wget/", "python-requests", "httpx", "headless")),
+    ("edge", ("edg/", "edge/")),
+    ("opera", ("opr/", "opera")),
+    ("samsung", ("samsungbrowser/",)),
+    ("chrome", ("chrome/", "crios/")),
+    ("firefox", ("firefox/", "fxios/")),
+    ("safari", ("safari/",)),
+)
+OTHER_USER_AGENT = "other"
+
+
+@lru_cache(maxsize=4096)
+def user_agent_family(user_agent: Optional[str]) -> Optional[str]:
+    """Classify a User-Agent header into a coarse browser family."""
+    if not user_agent:
+        return None
+    user_agent = user_agent.lower()
+    for family, markers in USER_AGENT_FAMILIES:
+        if any(marker in user_agent for marker in markers):
+            return family
+    return OTHER_USER_AGENT
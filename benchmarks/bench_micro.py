@@ -0,0 +1,42 @@
+"""Micro-benchmarks of per-request helpers on the create and redirect paths.
+
+    python -m benchmarks.bench_micro --items 100000
+"""
+import argparse
+
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository
+from app.models.urls import URL as URLModel
+from app.utils.keygen import create_random_key, hash_secret_key
+from benchmarks.common import measure, one_by_one, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lengths = [8] * args.items
+    url_entities = [
+        UrlEntity(target_url=f"https://example.com/path/{index}", key=f"k{index}", secret_key=f"k{index}_secret")
+        for index in range(args.items)
+    ]
+    db_urls = [
+        URLModel(target_url=entity.target_url, key=entity.key, secret_key_hash=hash_secret_key(entity.secret_key),
+                 is_active=True, clicks=0)
+        for entity in url_entities
+    ]
+    map_to_entity = AsyncSqlAlchemyUrlRepository(db_session=None)._map_to_entity
+
+    results = [
+        measure("keygen.create_random_key", one_by_one(lambda length: create_random_key(length=length)),
+                lengths, args.repeat),
+        measure("UrlEntity.validate_url", one_by_one(UrlEntity.validate_url), url_entities, args.repeat),
+        measure("AsyncSqlAlchemyUrlRepository._map_to_entity", one_by_one(map_to_entity), db_urls, args.repeat),
+    ]
+    print(report("micro", results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Micro-benchmark of target URL validation.
+
+Compares app.domain.url_validator against the previous validators.url +
+urlparse implementation, when the validators package is installed.
+
+    python -m benchmarks.bench_url_validation --urls 20000
+"""
+import argparse
+import random
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+from app.domain.url_validator import UrlValidator
+from benchmarks.common import measure, one_by_one, report
+
+HOSTS = [
+    "example.com", "www.google.com", "news.ycombinator.com", "github.com",
+    "docs.python.org", "en.wikipedia.org", "sub.domain.co.uk", "8.8.8.8",
+    "10.0.0.1", "localhost", "bücher.example",
+]
+
+
+def legacy_validator() -> Optional[Callable[[str], bool]]:
+    try:
+        import validators
+    except ImportError:
+        return None
+
+    def validate(url: str) -> bool:
+        try:
+            if not validators.url(str(url)):
+                return False
+            parsed = urlparse(str(url))
+            if parsed.scheme not in ['http', 'https']:
+                return False
+            if parsed.hostname in ['localhost', '127.0.0.1', '0.0.0.0']:
+                return False
+            return True
+        except Exception:
+            return False
+
+    return validate
+
+
+def generate_urls(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    urls = []
+    for index in range(count):
+        scheme = rng.choice(["https", "https", "http", "ftp"])
+        host = rng.choice(HOSTS)
+        urls.append(f"{scheme}://{host}/path/{index}?utm_source=campaign&id={rng.randrange(10 ** 6)}")
+    return urls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    urls = generate_urls(args.urls, args.seed)
+    validator = UrlValidator()
+    results = [
+        measure("url_validator.validate", one_by_one(validator.validate), urls, args.repeat),
+        measure("url_validator.validate_many", validator.validate_many, urls, args.repeat),
+    ]
+    legacy = legacy_validator()
+    if legacy:
+        results.append(measure("legacy validators.url+urlparse", one_by_one(legacy), urls, args.repeat))
+
+    print(report("url_validation", results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import platform
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def measure(name: str, run_batch: Callable[[List], object], items: List, repeat: int) -> Dict:
+    """Time run_batch(items) and report the best of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run_batch(items)
+        best = min(best, time.perf_counter() - started)
+    return {"name": name, "items": len(items), "seconds": best, "ns_per_item": best / len(items) * 1e9}
+
+
+def one_by_one(function: Callable) -> Callable[[List], List]:
+    return lambda items: [function(item) for item in items]
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": None for point in points}
+    return {
+        f"p{point}": ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))]
+        for point in points
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(benchmark: str, results: List[Dict], **details) -> str:
+    """Render results as JSON tagged with the commit and interpreter they came from."""
+    return json.dumps({
+        "benchmark": benchmark,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        **details,
+        "results": results,
+    }, indent=2)
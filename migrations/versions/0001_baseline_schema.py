@@ -0,0 +1,47 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 06:11:28.449185
+
+The urls table as the old create_all on startup built it. Databases created
+that way already have it; mark them with `alembic stamp 0001` and then
+upgrade.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('urls',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('secret_key', sa.String(), nullable=True),
+    sa.Column('target_url', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('clicks', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.create_index('ix_urls_key', ['key'], unique=True)
+        batch_op.create_index('ix_urls_secret_key', ['secret_key'], unique=True)
+        batch_op.create_index('ix_urls_target_url', ['target_url'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.drop_index('ix_urls_target_url')
+        batch_op.drop_index('ix_urls_secret_key')
+        batch_op.drop_index('ix_urls_key')
+    op.drop_table('urls')
@@ -0,0 +1,103 @@
+"""hash target urls for deduplication
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 06:12:03.215870
+
+Adds the indexed 64-bit hash of the normalized target URL that
+DEDUP_TARGET_URLS looks repeated URLs up by, and fills it in for existing
+links.
+"""
+import hashlib
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+urls = sa.table(
+    'urls',
+    sa.column('id', sa.Integer()),
+    sa.column('target_url', sa.String()),
+    sa.column('target_url_hash', sa.BigInteger()),
+)
+
+
+def normalize_url(url: str) -> str:
+    # A copy of app.utils.urls.normalize_url as of this revision, so later
+    # changes to the app can't change what this migration writes.
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname
+    if ':' in netloc:
+        netloc = f'[{netloc}]'
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f'{netloc}:{port}'
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f'{parts.username}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, parts.fragment))
+
+
+def hash_url(url: str) -> int:
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def backfill_target_url_hashes() -> None:
+    # The hash is computed in Python, so both dialects go through the same batches.
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(urls.c.id, urls.c.target_url)
+            .where(urls.c.id > last_id)
+            .order_by(urls.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            urls.update().where(urls.c.id == sa.bindparam('row_id')).values(target_url_hash=sa.bindparam('digest')),
+            [
+                {'row_id': row.id, 'digest': hash_url(normalize_url(row.target_url)) if row.target_url else None}
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('target_url_hash', sa.BigInteger(), nullable=True))
+
+    backfill_target_url_hashes()
+
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.create_index('ix_urls_target_url_hash', ['target_url_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.drop_index('ix_urls_target_url_hash')
+        batch_op.drop_column('target_url_hash')
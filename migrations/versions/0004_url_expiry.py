@@ -0,0 +1,38 @@
+"""expiring links: created_at, expires_at and the partial expiry index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 06:13:15.870442
+
+Existing links keep a NULL created_at and never expire.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_EXPIRING = sa.text('is_active AND expires_at IS NOT NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_urls_active_expires_at', ['expires_at'], unique=False,
+                              postgresql_where=ACTIVE_EXPIRING, sqlite_where=ACTIVE_EXPIRING)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.drop_index('ix_urls_active_expires_at')
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('created_at')
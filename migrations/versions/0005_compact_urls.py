@@ -0,0 +1,118 @@
+"""compact urls: bigint ids, bounded columns, hashed secret keys
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 06:20:04.118355
+
+Replaces the plaintext secret_key column and its unique index with a
+32-byte SHA-256 digest. The secret is found through the key index, so the
+digest needs no index of its own. Also drops the index on target_url,
+usually the largest on the table: deduplication looks URLs up by
+target_url_hash, and nothing queries target_url directly. Databases
+created while the model no longer declared the index don't have it.
+
+On PostgreSQL, widening the id column rewrites the table under an
+exclusive lock, so run this in a maintenance window on large tables.
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MAX_KEY_LENGTH = 20
+MAX_URL_LENGTH = 2048
+BACKFILL_BATCH_SIZE = 10000
+
+urls = sa.table(
+    'urls',
+    sa.column('id', sa.BigInteger()),
+    sa.column('secret_key', sa.String()),
+    sa.column('secret_key_hash', sa.LargeBinary()),
+)
+
+
+def backfill_secret_key_hashes() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("UPDATE urls SET secret_key_hash = sha256(convert_to(secret_key, 'UTF8'))")
+        return
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(urls.c.id, urls.c.secret_key)
+            .where(urls.c.id > last_id)
+            .order_by(urls.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            urls.update().where(urls.c.id == sa.bindparam('row_id')).values(secret_key_hash=sa.bindparam('digest')),
+            [{'row_id': row.id, 'digest': hashlib.sha256(row.secret_key.encode('utf-8')).digest()} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_urls_target_url', table_name='urls', if_exists=True)
+
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('secret_key_hash', sa.LargeBinary(length=32), nullable=True))
+
+    backfill_secret_key_hashes()
+
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.alter_column('secret_key_hash', existing_type=sa.LargeBinary(length=32), nullable=False)
+        batch_op.drop_index('ix_urls_secret_key')
+        batch_op.drop_column('secret_key')
+        batch_op.alter_column('id', existing_type=sa.Integer(),
+                              type_=sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), existing_nullable=False)
+        batch_op.alter_column('key', existing_type=sa.String(), type_=sa.String(length=MAX_KEY_LENGTH),
+                              existing_nullable=True)
+        batch_op.alter_column('target_url', existing_type=sa.String(), type_=sa.String(length=MAX_URL_LENGTH),
+                              existing_nullable=True)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # The serial sequence keeps its own integer type and would still stop at 2**31 - 1.
+        op.execute("ALTER SEQUENCE urls_id_seq AS BIGINT")
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    The plaintext secret keys can't be recovered from their hashes, so
+    existing links lose their admin access on downgrade.
+    """
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.alter_column('target_url', existing_type=sa.String(length=MAX_URL_LENGTH), type_=sa.String(),
+                              existing_nullable=True)
+        batch_op.alter_column('key', existing_type=sa.String(length=MAX_KEY_LENGTH), type_=sa.String(),
+                              existing_nullable=True)
+        batch_op.alter_column('id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER SEQUENCE urls_id_seq AS INTEGER")
+
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('secret_key', sa.String(), nullable=True))
+
+    # Fill with unguessable values so the restored unique column holds no usable secrets.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE urls SET secret_key = key || '_' || md5(random()::text)")
+    else:
+        op.execute("UPDATE urls SET secret_key = key || '_' || lower(hex(randomblob(16)))")
+
+    with op.batch_alter_table('urls', schema=None) as batch_op:
+        batch_op.drop_column('secret_key_hash')
+        batch_op.create_index('ix_urls_secret_key', ['secret_key'], unique=True)
+        batch_op.create_index('ix_urls_target_url', ['target_url'], unique=False)
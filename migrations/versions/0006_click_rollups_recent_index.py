@@ -0,0 +1,29 @@
+"""index click rollups by granularity, dimension and bucket
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 06:40:12.509371
+
+Lets cache warm-up rank keys by their clicks in recent buckets without
+scanning every rollup.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_click_rollups_recent', 'click_rollups', ['granularity', 'dimension', 'bucket_start'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_click_rollups_recent', table_name='click_rollups')
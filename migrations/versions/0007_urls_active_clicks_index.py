@@ -0,0 +1,35 @@
+"""index active urls by clicks
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 06:49:37.902114
+
+Lets cache warm-up read the most clicked active links from the top of an
+index instead of sorting the whole table on every worker start.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite only uses a partial index whose condition matches the query's "is_active = 1".
+POSTGRESQL_ACTIVE = sa.text('is_active')
+SQLITE_ACTIVE = sa.text('is_active = 1')
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_urls_active_clicks', 'urls', [sa.text('clicks DESC')], unique=False,
+        postgresql_where=POSTGRESQL_ACTIVE, sqlite_where=SQLITE_ACTIVE
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_urls_active_clicks', table_name='urls')
@@ -0,0 +1,83 @@
+import os
+
+# Settings are read once per process, so background workers and Redis are
+# switched off before anything imports the app. Tests that need Redis pass a
+# fakeredis client to the object under test.
+os.environ.update({
+    "CACHE_ENABLED": "false",
+    "CACHE_WARMUP_ENABLED": "false",
+    "CLICK_EVENTS_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "URL_REAPER_ENABLED": "false",
+})
+
+import fakeredis
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.core.config import get_settings
+from app.database import Base, create_db_engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def create_sqlite_engine(path):
+    engine = create_db_engine(get_settings(), f"sqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return engine
+
+
+@pytest.fixture
+async def sqlite_engines(tmp_path):
+    """Creates SQLite databases with the schema in the test's directory, by name."""
+    engines = []
+
+    async def create(name):
+        engines.append(await create_sqlite_engine(tmp_path / f"{name}.db"))
+        return engines[-1]
+
+    yield create
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.fixture
+async def db_engine(sqlite_engines):
+    return await sqlite_engines("tinyurl")
+
+
+@pytest.fixture
+async def db_session(db_engine):
+    async with async_sessionmaker(bind=db_engine, autoflush=False, expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.fixture
+async def redis_client():
+    client = fakeredis.aioredis.FakeRedis()
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+async def client(tmp_path, monkeypatch):
+    """An HTTP client for the app, backed by its own SQLite database."""
+    from app.main import app as tinyurl_app
+
+    db_path = tmp_path / "app.db"
+    await (await create_sqlite_engine(db_path)).dispose()
+    monkeypatch.setenv("DB_URL", f"sqlite:///{db_path}")
+    get_settings.cache_clear()
+    try:
+        async with tinyurl_app.router.lifespan_context(tinyurl_app):
+            transport = httpx.ASGITransport(app=tinyurl_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http_client:
+                yield http_client
+    finally:
+        get_settings.cache_clear()
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.core.config import get_settings
+
+pytestmark = pytest.mark.anyio
+
+ADMIN_TOKEN = "test-admin-token"
+AUTHORIZED = {"X-Admin-Token": ADMIN_TOKEN}
+KEYS = ["delta", "alpha", "echo", "charlie", "bravo"]
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    # Runs before the client fixture loads the settings.
+    monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+
+
+@pytest.fixture
+async def stored(client):
+    for key in KEYS:
+        response = await client.post("/api/v1/custom_url", json={
+            "target_url": f"https://example.com/{key}",
+            "custom_key": key,
+        })
+        assert response.status_code == 200
+
+
+async def test_pages_follow_key_order(client, stored):
+    pages = []
+    after = None
+    while True:
+        params = {"limit": 2} if after is None else {"limit": 2, "after": after}
+        page = (await client.get("/api/v1/admin/urls", params=params, headers=AUTHORIZED)).json()
+        pages.append([item["key"] for item in page["items"]])
+        after = page["next_after"]
+        if after is None:
+            break
+
+    assert pages == [["alpha", "bravo"], ["charlie", "delta"], ["echo"]]
+
+
+async def test_page_that_fills_exactly_has_no_next(client, stored):
+    page = (await client.get("/api/v1/admin/urls", params={"limit": 5}, headers=AUTHORIZED)).json()
+
+    assert len(page["items"]) == 5
+    assert page["next_after"] is None
+    assert "secret_key" not in page["items"][0]
+
+
+@pytest.mark.parametrize("path", ["/api/v1/admin/urls", "/api/v1/admin/urls/export"])
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+async def test_admin_routes_require_the_token(client, path, headers):
+    response = await client.get(path, headers=headers)
+
+    assert response.status_code == 403
+
+
+async def test_admin_routes_are_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", None)
+
+    response = await client.get("/api/v1/admin/urls/export", headers=AUTHORIZED)
+
+    assert response.status_code == 403
+
+
+async def test_csv_export_streams_every_row(client, stored, monkeypatch):
+    monkeypatch.setattr(get_settings(), "export_chunk_size", 2)
+
+    response = await client.get("/api/v1/admin/urls/export", params={"format": "csv"}, headers=AUTHORIZED)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["key"] for row in rows] == KEYS
+    assert rows[0] == {
+        "key": "delta",
+        "target_url": "https://example.com/delta",
+        "is_active": "True",
+        "clicks": "0",
+        "url": "http://localhost:8000/delta",
+        "expires_at": "",
+    }
+
+
+async def test_ndjson_export_omits_secret_keys(client, stored):
+    response = await client.get("/api/v1/admin/urls/export", headers=AUTHORIZED)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["key"] for line in lines] == KEYS
+    assert all("secret_key" not in line for line in lines)
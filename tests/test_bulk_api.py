@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from app.core.config import get_settings
+
+pytestmark = pytest.mark.anyio
+
+NDJSON = "application/x-ndjson"
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def test_json_body_reports_invalid_urls_per_item(client):
+    response = await client.post("/api/v1/urls/bulk", json={"target_urls": [
+        "https://example.com/one",
+        "not a url",
+        "http://localhost/admin",
+        "https://example.com/two",
+    ]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON)
+    lines = read_lines(response)
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert lines[0]["target_url"] == "https://example.com/one"
+    assert lines[0]["secret_key"].startswith(lines[0]["key"] + "_")
+    assert lines[1] == {"index": 1, "target_url": "not a url", "error": "Invalid URL format: not a url"}
+    assert lines[2]["error"] == "Invalid URL format: http://localhost/admin"
+    assert lines[3]["target_url"] == "https://example.com/two"
+    assert lines[0]["key"] != lines[3]["key"]
+
+
+async def test_ndjson_body_reports_unparseable_lines(client):
+    body = "\n".join([
+        '"https://example.com/plain"',
+        '{"target_url": "https://example.com/object"}',
+        "{not json",
+        '{"url": "https://example.com/wrong-field"}',
+        "",
+    ])
+
+    response = await client.post("/api/v1/urls/bulk", content=body, headers={"content-type": NDJSON})
+
+    lines = read_lines(response)
+    assert lines[0]["target_url"] == "https://example.com/plain"
+    assert lines[1]["target_url"] == "https://example.com/object"
+    assert lines[2] == {"index": 2, "error": "Line is not valid JSON"}
+    assert lines[3] == {"index": 3, "error": "Expected a URL string or an object with 'target_url'"}
+    assert len(lines) == 4
+
+
+async def test_results_keep_input_order_across_chunks(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_chunk_size", 2)
+    target_urls = [f"https://example.com/{number}" for number in range(5)]
+
+    lines = read_lines(await client.post("/api/v1/urls/bulk", json={"target_urls": target_urls}))
+
+    assert [line["index"] for line in lines] == list(range(5))
+    assert [line["target_url"] for line in lines] == target_urls
+    assert len({line["key"] for line in lines}) == 5
+
+
+async def test_created_urls_redirect(client):
+    lines = read_lines(await client.post("/api/v1/urls/bulk", json={"target_urls": ["https://example.com/go"]}))
+
+    response = await client.get(f"/api/v1/{lines[0]['key']}")
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://example.com/go"
+
+
+async def test_too_many_items_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_max_items", 2)
+
+    response = await client.post("/api/v1/urls/bulk", json={"target_urls": ["https://example.com/a"] * 3})
+
+    assert response.status_code == 400
+    assert "limit of 2 items" in response.json()["detail"]
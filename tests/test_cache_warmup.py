@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from app.application.url_service import UrlService
+from app.core.local_cache import LocalUrlCache
+from app.core.warmup import CacheWarmup, get_cache_warmup
+from app.domain.entities.click import ClickEventKey
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyClickStatsRepository, AsyncSqlAlchemyUrlRepository
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyUrlRepository(db_session=db_session)
+
+
+async def chunks(*sizes):
+    for size in sizes:
+        yield size
+
+
+async def finished(*warmups):
+    while not all(warmup.ready for warmup in warmups):
+        await asyncio.sleep(0.01)
+
+
+async def store(repository, clicks):
+    """Store one URL per click count, keyed by its position, and return their keys in the same order."""
+    keys = []
+    for number, count in enumerate(clicks):
+        key = f"key{number:04d}"
+        await repository.create(UrlEntity(
+            target_url=f"https://example.com/{number}", key=key, secret_key=f"{key}_SECRET01", clicks=count
+        ))
+        keys.append(key)
+    return keys
+
+
+async def test_warmup_counts_urls_and_becomes_ready():
+    warmup = CacheWarmup(timeout_seconds=5)
+
+    warmup.start(lambda: chunks(3, 2))
+    assert warmup.state == "warming" and not warmup.ready
+    await finished(warmup)
+
+    assert warmup.snapshot()["state"] == "warm"
+    assert warmup.urls == 5
+    assert warmup.ready
+
+
+async def test_warmup_that_fails_or_times_out_still_becomes_ready():
+    async def failing():
+        yield 1
+        raise RuntimeError("database unavailable")
+
+    async def hanging():
+        yield 1
+        await asyncio.Event().wait()
+        yield 1
+
+    failed = CacheWarmup(timeout_seconds=5)
+    failed.start(failing)
+    timed_out = CacheWarmup(timeout_seconds=0.05)
+    timed_out.start(hanging)
+    await finished(failed, timed_out)
+
+    assert (failed.state, failed.ready) == ("failed", True)
+    assert (timed_out.state, timed_out.ready, timed_out.urls) == ("timed_out", True, 1)
+
+
+async def test_warm_caches_preloads_the_most_clicked_urls(repository):
+    keys = await store(repository, [5, 50, 0, 500])
+    url_cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    url_service = UrlService(url_repository=repository, url_cache=url_cache)
+
+    sizes = [size async for size in url_service.warm_caches(limit=2, chunk_size=1)]
+
+    assert sizes == [1, 1]
+    assert url_cache.peek(keys[3]) is not None
+    assert url_cache.peek(keys[1]) is not None
+    assert url_cache.peek(keys[0]) is None
+
+
+async def test_recent_strategy_ranks_by_rolled_up_clicks(repository, db_session):
+    keys = await store(repository, [500, 0, 0])
+    stats = AsyncSqlAlchemyClickStatsRepository(db_session=db_session)
+    now = int(time.time())
+    minute = now - now % 60
+    await stats.add_events({
+        ClickEventKey(keys[1], minute, "direct", "Chrome"): 7,
+        ClickEventKey(keys[2], minute, "direct", "Chrome"): 3,
+    })
+    await stats.rollup(batch_size=100, settled_before=now + 1)
+
+    streamed = [
+        url_entity.key
+        async for url_entities in repository.stream_hottest(10, 10, now - 3600)
+        for url_entity in url_entities
+    ]
+
+    assert streamed == [keys[1], keys[2]]
+
+
+async def test_health_is_unavailable_while_warming(client):
+    warmup = get_cache_warmup()
+    release = asyncio.Event()
+
+    async def warm():
+        yield 1
+        await release.wait()
+
+    warmup.start(warm)
+    try:
+        warming = await client.get("/health")
+        release.set()
+        await finished(warmup)
+        warm_response = await client.get("/health")
+    finally:
+        await warmup.stop()
+        warmup.skip()
+
+    assert warming.status_code == 503
+    assert warming.json()["status"] == "warming"
+    assert warming.json()["cache_warmup"]["state"] == "warming"
+    assert warm_response.status_code == 200
+    assert warm_response.json()["status"] == "healthy"
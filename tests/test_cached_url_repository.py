@@ -0,0 +1,98 @@
+import fakeredis
+import pytest
+
+from app.core.cache import cache_stats
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository, CachedUrlRepository
+from app.infrastructure.repositories.cached_url_repository import NEGATIVE_ENTRY
+
+pytestmark = pytest.mark.anyio
+
+TTL_SECONDS = 3600
+NEGATIVE_TTL_SECONDS = 60
+
+
+class CountingRepository(AsyncSqlAlchemyUrlRepository):
+    """Counts the key lookups that reach the database."""
+
+    lookups = 0
+
+    async def get_by_key(self, key):
+        self.lookups += 1
+        return await super().get_by_key(key)
+
+
+@pytest.fixture
+def repository(db_session):
+    return CountingRepository(db_session=db_session)
+
+
+@pytest.fixture
+def cached(repository, redis_client):
+    return CachedUrlRepository(repository, redis_client, TTL_SECONDS, NEGATIVE_TTL_SECONDS)
+
+
+@pytest.fixture
+async def stored(repository):
+    return await repository.create(
+        UrlEntity(target_url="https://example.com/page", key="abc123", secret_key="abc123_SECRET01")
+    )
+
+
+async def test_miss_loads_from_database_and_stores_entry(cached, repository, redis_client, stored):
+    url_entity = await cached.get_by_key(stored.key)
+
+    assert url_entity.target_url == "https://example.com/page"
+    assert repository.lookups == 1
+    assert await redis_client.exists("tinyurl:url:abc123")
+    assert 0 < await redis_client.ttl("tinyurl:url:abc123") <= TTL_SECONDS
+
+
+async def test_hit_skips_database(cached, repository, stored):
+    await cached.get_by_key(stored.key)
+    url_entity = await cached.get_by_key(stored.key)
+
+    assert url_entity.key == "abc123"
+    assert url_entity.target_url == "https://example.com/page"
+    assert repository.lookups == 1
+
+
+async def test_unknown_key_is_cached_as_negative_entry(cached, repository, redis_client):
+    assert await cached.get_by_key("missing") is None
+    assert await cached.get_by_key("missing") is None
+
+    assert repository.lookups == 1
+    assert await redis_client.get("tinyurl:url:missing") == NEGATIVE_ENTRY
+    assert 0 < await redis_client.ttl("tinyurl:url:missing") <= NEGATIVE_TTL_SECONDS
+
+
+async def test_create_replaces_negative_entry(cached):
+    assert await cached.get_by_key("fresh1") is None
+
+    await cached.create(UrlEntity(target_url="https://example.com/new", key="fresh1", secret_key="fresh1_SECRET01"))
+
+    assert (await cached.get_by_key("fresh1")).target_url == "https://example.com/new"
+
+
+async def test_deactivate_invalidates_entry(cached, repository, redis_client, stored):
+    await cached.get_by_key(stored.key)
+
+    await cached.deactivate_by_secret_key("abc123_SECRET01")
+
+    assert await cached.get_by_key(stored.key) is None
+    assert repository.lookups == 2
+    assert await redis_client.get("tinyurl:url:abc123") == NEGATIVE_ENTRY
+
+
+async def test_redis_error_falls_back_to_database(repository, stored):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cached = CachedUrlRepository(repository, fakeredis.aioredis.FakeRedis(server=server), TTL_SECONDS,
+                                 NEGATIVE_TTL_SECONDS)
+    errors = cache_stats.errors
+
+    url_entity = await cached.get_by_key(stored.key)
+
+    assert url_entity.target_url == "https://example.com/page"
+    assert repository.lookups == 1
+    assert cache_stats.errors == errors + 1
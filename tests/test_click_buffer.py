@@ -0,0 +1,108 @@
+import pytest
+
+from app.application.click_buffer import ClickBuffer, ClickFlusher
+from app.application.url_service import UrlService
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository
+
+pytestmark = pytest.mark.anyio
+
+
+class Writer:
+    """Records every batch of counts written, optionally failing instead."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    async def __call__(self, counts):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(dict(counts))
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyUrlRepository(db_session=db_session)
+
+
+@pytest.fixture
+async def stored(repository):
+    return await repository.create(
+        UrlEntity(target_url="https://example.com/", key="abc123", secret_key="abc123_SECRET01")
+    )
+
+
+def test_add_accumulates_and_reports_full():
+    click_buffer = ClickBuffer(max_keys=2)
+
+    assert not click_buffer.add("a")
+    assert not click_buffer.add("a", 2)
+    assert click_buffer.add("b")
+    assert len(click_buffer) == 2
+
+
+async def test_flush_writes_counts_once():
+    click_buffer = ClickBuffer(max_keys=10)
+    writer = Writer()
+    click_buffer.add("a")
+    click_buffer.add("a")
+    click_buffer.add("b")
+
+    assert await click_buffer.flush(writer) == 3
+    assert await click_buffer.flush(writer) == 0
+    assert writer.batches == [{"a": 2, "b": 1}]
+
+
+async def test_failed_flush_restores_counts():
+    click_buffer = ClickBuffer(max_keys=10)
+    click_buffer.add("a", 2)
+
+    async def failing_writer(counts):
+        # Clicks keep arriving while the write is in flight.
+        click_buffer.add("a")
+        click_buffer.add("b")
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError):
+        await click_buffer.flush(failing_writer)
+
+    writer = Writer()
+    assert await click_buffer.flush(writer) == 4
+    assert writer.batches == [{"a": 3, "b": 1}]
+
+
+async def test_flusher_keeps_counts_after_failure_and_flushes_on_stop():
+    click_buffer = ClickBuffer(max_keys=10)
+    writer = Writer(fail=True)
+    flusher = ClickFlusher(click_buffer, writer, interval_seconds=60)
+    click_buffer.add("a")
+
+    flusher.start()
+    await flusher.flush()
+    assert len(click_buffer) == 1
+    writer.fail = False
+    await flusher.stop()
+
+    assert writer.batches == [{"a": 1}]
+    assert len(click_buffer) == 0
+
+
+async def test_service_buffers_clicks_until_flushed(repository, stored):
+    click_buffer = ClickBuffer(max_keys=10)
+    url_service = UrlService(url_repository=repository, click_buffer=click_buffer)
+
+    for _ in range(3):
+        await url_service.increment_click_count(stored)
+
+    assert (await repository.get_by_key("abc123")).clicks == 0
+    await click_buffer.flush(repository.increment_clicks)
+    assert (await repository.get_by_key("abc123")).clicks == 3
+
+
+async def test_service_flushes_inline_when_buffer_fills(repository, stored):
+    url_service = UrlService(url_repository=repository, click_buffer=ClickBuffer(max_keys=1))
+
+    await url_service.increment_click_count(stored)
+
+    assert (await repository.get_by_key("abc123")).clicks == 1
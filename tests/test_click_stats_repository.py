@@ -0,0 +1,128 @@
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app.domain.entities.click import OTHER_REFERRER, ClickEventKey
+from app.infrastructure.repositories import AsyncSqlAlchemyClickStatsRepository
+from app.models.clicks import ClickEvent as ClickEventModel
+
+pytestmark = pytest.mark.anyio
+
+MINUTE = 1_700_000_040
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyClickStatsRepository(db_session=db_session)
+
+
+def referrers(rollups):
+    return {rollup.value: rollup.clicks for rollup in rollups if rollup.dimension == "referrer"}
+
+
+def settled():
+    return int(time.time()) + 1
+
+
+def totals(rollups):
+    return {(rollup.bucket_start, rollup.dimension, rollup.value): rollup.clicks for rollup in rollups}
+
+
+async def test_rollup_folds_events_into_every_granularity(repository):
+    await repository.add_events({
+        ClickEventKey("abc123", MINUTE, "example.org", "Firefox"): 2,
+        ClickEventKey("abc123", MINUTE + 60, "direct", "Chrome"): 3,
+        ClickEventKey("other1", MINUTE, "direct", "Chrome"): 7,
+    })
+
+    assert await repository.rollup(batch_size=100, settled_before=settled()) == 3
+
+    minutes = totals(await repository.get_rollups("abc123", "minute", MINUTE, MINUTE + 120))
+    assert minutes == {
+        (MINUTE, "total", ""): 2,
+        (MINUTE, "referrer", "example.org"): 2,
+        (MINUTE, "user_agent", "Firefox"): 2,
+        (MINUTE + 60, "total", ""): 3,
+        (MINUTE + 60, "referrer", "direct"): 3,
+        (MINUTE + 60, "user_agent", "Chrome"): 3,
+    }
+    hour_start = MINUTE - MINUTE % 3600
+    hours = totals(await repository.get_rollups("abc123", "hour", hour_start, hour_start + 3600))
+    assert hours[(hour_start, "total", "")] == 5
+    day_start = MINUTE - MINUTE % 86400
+    days = totals(await repository.get_rollups("abc123", "day", day_start, day_start + 86400))
+    assert days[(day_start, "total", "")] == 5
+
+
+async def test_rollup_counts_each_event_once(repository):
+    await repository.add_events({ClickEventKey("abc123", MINUTE, "direct", "Chrome"): 1})
+    await repository.rollup(batch_size=100, settled_before=settled())
+    assert await repository.rollup(batch_size=100, settled_before=settled()) == 0
+
+    await repository.add_events({ClickEventKey("abc123", MINUTE, "direct", "Chrome"): 4})
+    assert await repository.rollup(batch_size=100, settled_before=settled()) == 1
+
+    minutes = totals(await repository.get_rollups("abc123", "minute", MINUTE, MINUTE + 60))
+    assert minutes[(MINUTE, "total", "")] == 5
+
+
+async def test_rollup_works_in_batches(repository):
+    await repository.add_events({ClickEventKey("abc123", MINUTE + 60 * n, "direct", "Chrome"): 1 for n in range(5)})
+
+    assert await repository.rollup(batch_size=2, settled_before=settled()) == 2
+    assert await repository.rollup(batch_size=2, settled_before=settled()) == 2
+    assert await repository.rollup(batch_size=2, settled_before=settled()) == 1
+    assert await repository.rollup(batch_size=2, settled_before=settled()) == 0
+
+
+async def test_rollup_waits_for_events_to_settle(repository):
+    await repository.add_events({ClickEventKey("abc123", MINUTE, "direct", "Chrome"): 1})
+
+    assert await repository.rollup(batch_size=100, settled_before=int(time.time()) - 60) == 0
+    assert await repository.rollup(batch_size=100, settled_before=settled()) == 1
+
+
+async def test_rollup_picks_up_late_events_with_lower_ids(repository, db_session):
+    await repository.add_events({ClickEventKey("abc123", MINUTE, "direct", "Chrome"): 1})
+    await repository.add_events({ClickEventKey("abc123", MINUTE, "direct", "Firefox"): 2})
+    # The first insert was slow, so it settles after the event with the higher id.
+    await db_session.execute(update(ClickEventModel).where(ClickEventModel.id == 1).values(recorded_at=settled() + 60))
+    await db_session.commit()
+
+    assert await repository.rollup(batch_size=100, settled_before=settled()) == 1
+    assert await repository.rollup(batch_size=100, settled_before=settled() + 61) == 1
+
+    minutes = totals(await repository.get_rollups("abc123", "minute", MINUTE, MINUTE + 60))
+    assert minutes[(MINUTE, "total", "")] == 3
+    assert minutes[(MINUTE, "user_agent", "Chrome")] == 1
+
+
+async def test_rollup_caps_referrers_per_bucket(db_session):
+    repository = AsyncSqlAlchemyClickStatsRepository(db_session=db_session, max_referrers=2)
+    await repository.add_events({
+        ClickEventKey("abc123", MINUTE, "a.example", "Chrome"): 5,
+        ClickEventKey("abc123", MINUTE, "b.example", "Chrome"): 3,
+        ClickEventKey("abc123", MINUTE, "c.example", "Chrome"): 1,
+    })
+    await repository.rollup(batch_size=100, settled_before=settled())
+
+    assert referrers(await repository.get_rollups("abc123", "minute", MINUTE, MINUTE + 60)) == {
+        "a.example": 5, "b.example": 3, OTHER_REFERRER: 1,
+    }
+
+    # The bucket is full, so a new host counts towards "other" while known hosts keep their rows.
+    await repository.add_events({
+        ClickEventKey("abc123", MINUTE, "d.example", "Chrome"): 4,
+        ClickEventKey("abc123", MINUTE, "a.example", "Chrome"): 1,
+    })
+    await repository.rollup(batch_size=100, settled_before=settled())
+
+    assert referrers(await repository.get_rollups("abc123", "minute", MINUTE, MINUTE + 60)) == {
+        "a.example": 6, "b.example": 3, OTHER_REFERRER: 5,
+    }
+    # Another bucket has its own slots.
+    await repository.add_events({ClickEventKey("abc123", MINUTE + 60, "d.example", "Chrome"): 2})
+    await repository.rollup(batch_size=100, settled_before=settled())
+
+    assert referrers(await repository.get_rollups("abc123", "minute", MINUTE + 60, MINUTE + 120)) == {"d.example": 2}
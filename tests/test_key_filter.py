@@ -0,0 +1,137 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.core import key_filter as key_filter_module
+from app.core.key_bus import RedisKeyBus
+from app.core.key_filter import BloomFilter, KeyFilter, KeyFilterBus, RecentKeys
+from app.utils.keygen import create_random_key
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunks(*key_lists):
+    for keys in key_lists:
+        yield list(keys)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    keys = {create_random_key() for _ in range(5000)}
+
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    unseen = [key for key in (create_random_key() for _ in range(5000)) if key not in keys]
+    false_positives = sum(1 for key in unseen if key in bloom)
+    assert false_positives < len(unseen) * 0.03
+
+
+async def test_filter_admits_every_key_until_built():
+    key_filter = KeyFilter(error_rate=0.01, min_capacity=100)
+
+    assert not key_filter.ready
+    assert not await key_filter.definitely_absent("anything")
+    assert key_filter.rejections == 0
+
+
+async def test_built_filter_rejects_only_unknown_keys():
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+
+    await key_filter.rebuild(2, chunks(["alpha"], ["bravo"]))
+
+    assert key_filter.ready
+    assert not await key_filter.definitely_absent("alpha")
+    assert not await key_filter.definitely_absent("bravo")
+    assert await key_filter.definitely_absent("missing")
+    assert key_filter.snapshot() == {"ready": True, "stale": False, "keys": 2, "capacity": 100, "rejections": 1}
+
+
+async def test_added_keys_are_admitted_and_published():
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+    published = []
+
+    async def publish(key):
+        published.append(key)
+
+    key_filter.publisher = publish
+    await key_filter.rebuild(0, chunks())
+
+    await key_filter.add("fresh1")
+    await key_filter.add("remote1", propagate=False)
+
+    assert not await key_filter.definitely_absent("fresh1")
+    assert not await key_filter.definitely_absent("remote1")
+    assert published == ["fresh1"]
+
+
+async def test_rebuild_keeps_keys_added_during_the_scan():
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+    await key_filter.rebuild(0, chunks())
+
+    async def scan_racing_a_create():
+        yield ["alpha"]
+        # A create lands after its row was already passed by the scan.
+        await key_filter.add("racing1")
+        yield ["bravo"]
+
+    await key_filter.rebuild(2, scan_racing_a_create())
+
+    assert not await key_filter.definitely_absent("racing1")
+    assert not await key_filter.definitely_absent("alpha")
+
+
+async def test_recent_keys_confirm_keys_the_filter_missed(redis_client):
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+    key_filter.recent_keys = RecentKeys(redis_client, "tinyurl:keys:recent", retention_seconds=600)
+    await key_filter.rebuild(0, chunks())
+
+    # Another worker created the key, but its announcement never arrived.
+    await RecentKeys(redis_client, "tinyurl:keys:recent", retention_seconds=600).add_many(["remote1"])
+
+    assert not await key_filter.definitely_absent("remote1")
+    assert await key_filter.definitely_absent("missing")
+    assert key_filter.rejections == 1
+
+
+async def test_filter_older_than_the_retention_is_not_trusted(monkeypatch, redis_client):
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+    key_filter.recent_keys = RecentKeys(redis_client, "tinyurl:keys:recent", retention_seconds=600)
+    await key_filter.rebuild(0, chunks())
+    later = time.time() + 601
+    monkeypatch.setattr(key_filter_module, "time", SimpleNamespace(time=lambda: later))
+
+    assert not await key_filter.definitely_absent("missing")
+    assert key_filter.snapshot()["stale"]
+
+
+async def test_bus_adds_received_keys_without_republishing(redis_client):
+    key_filter = KeyFilter(error_rate=0.001, min_capacity=100)
+    await key_filter.rebuild(0, chunks())
+    recent_keys = RecentKeys(redis_client, "tinyurl:keys:recent", retention_seconds=600)
+    bus = KeyFilterBus(redis_client, "tinyurl:keys", key_filter, recent_keys)
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe("tinyurl:keys")
+    bus.attach()
+
+    await bus.on_key("remote1")
+    await key_filter.add("local1")
+
+    assert not await key_filter.definitely_absent("remote1")
+    messages = []
+    for _ in range(5):
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
+        if message is not None:
+            messages.append(message["data"])
+    assert messages == [b"local1"]
+    assert await recent_keys.contains("local1")
+    assert not await recent_keys.contains("remote1")
+    await pubsub.aclose()
+
+
+def test_key_bus_subclasses_must_handle_received_keys():
+    with pytest.raises(TypeError):
+        RedisKeyBus(fakeredis.aioredis.FakeRedis(), "tinyurl:keys")
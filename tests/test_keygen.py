@@ -0,0 +1,36 @@
+from app.utils.keygen import (
+    BASE62_ALPHABET,
+    create_random_key,
+    encode_base62,
+    hash_secret_key,
+    key_from_secret_key,
+)
+
+
+def test_encode_base62_pads_to_length():
+    assert encode_base62(0, 8) == "aaaaaaaa"
+    assert encode_base62(61, 3) == "aa9"
+    assert encode_base62(62, 3) == "aba"
+
+
+def test_encode_base62_covers_keyspace():
+    assert encode_base62(62 ** 4 - 1, 4) == "9999"
+
+
+def test_random_keys_use_full_alphabet():
+    keys = [create_random_key(length=8) for _ in range(2000)]
+
+    assert all(len(key) == 8 and set(key) <= set(BASE62_ALPHABET) for key in keys)
+    # 16000 draws from 62 symbols miss one with negligible probability; hex-derived keys used only 16.
+    assert set("".join(keys)) == set(BASE62_ALPHABET)
+    assert len(set(keys)) == len(keys)
+
+
+
+def test_key_from_secret_key_keeps_underscores_in_the_key():
+    assert key_from_secret_key("my_key_AbCd1234") == "my_key"
+
+
+def test_hash_secret_key_is_fixed_width():
+    assert len(hash_secret_key("abc123_AbCd1234")) == 32
+    assert hash_secret_key("abc123_AbCd1234") != hash_secret_key("abc123_AbCd1235")
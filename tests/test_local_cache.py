@@ -0,0 +1,216 @@
+import asyncio
+
+import pytest
+
+from app.core import local_cache
+from app.core.local_cache import LocalUrlCache
+from app.domain.entities.url import UrlEntity
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Stands in for the time module in local_cache, so entries only expire when a test says so."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(local_cache, "time", clock)
+    return clock
+
+
+def url_entity(key):
+    return UrlEntity(target_url=f"https://example.com/{key}", key=key, secret_key=f"{key}_SECRET01")
+
+
+class Loader:
+    """Loads entities for any key and counts the calls per key."""
+
+    def __init__(self):
+        self.calls = {}
+
+    async def __call__(self, key):
+        self.calls[key] = self.calls.get(key, 0) + 1
+        return url_entity(key)
+
+
+async def test_hit_returns_a_copy_without_loading(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    loader = Loader()
+
+    first = await cache.get_or_load("a", loader)
+    first.clicks = 99
+    second = await cache.get_or_load("a", loader)
+
+    assert loader.calls == {"a": 1}
+    assert second.clicks == 0
+    assert cache.snapshot()["hits"] == 1
+
+
+async def test_concurrent_misses_share_one_load(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    release = asyncio.Event()
+    calls = []
+
+    async def slow_loader(key):
+        calls.append(key)
+        await release.wait()
+        return url_entity(key)
+
+    waiters = [asyncio.create_task(cache.get_or_load("k", slow_loader)) for _ in range(8)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == ["k"]
+    assert [result.key for result in results] == ["k"] * 8
+    assert len({id(result) for result in results}) == 8
+
+
+async def test_waiters_see_the_leaders_error(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    release = asyncio.Event()
+
+    async def failing_loader(key):
+        await release.wait()
+        raise RuntimeError("database unavailable")
+
+    waiters = [asyncio.create_task(cache.get_or_load("k", failing_loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_failed_load_does_not_poison_the_key(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+
+    async def failing_loader(key):
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load("a", failing_loader)
+
+    assert (await cache.get_or_load("a", Loader())).key == "a"
+
+
+async def test_cancelled_leader_lets_waiters_load(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    loader = Loader()
+
+    async def hanging_loader(key):
+        await asyncio.Event().wait()
+
+    leader = asyncio.create_task(cache.get_or_load("a", hanging_loader))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_load("a", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert (await waiter).key == "a"
+    assert loader.calls == {"a": 1}
+
+
+async def test_missing_keys_are_not_cached(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    calls = []
+
+    async def missing_loader(key):
+        calls.append(key)
+        return None
+
+    assert await cache.get_or_load("a", missing_loader) is None
+    assert await cache.get_or_load("a", missing_loader) is None
+    assert calls == ["a", "a"]
+
+
+async def test_least_recently_used_entry_is_evicted(clock):
+    cache = LocalUrlCache(max_size=2, ttl_seconds=30)
+    loader = Loader()
+
+    for key in ("a", "b", "a", "c", "a", "b"):
+        await cache.get_or_load(key, loader)
+
+    assert loader.calls == {"a": 1, "b": 2, "c": 1}
+    assert cache.snapshot()["size"] == 2
+
+
+async def test_entries_expire_after_ttl(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    loader = Loader()
+
+    await cache.get_or_load("a", loader)
+    clock.now += 29
+    await cache.get_or_load("a", loader)
+    clock.now += 2
+    await cache.get_or_load("a", loader)
+
+    assert loader.calls == {"a": 2}
+
+
+async def test_invalidate_drops_entry_and_notifies_publisher(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    published = []
+
+    async def publish(key):
+        published.append(key)
+
+    cache.publisher = publish
+    loader = Loader()
+
+    await cache.get_or_load("a", loader)
+    await cache.invalidate("a")
+    await cache.invalidate("b", propagate=False)
+    await cache.get_or_load("a", loader)
+
+    assert loader.calls == {"a": 2}
+    assert published == ["a"]
+
+
+async def test_load_that_raced_an_invalidation_is_not_cached(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    loader = Loader()
+
+    async def stale_loader(key):
+        # The row changes and is invalidated while this load is in flight.
+        await cache.invalidate(key)
+        return await loader(key)
+
+    assert (await cache.get_or_load("a", stale_loader)).key == "a"
+    await cache.get_or_load("a", loader)
+
+    assert loader.calls == {"a": 2}
+
+
+async def test_preload_fills_free_slots_without_evicting(clock):
+    cache = LocalUrlCache(max_size=3, ttl_seconds=30)
+    loader = Loader()
+    await cache.get_or_load("a", loader)
+
+    added = cache.preload([url_entity("hot1"), url_entity("a"), url_entity("hot2"), url_entity("hot3")],
+                          cache.generation)
+
+    assert added == 2
+    for key in ("a", "hot1", "hot2"):
+        await cache.get_or_load(key, loader)
+    assert loader.calls == {"a": 1}
+
+
+async def test_preload_read_before_an_invalidation_is_discarded(clock):
+    cache = LocalUrlCache(max_size=10, ttl_seconds=30)
+    loader = Loader()
+    generation = cache.generation
+
+    await cache.invalidate("hot1")
+
+    assert cache.preload([url_entity("hot1")], generation) == 0
+    await cache.get_or_load("hot1", loader)
+    assert loader.calls == {"hot1": 1}
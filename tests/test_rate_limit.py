@@ -0,0 +1,204 @@
+import fakeredis
+import httpx
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import (
+    CREATE,
+    REDIRECT,
+    RateLimit,
+    RateLimiter,
+    RateLimitMiddleware,
+    TokenBuckets,
+    classify,
+    forwarded_client_ip,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Stands in for the time module in rate_limit, so buckets and windows only move when a test says so."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_buckets_allow_burst_then_refill(clock):
+    buckets = TokenBuckets(max_clients=10)
+    limit = RateLimit(per_minute=60, burst=2)
+
+    assert buckets.take(["ip:a"], limit) == 0
+    assert buckets.take(["ip:a"], limit) == 0
+    assert buckets.take(["ip:a"], limit) == pytest.approx(1.0)
+    assert buckets.take(["ip:b"], limit) == 0
+
+    clock.now += 1
+    assert buckets.take(["ip:a"], limit) == 0
+
+
+def test_buckets_forget_least_recent_clients(clock):
+    buckets = TokenBuckets(max_clients=2)
+    limit = RateLimit(per_minute=60, burst=1)
+
+    buckets.take(["ip:a"], limit)
+    buckets.take(["ip:b"], limit)
+    buckets.take(["ip:c"], limit)
+
+    assert len(buckets) == 2
+    assert buckets.take(["ip:a"], limit) == 0
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/url", CREATE),
+    ("POST", "/custom_url", CREATE),
+    ("POST", "/urls/bulk", CREATE),
+    ("GET", "/abc123", REDIRECT),
+    ("GET", "/", None),
+    ("GET", "/docs", None),
+    ("GET", "/admin/abc_secret", None),
+    ("GET", "/admin/urls", None),
+    ("DELETE", "/admin/abc_secret", None),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) == expected
+
+
+@pytest.mark.parametrize("forwarded_for, hops, expected", [
+    ("203.0.113.7", 1, "203.0.113.7"),
+    ("1.1.1.1, 203.0.113.7", 1, "203.0.113.7"),
+    ("1.1.1.1, 203.0.113.7, 10.0.0.2", 2, "203.0.113.7"),
+    ("203.0.113.7", 2, "203.0.113.7"),
+    (" , ", 1, None),
+])
+def test_forwarded_client_ip_counts_from_the_right(forwarded_for, hops, expected):
+    assert forwarded_client_ip(forwarded_for, hops) == expected
+
+
+def test_redirects_are_not_limited_by_default():
+    rate_limit.get_rate_limiter.cache_clear()
+    try:
+        assert set(rate_limit.get_rate_limiter().limits) == {CREATE}
+    finally:
+        rate_limit.get_rate_limiter.cache_clear()
+
+
+async def test_limiter_counts_rejections(clock):
+    limiter = RateLimiter({CREATE: RateLimit(per_minute=60, burst=1)}, max_clients=10)
+
+    assert await limiter.check(CREATE, ["ip:a"]) == 0
+    assert await limiter.check(CREATE, ["ip:a"]) > 0
+    assert limiter.snapshot()["rejected"] == {CREATE: 1}
+
+
+async def test_api_key_is_limited_across_addresses(clock):
+    limiter = RateLimiter({CREATE: RateLimit(per_minute=60, burst=1)}, max_clients=10)
+
+    assert await limiter.check(CREATE, ["ip:a", "key:k"]) == 0
+    assert await limiter.check(CREATE, ["ip:b", "key:k"]) > 0
+
+
+async def test_rejected_request_takes_no_tokens(clock):
+    limiter = RateLimiter({CREATE: RateLimit(per_minute=60, burst=1)}, max_clients=10)
+
+    assert await limiter.check(CREATE, ["ip:a", "key:k"]) == 0
+    # Over the limit for its address, so the new API key keeps its token.
+    assert await limiter.check(CREATE, ["ip:a", "key:j"]) > 0
+    assert await limiter.check(CREATE, ["ip:b", "key:j"]) == 0
+
+
+async def test_shared_window_rejects_over_limit(clock, redis_client):
+    limits = {CREATE: RateLimit(per_minute=1, burst=1)}
+    workers = [RateLimiter(limits, max_clients=10, redis_client=redis_client) for _ in range(3)]
+
+    results = [await worker.check(CREATE, ["ip:a"]) for worker in workers]
+
+    # Each worker's own bucket has a token left, but the shared window allows 1 + 1 per minute.
+    assert results[:2] == [0, 0]
+    assert results[2] == pytest.approx(60 - 1000.0 % 60)
+    assert await workers[2].check(CREATE, ["ip:b"]) == 0
+
+    clock.now += 60
+    assert await workers[2].check(CREATE, ["ip:a"]) == 0
+
+
+async def test_shared_window_rejection_is_not_counted(clock, redis_client):
+    limits = {CREATE: RateLimit(per_minute=1, burst=1)}
+    workers = [RateLimiter(limits, max_clients=10, redis_client=redis_client) for _ in range(4)]
+
+    assert await workers[0].check(CREATE, ["ip:a", "key:k"]) == 0
+    assert await workers[1].check(CREATE, ["ip:a", "key:j"]) == 0
+    assert await workers[2].check(CREATE, ["ip:a", "key:j"]) > 0
+
+    # key:j has been allowed once, so it has one request left in the window.
+    assert await workers[3].check(CREATE, ["ip:b", "key:j"]) == 0
+
+
+async def test_redis_errors_let_requests_through(clock):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    limiter = RateLimiter({CREATE: RateLimit(per_minute=60, burst=5)}, max_clients=10,
+                          redis_client=fakeredis.aioredis.FakeRedis(server=server))
+
+    assert await limiter.check(CREATE, ["ip:a"]) == 0
+    assert limiter.snapshot()["redis_errors"] == 1
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def middleware_client(monkeypatch, limits, trusted_proxy_hops=0):
+    limiter = RateLimiter(limits, max_clients=100)
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: limiter)
+    middleware = RateLimitMiddleware(ok_app, prefix="/api/v1", trusted_proxy_hops=trusted_proxy_hops)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://testserver")
+
+
+async def test_middleware_answers_429_with_retry_after(monkeypatch, clock):
+    async with middleware_client(monkeypatch, {CREATE: RateLimit(per_minute=6, burst=1)}) as client:
+        assert (await client.post("/api/v1/url")).status_code == 200
+        response = await client.post("/api/v1/url")
+        # Requests the limit doesn't cover are passed through.
+        assert (await client.get("/api/v1/abc123")).status_code == 200
+        assert (await client.get("/api/v1/admin/urls")).status_code == 200
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "10"
+    assert response.json() == {"detail": "Rate limit exceeded"}
+
+
+async def test_middleware_ignores_client_supplied_forwarded_entries(monkeypatch, clock):
+    limits = {CREATE: RateLimit(per_minute=60, burst=2)}
+    async with middleware_client(monkeypatch, limits, trusted_proxy_hops=1) as client:
+        statuses = [
+            (await client.post("/api/v1/url", headers={"x-forwarded-for": f"10.0.0.{n}, 203.0.113.7"})).status_code
+            for n in range(4)
+        ]
+        other = await client.post("/api/v1/url", headers={"x-forwarded-for": "203.0.113.8"})
+
+    assert statuses == [200, 200, 429, 429]
+    assert other.status_code == 200
+
+
+async def test_middleware_uses_peer_address_without_trusted_proxies(monkeypatch, clock):
+    limits = {CREATE: RateLimit(per_minute=60, burst=1)}
+    async with middleware_client(monkeypatch, limits) as client:
+        first = await client.post("/api/v1/url", headers={"x-forwarded-for": "203.0.113.7"})
+        second = await client.post("/api/v1/url", headers={"x-forwarded-for": "203.0.113.8"})
+
+    assert (first.status_code, second.status_code) == (200, 429)
@@ -0,0 +1,131 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import database
+from app.core.config import get_settings
+from app.core.key_filter import RecentKeys
+from app.database import ReplicaPool, create_db_engine
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Stands in for the time module in app.database, so replicas only come back when a test says so."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(database, "time", clock)
+    return clock
+
+
+@pytest.fixture
+async def unreachable_engine(tmp_path):
+    engine = create_db_engine(get_settings(), f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    yield engine
+    await engine.dispose()
+
+
+def url_entity(key, target_url):
+    return UrlEntity(target_url=target_url, key=key, secret_key=f"{key}_SECRET01")
+
+
+async def store(engine, key, target_url):
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        await AsyncSqlAlchemyUrlRepository(db_session=db).create(url_entity(key, target_url))
+
+
+async def test_lookups_rotate_across_replicas(sqlite_engines, db_session):
+    replicas = [await sqlite_engines(f"replica{index}") for index in range(2)]
+    for index, engine in enumerate(replicas):
+        await store(engine, "abc123", f"https://replica{index}.example.com/")
+    repository = AsyncSqlAlchemyUrlRepository(db_session=db_session, replicas=ReplicaPool(replicas, retry_seconds=30))
+
+    targets = [(await repository.get_by_key("abc123")).target_url for _ in range(4)]
+
+    assert targets == [
+        "https://replica0.example.com/",
+        "https://replica1.example.com/",
+        "https://replica0.example.com/",
+        "https://replica1.example.com/",
+    ]
+
+
+async def test_failed_replica_is_skipped_until_retry(clock, sqlite_engines, unreachable_engine, db_session):
+    healthy = await sqlite_engines("replica")
+    await store(healthy, "abc123", "https://replica.example.com/")
+    replicas = ReplicaPool([unreachable_engine, healthy], retry_seconds=30)
+    repository = AsyncSqlAlchemyUrlRepository(db_session=db_session, replicas=replicas)
+
+    await repository.get_by_key("abc123")
+    assert [replica["healthy"] for replica in replicas.snapshot()] == [False, True]
+    assert [replicas.choose() for _ in range(3)] == [1, 1, 1]
+
+    clock.now += 31
+    assert [replica["healthy"] for replica in replicas.snapshot()] == [True, True]
+    assert replicas.choose() == 0
+
+
+async def test_all_replicas_down_reads_the_primary(clock, unreachable_engine, db_session):
+    primary = AsyncSqlAlchemyUrlRepository(db_session=db_session)
+    await primary.create(url_entity("abc123", "https://primary.example.com/"))
+    repository = AsyncSqlAlchemyUrlRepository(
+        db_session=db_session,
+        replicas=ReplicaPool([unreachable_engine], retry_seconds=30)
+    )
+
+    assert (await repository.get_by_key("abc123")).target_url == "https://primary.example.com/"
+    assert (await repository.get_by_key("abc123")).target_url == "https://primary.example.com/"
+    assert repository.replicas.choose() is None
+
+
+async def test_reads_after_a_write_stay_on_the_primary(sqlite_engines, db_session):
+    replica = await sqlite_engines("replica")
+    await store(replica, "stale1", "https://replica.example.com/")
+    repository = AsyncSqlAlchemyUrlRepository(db_session=db_session, replicas=ReplicaPool([replica], retry_seconds=30))
+
+    created = await repository.create(url_entity("fresh1", "https://primary.example.com/"))
+
+    assert (await repository.get_by_key(created.key)).target_url == "https://primary.example.com/"
+    assert (await repository.get_by_secret_key(created.secret_key)).key == "fresh1"
+    assert await repository.get_by_key("stale1") is None
+
+
+async def test_replica_miss_is_answered_without_the_primary(sqlite_engines, db_session):
+    await AsyncSqlAlchemyUrlRepository(db_session=db_session).create(
+        url_entity("fresh1", "https://primary.example.com/")
+    )
+    replica = await sqlite_engines("replica")
+    repository = AsyncSqlAlchemyUrlRepository(db_session=db_session, replicas=ReplicaPool([replica], retry_seconds=30))
+
+    assert await repository.get_by_key("fresh1") is None
+
+
+async def test_replica_miss_for_a_recent_key_is_retried_on_the_primary(sqlite_engines, db_session, redis_client):
+    created = await AsyncSqlAlchemyUrlRepository(db_session=db_session).create(
+        url_entity("fresh1", "https://primary.example.com/")
+    )
+    recent_keys = RecentKeys(redis_client, "tinyurl:keys:recent", retention_seconds=600)
+    await recent_keys.add_many(["fresh1"])
+    replica = await sqlite_engines("replica")
+    repository = AsyncSqlAlchemyUrlRepository(
+        db_session=db_session,
+        replicas=ReplicaPool([replica], retry_seconds=30),
+        recent_keys=recent_keys
+    )
+
+    assert (await repository.get_by_key("fresh1")).target_url == "https://primary.example.com/"
+    assert (await repository.get_by_secret_key(created.secret_key)).key == "fresh1"
+    assert await repository.get_by_key("other1") is None
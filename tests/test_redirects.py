@@ -0,0 +1,49 @@
+import pytest
+
+from app.application.click_buffer import get_click_buffer
+from app.application.url_service import UrlService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def slow_click_flush(monkeypatch):
+    # Runs before the client fixture loads the settings, so buffered clicks stay put during a test.
+    monkeypatch.setenv("CLICK_FLUSH_INTERVAL_SECONDS", "3600")
+
+
+async def create(client, target_url):
+    response = await client.post("/api/v1/url", json={"target_url": target_url})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_cached_key_is_redirected_by_the_fast_path(client, monkeypatch):
+    created = await create(client, "https://example.com/path?q=caf%C3%A9")
+    first = await client.get(f"/api/v1/{created['key']}")
+
+    async def route_not_reached(self, key):
+        raise AssertionError("the regular route handled a cached redirect")
+
+    monkeypatch.setattr(UrlService, "get_url_by_key", route_not_reached)
+    second = await client.get(f"/api/v1/{created['key']}")
+
+    assert first.status_code == second.status_code == 307
+    assert second.headers["location"] == "https://example.com/path?q=caf%C3%A9"
+    assert second.headers["content-length"] == "0"
+    assert get_click_buffer().drain() == {created["key"]: 2}
+
+
+async def test_unknown_key_falls_through_to_404(client):
+    response = await client.get("/api/v1/missing1")
+
+    assert response.status_code == 404
+
+
+async def test_deactivated_key_is_not_served_from_the_cache(client):
+    created = await create(client, "https://example.com/gone")
+    assert (await client.get(f"/api/v1/{created['key']}")).status_code == 307
+
+    assert (await client.delete(f"/api/v1/admin/{created['secret_key']}")).status_code == 200
+
+    assert (await client.get(f"/api/v1/{created['key']}")).status_code == 404
@@ -0,0 +1,152 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import ShardPool
+from app.domain.entities.url import UrlEntity
+from app.domain.exceptions import DuplicateKeyError
+from app.infrastructure.repositories import ShardedUrlRepository
+from app.infrastructure.repositories.sharded_url_repository import ShardRebalancer
+from app.models.urls import URL as URLModel
+
+pytestmark = pytest.mark.anyio
+
+URL_COUNT = 120
+
+
+@pytest.fixture
+async def engines(sqlite_engines):
+    return [await sqlite_engines(f"shard{index}") for index in range(3)]
+
+
+def shard_pool(engines, previous_count=0):
+    session_factories = [
+        async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False) for engine in engines
+    ]
+    return ShardPool(engines, session_factories, virtual_nodes=32, previous_count=previous_count)
+
+
+def url_entity(number):
+    key = f"key{number:04d}"
+    return UrlEntity(target_url=f"https://example.com/{number}", key=key, secret_key=f"{key}_SECRET01")
+
+
+async def keys_on(shards, index):
+    async with shards.session(index) as db:
+        return set(await db.scalars(select(URLModel.key)))
+
+
+async def total_clicks(shards):
+    total = 0
+    for index in range(len(shards)):
+        async with shards.session(index) as db:
+            total += await db.scalar(select(func.coalesce(func.sum(URLModel.clicks), 0)))
+    return total
+
+
+async def test_rows_live_on_the_shard_that_owns_their_key(engines):
+    shards = shard_pool(engines)
+    repository = ShardedUrlRepository(shards)
+
+    created = await repository.create_many([url_entity(number) for number in range(URL_COUNT)])
+
+    assert len(created) == URL_COUNT
+    for index in range(len(shards)):
+        keys = await keys_on(shards, index)
+        assert keys
+        assert all(shards.shard_for(key) == index for key in keys)
+    assert await repository.count_active() == URL_COUNT
+    assert (await repository.get_by_key("key0042")).target_url == "https://example.com/42"
+    assert (await repository.get_by_secret_key("key0042_SECRET01")).key == "key0042"
+
+
+async def test_create_reports_duplicates_on_the_owning_shard(engines):
+    repository = ShardedUrlRepository(shard_pool(engines))
+    await repository.create(url_entity(1))
+
+    with pytest.raises(DuplicateKeyError):
+        await repository.create(url_entity(1))
+
+
+async def test_list_page_merges_shards_in_key_order(engines):
+    repository = ShardedUrlRepository(shard_pool(engines))
+    await repository.create_many([url_entity(number) for number in range(URL_COUNT)])
+
+    first = await repository.list_page(None, 50)
+    second = await repository.list_page(first[-1].key, 50)
+
+    keys = [url.key for url in first + second]
+    assert keys == [f"key{number:04d}" for number in range(100)]
+
+
+async def test_clicks_and_deactivation_route_by_key(engines):
+    shards = shard_pool(engines)
+    repository = ShardedUrlRepository(shards)
+    await repository.create_many([url_entity(number) for number in range(10)])
+
+    await repository.increment_clicks({f"key{number:04d}": number for number in range(10)})
+    deactivated = await repository.deactivate_by_secret_key("key0003_SECRET01")
+
+    assert deactivated.key == "key0003"
+    assert await repository.get_by_key("key0003") is None
+    assert (await repository.get_by_key("key0007")).clicks == 7
+    assert await total_clicks(shards) == sum(range(10))
+
+
+async def test_rebalance_moves_rows_to_new_shard_without_losing_them(engines):
+    before = ShardedUrlRepository(shard_pool(engines[:2]))
+    await before.create_many([url_entity(number) for number in range(URL_COUNT)])
+    shards = shard_pool(engines, previous_count=2)
+    repository = ShardedUrlRepository(shards)
+    keys = [f"key{number:04d}" for number in range(URL_COUNT)]
+    moving = [key for key in keys if shards.previous_shard_for(key) is not None]
+    assert moving
+    assert not await keys_on(shards, 2)
+
+    # Before the rows move, lookups fall back to the old shard and their keys count as taken.
+    assert (await repository.get_by_key(moving[0])).key == moving[0]
+    assert await repository.create_if_absent(url_entity(int(moving[0][3:]))) is None
+    await repository.increment_clicks({key: 1 for key in moving})
+
+    rebalancer = ShardRebalancer(shards)
+    moved = 0
+    rounds = 1
+    while not rebalancer.done:
+        moved += await rebalancer.run_batch(batch_size=25)
+        # Clicks keep landing wherever each row is at the time.
+        await repository.increment_clicks({key: 1 for key in moving})
+        rounds += 1
+
+    assert moved == len(moving)
+    for index in range(len(shards)):
+        assert all(shards.shard_for(key) == index for key in await keys_on(shards, index))
+    assert await repository.count_active() == URL_COUNT
+    assert await total_clicks(shards) == len(moving) * rounds
+    assert {(await repository.get_by_key(key)).clicks for key in moving} == {rounds}
+
+
+async def test_rerun_after_a_failed_source_commit_keeps_the_source_clicks(engines):
+    before = ShardedUrlRepository(shard_pool(engines[:2]))
+    await before.create_many([url_entity(number) for number in range(URL_COUNT)])
+    shards = shard_pool(engines, previous_count=2)
+    repository = ShardedUrlRepository(shards)
+    moving = [f"key{number:04d}" for number in range(URL_COUNT) if shards.previous_shard_for(f"key{number:04d}")]
+    # An earlier move committed copies on the new shard, then its source commit failed.
+    for key in moving:
+        owner = shards.shard_for(key)
+        async with shards.session(shards.previous_shard_for(key)) as source_db:
+            row = await source_db.scalar(select(URLModel).where(URLModel.key == key))
+            copy = {column.name: getattr(row, column.name) for column in URLModel.__table__.columns}
+        async with shards.session(owner) as target_db:
+            await target_db.execute(URLModel.__table__.insert(), {**copy, "id": None})
+            await target_db.commit()
+    # Clicks keep landing on the old shard, which still has the rows.
+    await repository.increment_clicks({key: 3 for key in moving})
+
+    rebalancer = ShardRebalancer(shards)
+    while not rebalancer.done:
+        await rebalancer.run_batch(batch_size=25)
+
+    assert await repository.count_active() == URL_COUNT
+    assert await total_clicks(shards) == len(moving) * 3
+    assert {(await repository.get_by_key(key)).clicks for key in moving} == {3}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def dedup_enabled(monkeypatch):
+    # Runs before the client fixture loads the settings.
+    monkeypatch.setenv("DEDUP_TARGET_URLS", "true")
+
+
+async def create(client, target_url):
+    response = await client.post("/api/v1/url", json={"target_url": target_url})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_repeated_target_reuses_key_without_admin_credentials(client):
+    first = await create(client, "https://example.com/page?q=1")
+    second = await create(client, "HTTPS://Example.COM:443/page?q=1")
+
+    assert second["key"] == first["key"]
+    assert second["secret_key"] == "***PROTECTED***"
+    assert second["admin_url"] == "***PROTECTED***"
+    assert first["secret_key"].startswith(first["key"] + "_")
+
+
+async def test_different_path_gets_its_own_key(client):
+    first = await create(client, "https://example.com/page")
+    second = await create(client, "https://example.com/Page")
+
+    assert second["key"] != first["key"]
+    assert second["secret_key"] != "***PROTECTED***"
+
+
+async def test_deactivated_link_is_not_reused(client):
+    first = await create(client, "https://example.com/page")
+    assert (await client.delete(f"/api/v1/admin/{first['secret_key']}")).status_code == 200
+
+    second = await create(client, "https://example.com/page")
+
+    assert second["key"] != first["key"]
+    assert second["secret_key"].startswith(second["key"] + "_")
+
+
+async def test_bulk_repeats_share_one_key(client):
+    response = await client.post("/api/v1/urls/bulk", json={"target_urls": [
+        "https://example.com/a",
+        "https://EXAMPLE.com/a",
+    ]})
+
+    first, second = [json.loads(line) for line in response.text.splitlines()]
+    assert "duplicate" not in first
+    assert second["duplicate"] is True
+    assert second["key"] == first["key"]
+    assert second["secret_key"] == "***PROTECTED***"
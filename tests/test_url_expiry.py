@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.application.url_service import UrlService
+from app.core.local_cache import LocalUrlCache
+from app.domain.entities.url import UrlEntity, utcnow
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository, CachedUrlRepository
+from app.models.urls import URL as URLModel
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyUrlRepository(db_session=db_session)
+
+
+@pytest.fixture
+def url_cache():
+    return LocalUrlCache(max_size=100, ttl_seconds=30)
+
+
+@pytest.fixture
+def url_service(repository, url_cache):
+    return UrlService(url_repository=repository, url_cache=url_cache)
+
+
+async def store(repository, key, expires_in=None):
+    expires_at = utcnow() + expires_in if expires_in is not None else None
+    return await repository.create(UrlEntity(
+        target_url=f"https://example.com/{key}",
+        key=key,
+        secret_key=f"{key}_SECRET01",
+        created_at=utcnow(),
+        expires_at=expires_at
+    ))
+
+
+def test_is_expired():
+    now = utcnow()
+
+    def url_entity(expires_at=None):
+        return UrlEntity(target_url="https://example.com", key="k", secret_key="k_SECRET01", expires_at=expires_at)
+
+    assert not url_entity().is_expired(now)
+    assert not url_entity(now + timedelta(seconds=1)).is_expired(now)
+    assert url_entity(now).is_expired(now)
+
+
+async def test_expired_link_is_not_served_before_reaping(url_service, repository):
+    await store(repository, "expired1", timedelta(seconds=-1))
+    await store(repository, "current1", timedelta(hours=1))
+
+    assert await url_service.get_url_by_key("expired1") is None
+    assert (await url_service.get_url_by_key("current1")).key == "current1"
+
+
+async def test_reaper_deactivates_expired_links_in_batches(url_service, repository):
+    for number in range(3):
+        await store(repository, f"expired{number}", timedelta(minutes=-number - 1))
+    await store(repository, "current1", timedelta(hours=1))
+    await store(repository, "forever1")
+
+    assert await url_service.reap_expired_urls(batch_size=2) == 2
+    assert await url_service.reap_expired_urls(batch_size=2) == 1
+    assert await url_service.reap_expired_urls(batch_size=2) == 0
+
+    for number in range(3):
+        assert await repository.get_by_key(f"expired{number}") is None
+    assert await repository.get_by_key("current1") is not None
+    assert await repository.get_by_key("forever1") is not None
+
+
+async def test_reaper_evicts_reaped_links_from_local_cache(url_service, repository, url_cache, db_session):
+    await store(repository, "soon1", timedelta(hours=1))
+    await url_service.get_url_by_key("soon1")
+    assert url_cache.snapshot()["size"] == 1
+
+    await db_session.execute(
+        update(URLModel).where(URLModel.key == "soon1").values(expires_at=utcnow() - timedelta(seconds=1))
+    )
+    await db_session.commit()
+
+    assert await url_service.reap_expired_urls(batch_size=10) == 1
+    assert url_cache.snapshot()["size"] == 0
+
+
+async def test_redis_entry_does_not_outlive_expiry(repository, redis_client):
+    cached = CachedUrlRepository(repository, redis_client, ttl_seconds=3600, negative_ttl_seconds=60)
+
+    await cached.create(UrlEntity(
+        target_url="https://example.com/brief",
+        key="brief1",
+        secret_key="brief1_SECRET01",
+        expires_at=utcnow() + timedelta(seconds=30)
+    ))
+
+    assert 0 < await redis_client.ttl("tinyurl:url:brief1") <= 31
+
+
+async def test_api_rejects_expiry_in_the_past(client):
+    response = await client.post("/api/v1/url", json={
+        "target_url": "https://example.com/late",
+        "expires_at": (utcnow() - timedelta(minutes=1)).isoformat(),
+    })
+
+    assert response.status_code == 422
+
+
+async def test_api_creates_expiring_link(client):
+    response = await client.post("/api/v1/url", json={
+        "target_url": "https://example.com/later",
+        "expires_at": (utcnow() + timedelta(hours=1)).isoformat() + "Z",
+    })
+    assert response.status_code == 200
+    assert response.json()["expires_at"] is not None
+    key = response.json()["key"]
+    assert (await client.get(f"/api/v1/{key}")).status_code == 307
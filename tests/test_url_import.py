@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import stat
+
+import pytest
+from sqlalchemy import select
+
+from app import cli
+from app.core.config import get_settings
+from app.infrastructure.repositories import UrlBulkLoader
+from app.models.urls import URL as URLModel
+from app.utils.keygen import hash_secret_key
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def database(monkeypatch, sqlite_engines):
+    """The engine of a SQLite database that the CLI is pointed at through DB_URL."""
+    engine = await sqlite_engines("import")
+    monkeypatch.setenv("DB_URL", str(engine.url))
+    get_settings.cache_clear()
+    yield engine
+    get_settings.cache_clear()
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["key", "target_url", "secret_key", "clicks"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def import_args(source):
+    return cli.parse_args(["import", source, "--batch-size", "2", "--workers", "1"])
+
+
+async def stored_rows(engine):
+    async with engine.connect() as connection:
+        return {row.key: row for row in await connection.execute(select(URLModel))}
+
+
+async def test_import_stores_rows_and_writes_generated_secrets(tmp_path, database):
+    source = write_csv(tmp_path / "links.csv", [
+        ["alpha", "https://example.com/a", "", "3"],
+        ["bravo", "https://example.com/b", "bravo_GivenKey", "0"],
+        ["bad key!", "https://example.com/c", "", "0"],
+        ["delta", "not a url", "", "0"],
+    ])
+
+    await cli.import_urls(import_args(source))
+
+    rows = await stored_rows(database)
+    assert set(rows) == {"alpha", "bravo"}
+    assert rows["alpha"].clicks == 3
+    assert rows["bravo"].secret_key_hash == hash_secret_key("bravo_GivenKey")
+
+    secrets_path = f"{source}.secrets.csv"
+    assert stat.S_IMODE(os.stat(secrets_path).st_mode) == 0o600
+    with open(secrets_path, newline="") as handle:
+        secrets = list(csv.DictReader(handle))
+    assert [secret["key"] for secret in secrets] == ["alpha"]
+    assert rows["alpha"].secret_key_hash == hash_secret_key(secrets[0]["secret_key"])
+
+    with open(f"{source}.rejects.ndjson") as handle:
+        rejects = [json.loads(line) for line in handle]
+    assert [reject["line"] for reject in rejects] == [4, 5]
+
+
+async def test_import_resumes_after_the_last_committed_batch(tmp_path, database, monkeypatch):
+    source = write_csv(tmp_path / "links.csv", [
+        [f"key{number}", f"https://example.com/{number}", "", "0"] for number in range(5)
+    ])
+    commit = UrlBulkLoader.commit
+    commits = []
+
+    async def crash_on_second_commit(self):
+        commits.append(None)
+        if len(commits) == 2:
+            raise RuntimeError("connection lost")
+        await commit(self)
+
+    monkeypatch.setattr(UrlBulkLoader, "commit", crash_on_second_commit)
+    with pytest.raises(RuntimeError):
+        await cli.import_urls(import_args(source))
+    assert set(await stored_rows(database)) == {"key0", "key1"}
+
+    monkeypatch.setattr(UrlBulkLoader, "commit", commit)
+    await cli.import_urls(import_args(source))
+
+    assert set(await stored_rows(database)) == {f"key{number}" for number in range(5)}
+    with open(f"{source}.checkpoint") as handle:
+        checkpoint = json.load(handle)
+    assert (checkpoint["imported"], checkpoint["skipped"], checkpoint["rejected"]) == (5, 0, 0)
+    with open(f"{source}.rejects.ndjson") as handle:
+        assert handle.read() == ""
+
+
+async def test_import_skips_existing_keys(tmp_path, database):
+    source = write_csv(tmp_path / "links.csv", [["alpha", "https://example.com/a", "", "0"]])
+    await cli.import_urls(import_args(source))
+
+    again = write_csv(tmp_path / "again.csv", [
+        ["alpha", "https://example.com/other", "", "0"],
+        ["bravo", "https://example.com/b", "", "0"],
+    ])
+    await cli.import_urls(import_args(again))
+
+    rows = await stored_rows(database)
+    assert rows["alpha"].target_url == "https://example.com/a"
+    assert set(rows) == {"alpha", "bravo"}
+    with open(f"{again}.rejects.ndjson") as handle:
+        assert [json.loads(line) for line in handle] == [{"line": 2, "error": "Key already exists"}]
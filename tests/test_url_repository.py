@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import select
+
+from app.domain.entities.url import UrlEntity
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository
+from app.models.urls import URL as URLModel
+from app.utils.keygen import hash_secret_key
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyUrlRepository(db_session=db_session)
+
+
+@pytest.fixture
+async def stored(repository):
+    return await repository.create(
+        UrlEntity(target_url="https://example.com/page", key="abc123", secret_key="abc123_SECRET01")
+    )
+
+
+async def test_create_if_absent_returns_nothing_for_a_taken_key(repository, stored):
+    result = await repository.create_if_absent(
+        UrlEntity(target_url="https://example.com/other", key="abc123", secret_key="abc123_SECRET02")
+    )
+
+    assert result is None
+    assert (await repository.get_by_key("abc123")).target_url == "https://example.com/page"
+
+
+async def test_deactivate_returns_the_url_once(repository, stored):
+    deactivated = await repository.deactivate_by_secret_key("abc123_SECRET01")
+
+    assert deactivated.key == "abc123"
+    assert deactivated.is_active is False
+    assert await repository.get_by_key("abc123") is None
+    assert await repository.deactivate_by_secret_key("abc123_SECRET01") is None
+
+
+async def test_deactivate_with_unknown_secret_returns_nothing(repository, stored):
+    assert await repository.deactivate_by_secret_key("abc123_WRONG001") is None
+    assert await repository.deactivate_by_secret_key("") is None
+
+    assert (await repository.get_by_key("abc123")).is_active is True
+
+
+async def test_only_the_secret_key_hash_is_stored(repository, db_session, stored):
+    row = await db_session.scalar(select(URLModel).where(URLModel.key == "abc123"))
+
+    assert row.secret_key_hash == hash_secret_key("abc123_SECRET01")
+    assert (await repository.get_by_key("abc123")).secret_key is None
+    assert (await repository.get_by_secret_key("abc123_SECRET01")).secret_key == "abc123_SECRET01"
+
+
+async def test_secret_key_of_another_url_does_not_match(repository, stored):
+    await repository.create(UrlEntity(target_url="https://example.com/b", key="xyz789", secret_key="xyz789_SECRET02"))
+
+    assert await repository.get_by_secret_key("abc123_SECRET02") is None
+    assert await repository.deactivate_by_secret_key("xyz789_SECRET01") is None
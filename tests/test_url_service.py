@@ -0,0 +1,84 @@
+import pytest
+
+from app.application import url_service as url_service_module
+from app.application.url_service import UrlService
+from app.domain.entities.url import UrlEntity
+from app.domain.exceptions import DuplicateKeyError
+from app.infrastructure.repositories import AsyncSqlAlchemyUrlRepository
+
+pytestmark = pytest.mark.anyio
+
+TAKEN_KEY = "takenKey"
+
+
+@pytest.fixture
+def repository(db_session):
+    return AsyncSqlAlchemyUrlRepository(db_session=db_session)
+
+
+@pytest.fixture
+def url_service(repository):
+    return UrlService(url_repository=repository)
+
+
+@pytest.fixture
+async def taken(repository):
+    return await repository.create(
+        UrlEntity(target_url="https://example.com/taken", key=TAKEN_KEY, secret_key=f"{TAKEN_KEY}_SECRET01")
+    )
+
+
+def generate_keys(monkeypatch, url_service, keys):
+    """Make the service draw the given keys in order, recording the length asked for each."""
+    lengths = []
+    remaining = iter(keys)
+
+    def create_random_key(length):
+        lengths.append(length)
+        return next(remaining)
+
+    monkeypatch.setattr(url_service_module, "create_random_key", create_random_key)
+    monkeypatch.setattr(url_service, "_create_secret_key", lambda key: f"{key}_SECRET01")
+    return lengths
+
+
+async def test_create_retries_after_key_collision(monkeypatch, url_service, repository, taken):
+    lengths = generate_keys(monkeypatch, url_service, [TAKEN_KEY, "freshKey"])
+
+    url_entity = await url_service.create_short_url("https://example.com/new")
+
+    assert url_entity.key == "freshKey"
+    assert lengths == [8, 8]
+    assert (await repository.get_by_key(TAKEN_KEY)).target_url == "https://example.com/taken"
+
+
+async def test_create_moves_to_longer_keys_after_repeated_collisions(monkeypatch, url_service, taken):
+    attempts = url_service.max_key_attempts
+    lengths = generate_keys(monkeypatch, url_service, [TAKEN_KEY] * attempts + ["freshKey0012"])
+
+    url_entity = await url_service.create_short_url("https://example.com/new")
+
+    assert url_entity.key == "freshKey0012"
+    assert lengths == [8] * attempts + [12]
+
+
+async def test_create_gives_up_when_every_key_collides(monkeypatch, url_service, taken):
+    generate_keys(monkeypatch, url_service, [TAKEN_KEY] * url_service.max_key_attempts * 2)
+
+    with pytest.raises(Exception, match="Unable to generate unique key"):
+        await url_service.create_short_url("https://example.com/new")
+
+
+async def test_custom_key_collision_raises_duplicate_key_error(url_service, taken):
+    with pytest.raises(DuplicateKeyError):
+        await url_service.create_custom_short_url("https://example.com/new", TAKEN_KEY)
+
+
+async def test_invalid_url_is_rejected_before_drawing_a_key(monkeypatch, url_service, repository):
+    lengths = generate_keys(monkeypatch, url_service, [])
+
+    with pytest.raises(ValueError, match="Invalid URL format"):
+        await url_service.create_short_url("not a url")
+
+    assert lengths == []
+    assert await repository.count_active() == 0